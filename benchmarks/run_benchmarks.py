@@ -0,0 +1,407 @@
+# -*- coding: gbk -*-
+"""
+ܻ׼Թ
+ʹ֪Ӳĺϳ˫Ŀͼԣֱ׶μ˵˲ʱ
+PySide6ͷJSON뱣Ļ߱Ƚ
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# ȡǰűĿ¼
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# ĿĿ¼
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+SRC_DIR = os.path.join(PROJECT_ROOT, "src")
+sys.path.insert(0, SRC_DIR)
+
+# commonڵʱ̽ͷӡϢضstderrԱstdoutΪJSON
+with contextlib.redirect_stdout(sys.stderr):
+    from common import STEREO_WIDTH, STEREO_HEIGHT, PREVIEW_WIDTH, PREVIEW_HEIGHT, g_state
+    from log_manager import LogManager
+    from camera_manager import CameraManager
+    from ranging_calculator import RangingCalculator, RECTIFY_SCALES, create_stereo_sgbm
+    from ranging_worker import RangingWorker
+    from synthetic_stereo import SyntheticStereoScene
+    from calibration_bundle import convert_npz
+    from frame_quality import check_frame_quality
+    from incremental_disparity import IncrementalDisparity
+    from depth_overlay import DepthOverlay
+    from depth_export import write_ply, write_disparity_png
+
+# ====================== Benchmark Configuration ======================
+# ĬϻļĿ --save-baseline ɣ
+DEFAULT_BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+# ϳͼ
+TEXTURE_IMAGE = os.path.join(PROJECT_ROOT, "assets", "test1.png")
+# ϳɳ
+SYNTH_DISPARITY = 32        # ȫͼ֪Ӳأ
+# ĬϻعֵԻλ
+DEFAULT_THRESHOLD = 0.20
+
+
+def make_synthetic_pair(disparity: int = SYNTH_DISPARITY) -> np.ndarray:
+    """
+    ֪Ӳƴ֡
+
+    Returns:
+        np.ndarray: STEREO_HEIGHT x STEREO_WIDTH BGRƴ֡
+    """
+    half_w = STEREO_WIDTH // 2
+    texture = cv2.imread(TEXTURE_IMAGE)
+    if texture is None:
+        # زȱʧʱʹù̶ӵ
+        rng = np.random.default_rng(0)
+        texture = rng.integers(0, 256, (STEREO_HEIGHT, half_w + disparity, 3), dtype=np.uint8)
+    left = cv2.resize(texture, (half_w + disparity, STEREO_HEIGHT), interpolation=cv2.INTER_LINEAR)
+    frame = np.empty((STEREO_HEIGHT, STEREO_WIDTH, 3), dtype=np.uint8)
+    # ͼͬһλͼȥӲ
+    frame[:, :half_w] = left[:, :half_w]
+    frame[:, half_w:] = left[:, disparity:disparity + half_w]
+    return frame
+
+
+def disparity_accuracy(disparity_map: np.ndarray, gt_disparity: np.ndarray) -> dict:
+    """ȽӲͼֵӲֻͳֵЧƥЧֵأ"""
+    gt_valid = gt_disparity > 0
+    valid = gt_valid & (disparity_map > 0.5)
+    err = np.abs(disparity_map[valid] - gt_disparity[valid])
+    return {
+        "valid_ratio": float(valid.sum() / max(gt_valid.sum(), 1)),
+        "disparity_mae": float(err.mean()) if err.size else 0.0,
+        "bad_pixel_ratio": float((err > 1.0).mean()) if err.size else 0.0,
+    }
+
+
+def time_call(func, repeat: int, warmup: int = 1) -> dict:
+    """εúͳƺʱ룩"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples = np.asarray(samples)
+    return {
+        "median_ms": float(np.median(samples)),
+        "mean_ms": float(samples.mean()),
+        "min_ms": float(samples.min()),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "repeat": repeat,
+    }
+
+
+def bench_ranging(calc: RangingCalculator, frame: np.ndarray, repeat: int) -> dict:
+    """ֽ׶βRangingCalculatorͨӿڣ·ʹͬһʵ֣"""
+    results = {}
+    raw_point = (STEREO_WIDTH // 4, STEREO_HEIGHT // 2)
+    left = frame[:, :STEREO_WIDTH // 2]
+    _, _, gray_l, gray_r, lut = calc.rectify_pair(frame)
+    matcher = create_stereo_sgbm()
+    disparity_map = matcher.compute(gray_l, gray_r)
+    Q = lut.Q
+
+    results["ranging.quality_check"] = time_call(lambda: check_frame_quality(left, raw_point), repeat)
+    #  + У + Ԥ
+    results["ranging.prepare"] = time_call(lambda: calc.rectify_pair(frame), repeat)
+    results["ranging.disparity"] = time_call(lambda: matcher.compute(gray_l, gray_r), repeat)
+    results["ranging.disparity_frame"] = time_call(lambda: calc.compute_disparity_frame(frame), repeat)
+    # ͼȻ㣺ұ vs Ӳ + reprojectImageTo3D
+    results["ranging.depth_map_lut"] = time_call(lambda: calc.depth_lut().to_depth(disparity_map), repeat)
+    results["ranging.depth_map_reproject"] = time_call(
+        lambda: cv2.reprojectImageTo3D(disparity_map.astype(np.float32) / 16.0, Q, False)[..., 2], repeat)
+    results["ranging.measure_frame"] = time_call(lambda: calc.measure_frame(frame, raw_point), repeat)
+    # СֱʲֱࣨСͼУƥ䣩
+    for scale in RECTIFY_SCALES[1:]:
+        name = f"ranging.measure_frame_s{scale}"
+        results[name] = time_call(lambda: calc.measure_frame(frame, raw_point, scale=scale), repeat)
+        results[name]["distance_m"] = float(calc.measure_frame(frame, raw_point, scale=scale))
+
+    # ͨȫ״̬calculate_distance·
+    g_state.preview_running = True
+    g_state.has_click = True
+    g_state.click_point = (PREVIEW_WIDTH // 2, PREVIEW_HEIGHT // 2)
+    with g_state.frame_lock:
+        g_state.raw_frame = frame
+    try:
+        results["ranging.calculate_distance"] = time_call(calc.calculate_distance, repeat)
+        with g_state.distance_lock:
+            measured = float(g_state.distance)
+    finally:
+        g_state.preview_running = False
+        g_state.has_click = False
+        with g_state.frame_lock:
+            g_state.raw_frame = None
+
+    scene = SyntheticStereoScene()
+    expected = scene.focal * scene.baseline / SYNTH_DISPARITY
+    results["ranging.calculate_distance"]["distance_m"] = measured
+    results["ranging.calculate_distance"]["expected_m"] = expected
+    return results
+
+
+def bench_worker_burst(calc: RangingCalculator, frame: np.ndarray, repeat: int, clicks: int = 5) -> dict:
+    """ٵʱӵһεһνĺʱ"""
+    g_state.preview_running = True
+    with g_state.frame_lock:
+        g_state.raw_frame = frame
+    done = threading.Event()
+    latest = {"id": 0}
+
+    def on_result(result):
+        if result.request_id == latest["id"]:
+            done.set()
+
+    worker = RangingWorker(calc, on_result=on_result)
+    worker.start()
+
+    def burst():
+        done.clear()
+        for i in range(clicks):
+            latest["id"] = worker.submit((PREVIEW_WIDTH // 2 + i, PREVIEW_HEIGHT // 2))
+        done.wait(timeout=60.0)
+
+    try:
+        result = time_call(burst, repeat)
+    finally:
+        worker.stop()
+        g_state.preview_running = False
+        with g_state.frame_lock:
+            g_state.raw_frame = None
+    result["clicks"] = clicks
+    return {"ranging.worker_burst": result}
+
+
+def bench_incremental_disparity(calc: RangingCalculator, repeat: int) -> dict:
+    """󲿷־ֹĳֻһСƶʱֿӲ̬ʱͼһ"""
+    scene = SyntheticStereoScene.default_scene()
+    w, h = scene.image_size
+    scene.add_box(int(w * 0.75), int(h * 0.1), 80, 80, 1.5)
+    box = scene.objects[-1]
+    frames = []
+    for i in range(8):
+        box["rect"] = (int(w * 0.75) + 8 * i, int(h * 0.1), 80, 80)
+        frames.append(scene.render(noise_sigma=2.0)[0])
+
+    incremental = IncrementalDisparity(calc, refresh_interval=10 ** 9)
+    incremental.update(frames[0])
+    index = {"i": 0}
+
+    def step():
+        index["i"] = index["i"] % (len(frames) - 1) + 1
+        incremental.update(frames[index["i"]])
+
+    result = time_call(step, repeat, warmup=0)
+    result["changed_tiles"] = incremental.last_stats["changed_tiles"]
+    result["total_tiles"] = incremental.last_stats["total_tiles"]
+    full = calc.compute_disparity_frame(frames[index["i"]]).disparity
+    valid = (full > 8) | (incremental.disparity > 8)
+    err = np.abs(full.astype(np.int32) - incremental.disparity.astype(np.int32))[valid] / 16.0
+    result["agree_1px_ratio"] = float((err <= 1.0).mean()) if err.size else 1.0
+    return {"ranging.incremental_disparity": result}
+
+
+def bench_preview(frame: np.ndarray, repeat: int) -> dict:
+    """Ԥ߳ʾ֡CameraManager.render_preview_frameдʾĺʱ"""
+    camera = CameraManager()
+    target = np.zeros((PREVIEW_HEIGHT, PREVIEW_WIDTH, 3), dtype=np.uint8)
+
+    def render():
+        target[:] = camera.render_preview_frame(frame, 0)
+
+    return {
+        "preview.render": time_call(render, repeat),
+        "preview.raw_copy": time_call(frame.copy, repeat),
+    }
+
+
+def bench_depth_overlay(calc: RangingCalculator, repeat: int) -> dict:
+    """ͼ1/4ֱͼƥ䲢αɫͼ̨̣߳ӵԤ֡ɼ̣߳ĺʱ"""
+    frame = SyntheticStereoScene.default_scene().render(noise_sigma=2.0)[0]
+    overlay = DepthOverlay(calc)
+    target = cv2.resize(frame[:, :STEREO_WIDTH//2], (PREVIEW_WIDTH, PREVIEW_HEIGHT), interpolation=cv2.INTER_LINEAR)
+
+    result = time_call(lambda: overlay.update(frame, full=True), repeat)
+    result["valid_ratio"] = overlay.last_stats["valid_ratio"]
+    return {
+        "preview.depth_overlay_update": result,
+        "preview.depth_overlay_blend": time_call(lambda: overlay.blend(target), repeat),
+    }
+
+
+def bench_depth_export(calc: RangingCalculator, repeat: int, out_dir: str) -> dict:
+    """ͼӲ16λPNGPLYƣֿ顢ˣдʱ"""
+    frame = SyntheticStereoScene.default_scene().render(noise_sigma=2.0)[0]
+    disparity_frame = calc.compute_disparity_frame(frame)
+    ply_path = os.path.join(out_dir, "bench.ply")
+    ply = time_call(lambda: write_ply(ply_path, disparity_frame), repeat)
+    ply["points"] = write_ply(ply_path, disparity_frame)
+    ply["bytes"] = os.path.getsize(ply_path)
+    return {
+        "export.disparity_png": time_call(
+            lambda: write_disparity_png(os.path.join(out_dir, "bench.png"), disparity_frame.disparity), repeat),
+        "export.point_cloud_ply": ply,
+    }
+
+
+def bench_calibration_load(npz_path: str, repeat: int, bundle_dir: str = None) -> dict:
+    """궨ļ궨غʱ"""
+    results = {"calibration.load": time_call(lambda: RangingCalculator().load_calibration(npz_path), repeat)}
+    if bundle_dir is not None:
+        convert_npz(npz_path, bundle_dir)
+        results["calibration.load_bundle"] = time_call(lambda: RangingCalculator().load_calibration(bundle_dir), repeat)
+    return results
+
+
+def bench_log_manager(repeat: int, lines: int = 1000) -> dict:
+    """LogManagerд"""
+    def append_many():
+        for i in range(lines):
+            LogManager.append_log(f"Benchmark log line {i}", "INFO")
+
+    result = time_call(append_many, repeat)
+    result["lines_per_sec"] = lines / (result["median_ms"] / 1000.0) if result["median_ms"] > 0 else 0.0
+    LogManager.clear_logs()
+    return {"log_manager.append": result}
+
+
+def bench_accuracy(calc: RangingCalculator, repeat: int) -> dict:
+    """֪ȵĺϳɳͬʱӲٶ뾫"""
+    scene = SyntheticStereoScene.default_scene()
+    frame, gt_disparity, gt_depth = scene.render(noise_sigma=2.0)
+    _, _, gray_l, gray_r, _ = calc.rectify_pair(frame)
+    matcher = create_stereo_sgbm()
+
+    result = time_call(lambda: matcher.compute(gray_l, gray_r), repeat)
+    disparity_map = calc.compute_disparity_frame(frame).disparity.astype(np.float32) / 16.0
+    result.update(disparity_accuracy(disparity_map, gt_disparity))
+
+    # ɼڲĲ
+    depth_errors = []
+    for obj in scene.objects:
+        visible = (gt_depth == obj["depth"]).astype(np.uint8)
+        visible[[0, -1], :] = 0
+        visible[:, [0, -1]] = 0
+        dist = cv2.distanceTransform(visible, cv2.DIST_L2, 3)
+        y, x = np.unravel_index(np.argmax(dist), dist.shape)
+        point = (int(x), int(y))
+        distance = float(calc.measure_frame(frame, point))
+        depth_errors.append({
+            "point": list(point),
+            "expected_m": float(gt_depth[point[1], point[0]]),
+            "distance_m": distance,
+        })
+    result["depth_errors"] = depth_errors
+    return {"accuracy.scene_disparity": result}
+
+
+def run_benchmarks(repeat: int) -> dict:
+    """ִȫ׼"""
+    frame = make_synthetic_pair()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        npz_path = os.path.join(tmp_dir, "synthetic_calib.npz")
+        SyntheticStereoScene().write_calibration(npz_path)
+        results.update(bench_calibration_load(npz_path, repeat, os.path.join(tmp_dir, "synthetic_calib_bundle")))
+
+        calc_calib = RangingCalculator()
+        calc_calib.load_calibration(npz_path)
+        for name, value in bench_ranging(calc_calib, frame, repeat).items():
+            results[name] = value
+        results.update(bench_accuracy(calc_calib, repeat))
+        results.update(bench_worker_burst(calc_calib, frame, repeat))
+        results.update(bench_incremental_disparity(calc_calib, repeat))
+        results.update(bench_depth_overlay(calc_calib, repeat))
+        results.update(bench_depth_export(calc_calib, repeat, tmp_dir))
+
+    calc_raw = RangingCalculator()
+    for name, value in bench_ranging(calc_raw, frame, repeat).items():
+        results[name.replace("ranging.", "ranging_uncalibrated.", 1)] = value
+
+    results.update(bench_preview(frame, repeat))
+    results.update(bench_log_manager(repeat))
+    LogManager.clear_logs()
+    return results
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    ߱Ƚϣػعб
+
+    ļɰ "thresholds": {: ֵ} ĳֵ
+    """
+    regressions = []
+    base_results = baseline.get("results", {})
+    thresholds = baseline.get("thresholds", {})
+    for name, current in results.items():
+        base = base_results.get(name)
+        if base is None or base.get("median_ms", 0) <= 0:
+            continue
+        limit = thresholds.get(name, threshold)
+        ratio = current["median_ms"] / base["median_ms"] - 1.0
+        current["baseline_median_ms"] = base["median_ms"]
+        current["change"] = ratio
+        if ratio > limit:
+            regressions.append({"name": name, "change": ratio, "threshold": limit})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless performance benchmarks for stereo ranging")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed iterations per benchmark")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store current results as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown of the median before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "stereo_size": [STEREO_WIDTH, STEREO_HEIGHT],
+            "preview_size": [PREVIEW_WIDTH, PREVIEW_HEIGHT],
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.threshold)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    for item in regressions:
+        print(f"Regression: {item['name']} +{item['change']*100:.1f}% (limit {item['threshold']*100:.0f}%)",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
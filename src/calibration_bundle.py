@@ -0,0 +1,146 @@
+# -*- coding: gbk -*-
+"""
+궨calibration bundle
+Ŀ¼ṹ: meta.json汾Ԫݣ + ÿһδѹ .npy ļ
+ʱͨ np.load(mmap_mode='r') ӳ䣬Уӳҳ룬
+ͬһ豸ϵĶ̹ͬһҳ
+
+÷:
+    python calibration_bundle.py ../tools/stereo_calib_params.npz ../tools/stereo_calib_bundle
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import cv2
+
+BUNDLE_FORMAT = "stereo_calib_bundle"
+BUNDLE_VERSION = 1
+META_FILE = "meta.json"
+# Уӳļ: map1x/map1y: map2x/map2yСֱʵӳ _s2_s4 Ⱥ׺
+MAP_KEYS = ("map1x", "map1y", "map2x", "map2y")
+# ļ: <>.<ʮư汾>.npy
+ARRAY_FILE_PATTERN = re.compile(r"^(\w+)\.([0-9a-f]+)\.npy$")
+
+
+def is_bundle(path: str) -> bool:
+    """ж·ǷΪ궨Ŀ¼"""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE))
+
+
+def save_bundle(bundle_dir: str, arrays: dict, fixed_point: bool = True):
+    """
+    궨
+
+    Args:
+        bundle_dir: Ŀ¼
+        arrays:  -> / stereo_calib_params.npz ļһ
+        fixed_point: Ƿ񽫸ӳתΪʽCV_16SC2 + CV_16UC1Сremap
+    """
+    if not os.path.exists(bundle_dir):
+        os.makedirs(bundle_dir)
+    arrays = {k: np.asarray(v) for k, v in arrays.items()}
+
+    map_format = "float"
+    if fixed_point and all(k in arrays for k in MAP_KEYS) and arrays["map1x"].dtype == np.float32:
+        x_keys = [k for k in arrays if k.startswith(("map1x", "map2x"))]
+        for x_key in x_keys:
+            y_key = x_key.replace("x", "y", 1)
+            arrays[x_key], arrays[y_key] = cv2.convertMaps(arrays[x_key], arrays[y_key], cv2.CV_16SC2)
+        map_format = "fixed"
+
+    # ÿдʹµļӳľļᱻд
+    previous = _bundle_generations(bundle_dir)
+    stamp = int(time.time() * 1000)
+    while f"{stamp:x}" in previous:
+        stamp += 1
+    generation = f"{stamp:x}"
+    files = {}
+    for name, value in arrays.items():
+        filename = f"{name}.{generation}.npy"
+        np.save(os.path.join(bundle_dir, filename), value)
+        files[name] = filename
+
+    img_size = arrays.get("img_size")
+    meta = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "map_format": map_format,
+        "img_size": [int(v) for v in img_size] if img_size is not None else None,
+        "baseline": float(arrays["baseline"]) if "baseline" in arrays else None,
+        "arrays": files,
+    }
+    # дʱļԭ滻meta.jsonܿһ
+    tmp_meta = os.path.join(bundle_dir, META_FILE + ".tmp")
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_meta, os.path.join(bundle_dir, META_FILE))
+
+    # ɾ汾ļӳĽԿɷɾļ
+    # һ汣´α棬նmeta.jsonĶܴõļ
+    keep = previous | {generation}
+    for filename in os.listdir(bundle_dir):
+        match = ARRAY_FILE_PATTERN.match(filename)
+        if match and match.group(2) not in keep:
+            os.remove(os.path.join(bundle_dir, filename))
+
+
+def _bundle_generations(bundle_dir: str) -> set:
+    """ǰmeta.jsonõļ汾ţûл޷ȡʱΪռϣ"""
+    try:
+        with open(os.path.join(bundle_dir, META_FILE)) as f:
+            filenames = json.load(f).get("arrays", {}).values()
+    except (OSError, ValueError, AttributeError):
+        return set()
+    matches = (ARRAY_FILE_PATTERN.match(str(filename)) for filename in filenames)
+    return {match.group(2) for match in matches if match}
+
+
+def load_bundle(bundle_dir: str, mmap: bool = True) -> tuple:
+    """
+    ر궨
+
+    Returns:
+        tuple: ( ->  ֵ, Ԫ)mmapΪTrueʱΪֻڴӳ
+    """
+    with open(os.path.join(bundle_dir, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Not a calibration bundle: {bundle_dir}")
+    if meta.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError(f"Unsupported calibration bundle version {meta.get('version')} (max {BUNDLE_VERSION})")
+    arrays = {}
+    for name, filename in meta["arrays"].items():
+        arrays[name] = np.load(os.path.join(bundle_dir, filename), mmap_mode="r" if mmap else None)
+    return arrays, meta
+
+
+def convert_npz(npz_path: str, bundle_dir: str, fixed_point: bool = True) -> dict:
+    """ stereo_calib_params.npz תΪ궨Ԫ"""
+    with np.load(npz_path) as data:
+        arrays = {k: data[k] for k in data.files}
+    save_bundle(bundle_dir, arrays, fixed_point=fixed_point)
+    return load_bundle(bundle_dir, mmap=True)[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stereo_calib_params.npz into a memory-mappable calibration bundle")
+    parser.add_argument("npz", help="Input calibration NPZ file")
+    parser.add_argument("bundle", help="Output bundle directory")
+    parser.add_argument("--float-maps", action="store_true",
+                        help="Keep float32 rectification maps instead of converting them to fixed point")
+    args = parser.parse_args()
+
+    meta = convert_npz(args.npz, args.bundle, fixed_point=not args.float_maps)
+    size = sum(os.path.getsize(os.path.join(args.bundle, f)) for f in meta["arrays"].values())
+    print(f"Calibration bundle v{meta['version']} written to {args.bundle} "
+          f"({meta['map_format']} maps, {size / 1024 / 1024:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
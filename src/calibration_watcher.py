@@ -0,0 +1,86 @@
+# -*- coding: gbk -*-
+"""
+궨ļ
+ڼ궨ļNPZļ궨meta.json޸ʱС
+仯ȶں̨¼أRangingCalculator滻궨
+ɶѲ豸±궨
+"""
+import os
+import threading
+from log_manager import LogManager
+from calibration_bundle import META_FILE
+
+
+class CalibrationWatcher:
+    """ѯʽ궨ļinotifyƽ̨ӿڣ"""
+
+    def __init__(self, ranging_calculator, calib_path: str, interval: float = 1.0, on_reload=None):
+        """
+        Args:
+            ranging_calculator: RangingCalculatorʵ
+            calib_path: NPZļ·궨Ŀ¼ݲڣ
+            interval: ѯ룩
+            on_reload: ¼غĻص on_reload(success)ڼ߳е
+        """
+        self._calculator = ranging_calculator
+        self._calib_path = calib_path
+        self._interval = interval
+        self._on_reload = on_reload
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._signature = None
+
+    def start(self):
+        """̣߳Եǰļ״̬Ϊ׼"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._signature = self._file_signature()
+        self._thread = threading.Thread(target=self._watch_func, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ֹͣ߳"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _file_signature(self):
+        """ļ (޸ʱ, С)ʱNone"""
+        path = self._calib_path
+        if os.path.isdir(path):
+            path = os.path.join(path, META_FILE)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _watch_func(self):
+        pending = None
+        # ʧܵļ״̬ʱظ¼־ص
+        failed = None
+        while not self._stop_event.wait(self._interval):
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                pending = None
+                continue
+            # ѯһ²¼أдļ
+            if signature != pending:
+                pending = signature
+                continue
+            pending = None
+            retry = signature == failed
+            if not retry:
+                LogManager.append_log(f"Calibration file changed, reloading: {self._calib_path}", "INFO")
+            success = self._calculator.load_calibration(self._calib_path)
+            if success:
+                # ֻڼسɹ»׼ʧʱ֮ѯͬһļ
+                self._signature = signature
+                failed = None
+            elif not retry:
+                failed = signature
+                LogManager.append_log("Calibration reload failed, keeping previous parameters", "WARN")
+            if self._on_reload is not None and (success or not retry):
+                self._on_reload(success)
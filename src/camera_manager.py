@@ -4,8 +4,6 @@ import time
 import cv2
 import numpy as np
 from log_manager import LogManager
-from PySide6.QtGui import QImage, QPixmap
-from PySide6.QtWidgets import QLabel
 from common import (
     STEREO_WIDTH, STEREO_HEIGHT, PREVIEW_WIDTH, PREVIEW_HEIGHT,
     CAMERA_DEV, CAPTURE_L_PATH, CAPTURE_R_PATH, g_state
@@ -29,12 +27,24 @@ class CameraSettings:
 class CameraManager:
     """ͷ"""
     
-    def __init__(self):
+    def __init__(self, render_preview: bool = True):
+        """
+        Args:
+            render_preview: ǷԤʾ֡޽ʱΪFalseֻԭʼ֡
+        """
+        self._render_preview = render_preview
         self._preview_thread = None
         self._camera_settings = CameraSettings()
         
         self._initial_settings = CameraSettings()
         
+        # ֡ԴΪNoneʱʹV4L2ͷ
+        self._frame_source_factory = None
+        # ڴ֡ΪNoneʱ
+        self._frame_publisher = None
+        # ͼԤģʽ3ʱӵͼԤϣ
+        self._depth_overlay = None
+        
         # ʼ֡
         g_state.buffer_frame1 = np.zeros((PREVIEW_HEIGHT, PREVIEW_WIDTH, 3), dtype=np.uint8)
         g_state.buffer_frame2 = np.zeros((PREVIEW_HEIGHT, PREVIEW_WIDTH, 3), dtype=np.uint8)
@@ -92,21 +102,73 @@ class CameraManager:
         # ò״̬
         g_state.has_click = False
         g_state.click_point = (-1, -1)
+        g_state.select_rect = None
+        g_state.measure_points = []
         with g_state.distance_lock:
             g_state.distance = 0.0
+            g_state.distance_details = None
         
         LogManager.append_log("Preview stopped, resources released.","INFO")
         
-    def _preview_thread_func(self):
-        """Ԥ̺߳"""
+    def set_frame_source(self, factory):
+        """
+        ֡ԴԺϳ֡ͷ
+        
+        Args:
+            factory: ޲οɵö󣬷cv2.VideoCaptureӿڼݵĶNoneָʹͷ
+        """
+        self._frame_source_factory = factory
+        
+    def set_depth_overlay(self, overlay):
+        """
+        Ԥģʽ3ӵͼ
+        
+        Args:
+            overlay: DepthOverlayʵɵ÷ֹͣNoneʱģʽ3ֻʾͼ
+        """
+        self._depth_overlay = overlay
+        
+    def enable_frame_publisher(self, name: str = None, slots: int = None):
+        """
+        ɼÿһ֡ڴ滷λ̹ضȡ
+        
+        Args:
+            name: ڴƣĬ frame_ring.DEFAULT_RING_NAME
+            slots: λĬ frame_ring.DEFAULT_RING_SLOTS
+        """
+        from frame_ring import FrameRingWriter, DEFAULT_RING_NAME, DEFAULT_RING_SLOTS
+        self.disable_frame_publisher()
+        self._frame_publisher = FrameRingWriter(name or DEFAULT_RING_NAME, slots or DEFAULT_RING_SLOTS)
+        LogManager.append_log(f"Publishing frames to shared memory '{self._frame_publisher.name}'","INFO")
+        
+    @property
+    def frame_publisher_name(self):
+        """ڷ֡ĹڴƣδʱΪNone"""
+        publisher = self._frame_publisher
+        return publisher.name if publisher is not None else None
+
+    def disable_frame_publisher(self):
+        """ֹͣɾڴ"""
+        publisher, self._frame_publisher = self._frame_publisher, None
+        if publisher is not None:
+            publisher.close()
+        
+    def _open_capture(self):
+        """֡Դ (cap, )"""
+        if self._frame_source_factory is not None:
+            return self._frame_source_factory(), "custom frame source"
         if isinstance(CAMERA_DEV, str) and CAMERA_DEV.startswith("/dev/video"):
             cam_idx = int(CAMERA_DEV.replace("/dev/video", ""))
         else:
             cam_idx = int(CAMERA_DEV)
-        cap = cv2.VideoCapture(cam_idx, cv2.CAP_V4L2)
+        return cv2.VideoCapture(cam_idx, cv2.CAP_V4L2), f"camera index {cam_idx}"
+        
+    def _preview_thread_func(self):
+        """Ԥ̺߳"""
+        cap, source_name = self._open_capture()
         
         if not cap.isOpened():
-            LogManager.append_log(f"Error: Failed to open camera index {cam_idx}","ERROR")
+            LogManager.append_log(f"Error: Failed to open {source_name}","ERROR")
             return
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, STEREO_WIDTH)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, STEREO_HEIGHT)
@@ -124,39 +186,32 @@ class CameraManager:
                 time.sleep(0.001)
                 continue
             
+            # ÿһ֡ԤʾӰ
+            publisher = self._frame_publisher
+            if publisher is not None:
+                publisher.write(frame)
+            
+            if not self._render_preview:
+                with g_state.frame_lock:
+                    g_state.raw_frame = frame
+                    g_state.frame_seq += 1
+                frame_count += 1
+                continue
+            
             if g_state.frame_ready:
                 continue
             
-            cam_id = g_state.current_cam
+            frame_show = self.render_preview_frame(frame, g_state.current_cam)
+            if frame_show is None:
+                continue
             
             write_idx = g_state.write_buffer_index
             target_buffer = g_state.buffer_frame1 if write_idx == 0 else g_state.buffer_frame2
-            
-            # ͷģʽѡʾ
-            if cam_id == 1:  # ͷ
-                frame_show = frame[:, :STEREO_WIDTH//2]
-            elif cam_id == 2:  # ͷ
-                frame_show = frame[:, STEREO_WIDTH//2:]
-            elif cam_id == 0:  # ģʽʾͷ
-                frame_show = frame[:, :STEREO_WIDTH//2]
-            else:
-                continue
-            
-            frame_show = cv2.resize(frame_show, (PREVIEW_WIDTH, PREVIEW_HEIGHT), 
-                                   interpolation=cv2.INTER_LINEAR)
-            
-            # ģʽ»Ƶ
-            if cam_id == 0:
-                click_pt = g_state.click_point
-                if g_state.has_click and click_pt[0] >= 0 and click_pt[1] >= 0:
-                    cv2.circle(frame_show, (click_pt[0], click_pt[1]), 3, (0, 0, 255), -1)
-            
-            # תΪRGBʽ
-            frame_show = cv2.cvtColor(frame_show, cv2.COLOR_BGR2RGB)
             target_buffer[:] = frame_show
             
             with g_state.frame_lock:
                 g_state.raw_frame = frame.copy()
+                g_state.frame_seq += 1
             
             g_state.write_buffer_index = 1 - write_idx
             g_state.frame_ready = True
@@ -174,6 +229,67 @@ class CameraManager:
         cap.release()
         LogManager.append_log(f"Camera released. Total frames: {frame_count}","INFO")
         
+    def render_preview_frame(self, frame: np.ndarray, cam_id: int):
+        """
+        ԭʼƴ֡Ԥʾ֡ѡʾšͼעתΪRGB
+        
+        Args:
+            frame: ƴӵԭʼ֡
+            cam_id: Ԥģʽ0: 1:ͷ 2:ͷ 3:ͼ
+            
+        Returns:
+            ԤֱʵRGBͼδ֪ģʽNone
+        """
+        # ͷģʽѡʾ
+        if cam_id == 1:  # ͷ
+            frame_show = frame[:, :STEREO_WIDTH//2]
+        elif cam_id == 2:  # ͷ
+            frame_show = frame[:, STEREO_WIDTH//2:]
+        elif cam_id == 0:  # ģʽʾͷ
+            frame_show = frame[:, :STEREO_WIDTH//2]
+        elif cam_id == 3:  # ͼͷ + αɫȣ
+            frame_show = frame[:, :STEREO_WIDTH//2]
+        else:
+            return None
+        
+        frame_show = cv2.resize(frame_show, (PREVIEW_WIDTH, PREVIEW_HEIGHT), 
+                               interpolation=cv2.INTER_LINEAR)
+        
+        overlay = self._depth_overlay
+        if cam_id == 3 and overlay is not None:
+            overlay.blend(frame_show)
+        
+        # ģʽ»Ƶ
+        if cam_id == 0:
+            click_pt = g_state.click_point
+            if g_state.has_click and click_pt[0] >= 0 and click_pt[1] >= 0:
+                cv2.circle(frame_show, (click_pt[0], click_pt[1]), 3, (0, 0, 255), -1)
+            # ĸ㡢߶γ
+            points = g_state.measure_points
+            if points:
+                self._draw_point_distances(frame_show, points, g_state.distance_details)
+            # ѡ
+            rect = g_state.select_rect
+            if rect is not None:
+                cv2.rectangle(frame_show, (rect[0], rect[1]), (rect[2], rect[3]), (0, 255, 255), 1)
+        
+        # תΪRGBʽ
+        return cv2.cvtColor(frame_show, cv2.COLOR_BGR2RGB)
+        
+    def _draw_point_distances(self, frame_show, points: list, details):
+        """Ԥ֡ϻƶĸߣ뵱ǰһʱеע"""
+        segments = details.get("segments") if details is not None else None
+        if segments is not None and len(segments) != len(points) - 1:
+            segments = None
+        for i, (a, b) in enumerate(zip(points[:-1], points[1:])):
+            cv2.line(frame_show, a, b, (0, 255, 255), 1)
+            if segments is not None:
+                text = "--" if segments[i] is None else f"{segments[i]:.2f}m"
+                cv2.putText(frame_show, text, ((a[0] + b[0]) // 2 + 4, (a[1] + b[1]) // 2 - 4),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1, cv2.LINE_AA)
+        for point in points:
+            cv2.circle(frame_show, point, 3, (0, 255, 255), -1)
+        
     def take_stereo_capture(self) -> tuple[bool, str]:
         """
         ˫Ŀ
@@ -183,14 +299,10 @@ class CameraManager:
         self.stop_preview()
     
         try:
-            if isinstance(CAMERA_DEV, str) and CAMERA_DEV.startswith("/dev/video"):
-                cam_idx = int(CAMERA_DEV.replace("/dev/video", ""))
-            else:
-                cam_idx = int(CAMERA_DEV)
-            cap = cv2.VideoCapture(cam_idx, cv2.CAP_V4L2)
+            cap, source_name = self._open_capture()
         
             if not cap.isOpened():
-                return False, f"Failed to open camera index {cam_idx} for capture"
+                return False, f"Failed to open {source_name} for capture"
         
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, STEREO_WIDTH)
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, STEREO_HEIGHT)
@@ -243,6 +355,9 @@ class CameraManager:
         if read_buffer is None:
             return
         
+        # PySide6ڽģʽҪӳٵԱ޽
+        from PySide6.QtGui import QImage, QPixmap
+        
         # תΪQImage
         h, w, ch = read_buffer.shape
         img = QImage(read_buffer.data, w, h, ch * w, QImage.Format.Format_RGB888)
@@ -290,8 +405,9 @@ class CameraManager:
         cap.set(cv2.CAP_PROP_WHITE_BALANCE_RED_V, settings.white_balance)
         print("Camera settings applied")
         
-def mat_to_qimage(mat: np.ndarray) -> QImage:
+def mat_to_qimage(mat: np.ndarray) -> "QImage":
     """OpenCV MatתΪQImage"""
+    from PySide6.QtGui import QImage
     if mat is None:
        return QImage()
     rgb_mat = cv2.cvtColor(mat, cv2.COLOR_BGR2RGB)
@@ -12,6 +12,18 @@ PREVIEW_WIDTH = 640
 PREVIEW_HEIGHT = 360
 CAPTURE_L_PATH = "/tmp/capture_L.jpg"
 CAPTURE_R_PATH = "/tmp/capture_R.jpg"
+# ӲͼƵĿ¼
+EXPORT_DIR = "/tmp/stereo_export"
+# 궨ļNPZ궨Ŀ¼
+CALIB_NPZ_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools", "stereo_calib_params.npz")
+CALIB_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools", "stereo_calib_bundle")
+
+
+def get_calibration_path():
+    """ʹñ궨ʱʹNPZļ"""
+    if os.path.exists(os.path.join(CALIB_BUNDLE_PATH, "meta.json")):
+        return CALIB_BUNDLE_PATH
+    return CALIB_NPZ_PATH
 
 
 def detect_stereo_camera():
@@ -72,7 +84,18 @@ def detect_stereo_camera():
         return None, 0, 0
 
 
-CAMERA_DEV, DETECTED_WIDTH, DETECTED_HEIGHT = detect_stereo_camera()
+def export_camera_detection():
+    """ͷд뻷֮ӽãظ豸"""
+    os.environ[CAMERA_DETECTION_ENV] = f"{CAMERA_DEV if DETECTED_WIDTH > 0 else ''}|{DETECTED_WIDTH}|{DETECTED_HEIGHT}"
+
+
+# ӽ̸̣Ĳ๤Ӵ˻ȡ̵ļ
+CAMERA_DETECTION_ENV = "STEREO_CAMERA_DETECTION"
+if os.environ.get(CAMERA_DETECTION_ENV):
+    _dev, _width, _height = os.environ[CAMERA_DETECTION_ENV].split("|")
+    CAMERA_DEV, DETECTED_WIDTH, DETECTED_HEIGHT = _dev or None, int(_width), int(_height)
+else:
+    CAMERA_DEV, DETECTED_WIDTH, DETECTED_HEIGHT = detect_stereo_camera()
 
 # ⵽ͷ·ֱ
 if CAMERA_DEV and DETECTED_WIDTH > 0:
@@ -100,15 +123,23 @@ class GlobalState:
     
     def _init_state(self):
         self.preview_running = False
-        self.current_cam = 0  # 0: 1:ͷ 2:ͷ
+        self.current_cam = 0  # 0: 1:ͷ 2:ͷ 3:ͼ
         self.frame_lock = threading.Lock()
         self.raw_frame = None
+        self.frame_seq = 0  # ԭʼ֡ţÿһraw_frame1
         self.preview_label = None
         
         # 
         self.has_click = False
         self.click_point = (-1, -1)
         self.distance = 0.0
+        self.distance_request_id = 0  # ǰӦĲID
+        self.distance_frame_seq = 0   # ǰõ֡
+        self.distance_reason = "ok"   # ʧԭ֡ԭ룩
+        self.tracking = False         # ǷĿ
+        self.distance_details = None  # /ϸRegionStats/PointDistances.to_dict()ʱΪNone
+        self.select_rect = None       # ϶ѡԤ x0, y0, x1, y1
+        self.measure_points = []      # ģʽѵĵ㣨Ԥ꣩
         self.distance_lock = threading.Lock()
         
         # ʾ֡
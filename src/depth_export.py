@@ -0,0 +1,228 @@
+# -*- coding: gbk -*-
+"""
+ӲͼƵ
+У16ӲͼΪ16λPNGֵ = Ӳ x 160ΪЧ
+ͶӰĵƣQõXYZreprojectImageTo3Dһ£УͼɫΪPLY
+һJSON¼СQι߿PNGͶӰ
+
+ưзֿ黻д룺ÿЧһдѭҲͼСмƣ
+дں̨߳нУɼֻ߳ύ
+"""
+import os
+import json
+import time
+import queue
+import threading
+import numpy as np
+import cv2
+from log_manager import LogManager
+from common import EXPORT_DIR, g_state
+from region_stats import REGION_MIN_DEPTH, REGION_MAX_DEPTH
+
+# Ʒֿ
+EXPORT_CHUNK_ROWS = 64
+# ̨дгȣдʱµĵ÷
+EXPORT_MAX_PENDING = 2
+# Ĭϼ룩С
+EXPORT_STREAM_INTERVAL = 1.0
+EXPORT_STREAM_SCALE = 2
+
+# PLYʽfloat32꣨ף+ uint8ɫС˽
+PLY_VERTEX_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"),
+                             ("red", "u1"), ("green", "u1"), ("blue", "u1")])
+
+
+class DisparityFrame:
+    """һ֡Ӳ16ӲͼУͼBGRСӦDepthLUT"""
+    def __init__(self, disparity: np.ndarray, left: np.ndarray, scale: int, lut, timestamp: float = None):
+        self.disparity = disparity
+        self.left = left
+        self.scale = scale
+        self.lut = lut
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+
+def write_disparity_png(path: str, disparity: np.ndarray) -> bool:
+    """16ӲͼΪ16λPNGЧӲֵдΪ0"""
+    return cv2.imwrite(path, disparity.clip(0).view(np.uint16))
+
+
+def _chunk_mask(lut, raw_chunk: np.ndarray) -> np.ndarray:
+    depth = lut.to_depth(raw_chunk)
+    return (depth > REGION_MIN_DEPTH) & (depth < REGION_MAX_DEPTH)
+
+
+def write_ply(path: str, frame: DisparityFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    """
+    ƱΪPLYbinary_little_endianֻЧȷΧڵĵ
+
+    Returns:
+        дĵ
+    """
+    disparity, colors, lut = frame.disparity, frame.left, frame.lut
+    rows = range(0, disparity.shape[0], chunk_rows)
+    # PLYͷҪͳƣֻȱд
+    count = sum(int(np.count_nonzero(_chunk_mask(lut, disparity[r:r + chunk_rows]))) for r in rows)
+    header = ("ply\nformat binary_little_endian 1.0\n"
+              f"comment stereo point cloud, scale 1/{frame.scale}\n"
+              f"element vertex {count}\n"
+              "property float x\nproperty float y\nproperty float z\n"
+              "property uchar red\nproperty uchar green\nproperty uchar blue\n"
+              "end_header\n")
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        for r in rows:
+            points = lut.to_points(disparity[r:r + chunk_rows], 0, r)
+            depth = points[..., 2]
+            mask = (depth > REGION_MIN_DEPTH) & (depth < REGION_MAX_DEPTH)
+            n = int(np.count_nonzero(mask))
+            if n == 0:
+                continue
+            vertices = np.empty(n, dtype=PLY_VERTEX_DTYPE)
+            selected = points[mask]
+            vertices["x"], vertices["y"], vertices["z"] = selected[:, 0], selected[:, 1], selected[:, 2]
+            bgr = colors[r:r + chunk_rows][mask]
+            vertices["red"], vertices["green"], vertices["blue"] = bgr[:, 2], bgr[:, 1], bgr[:, 0]
+            f.write(vertices.tobytes())
+    return count
+
+
+class DepthExporter:
+    """̨̣߳ÿύд <>_disparity.png<>.ply  <>.json"""
+
+    def __init__(self, out_dir: str = EXPORT_DIR, max_pending: int = EXPORT_MAX_PENDING):
+        """
+        Args:
+            out_dir: Ŀ¼ʱԶ
+            max_pending: ȴдĵޣʱµύ
+        """
+        self._out_dir = out_dir
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._written = 0
+
+    @property
+    def out_dir(self) -> str:
+        return self._out_dir
+
+    @property
+    def written(self) -> int:
+        """ɵĵ"""
+        return self._written
+
+    @property
+    def busy(self) -> bool:
+        """д"""
+        return self._queue.full()
+
+    def start(self):
+        """д߳"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer_func, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """дύĵֹͣ"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=10.0)
+
+    def submit(self, frame: DisparityFrame, stem: str = None):
+        """
+        ύһε÷֮޸frameе飩
+
+        Returns:
+            ļǰ׺дʱNone
+        """
+        if stem is None:
+            stem = time.strftime("depth_%Y%m%d_%H%M%S", time.localtime(frame.timestamp)) + \
+                   f"_{int(frame.timestamp * 1000) % 1000:03d}"
+        try:
+            self._queue.put_nowait((frame, stem))
+        except queue.Full:
+            LogManager.append_log(f"Export {stem} dropped (writer busy)", "WARN")
+            return None
+        return stem
+
+    def _writer_func(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            frame, stem = item
+            start = time.time()
+            try:
+                os.makedirs(self._out_dir, exist_ok=True)
+                base = os.path.join(self._out_dir, stem)
+                write_disparity_png(base + "_disparity.png", frame.disparity)
+                count = write_ply(base + ".ply", frame)
+                with open(base + ".json", "w", encoding="utf-8") as f:
+                    json.dump({"timestamp": frame.timestamp, "scale": frame.scale, "disparity_scale": 16,
+                               "points": count, "Q": frame.lut.Q.tolist()}, f, indent=2)
+            except Exception as e:
+                # εΨһд߳
+                LogManager.append_log(f"Error: Export {stem} failed: {e!r}", "ERROR")
+                continue
+            self._written += 1
+            LogManager.append_log(f"Exported {stem} ({count} points) to {self._out_dir} "
+                                  f"in {(time.time() - start) * 1000:.0f} ms", "INFO")
+
+
+class LiveDepthExport:
+    """̶̣߳Եǰ֡ӲύDepthExporter"""
+
+    def __init__(self, ranging_calculator, exporter: DepthExporter, interval: float = EXPORT_STREAM_INTERVAL,
+                 scale: int = EXPORT_STREAM_SCALE, measure_lock: threading.Lock = None):
+        """
+        Args:
+            ranging_calculator: RangingCalculatorʵ
+            exporter: DepthExporter
+            interval: 룩
+            scale: ӲСRECTIFY_SCALES֮һ
+            measure_lock: ѡĲ໥ãͬһʱֻһSGBM
+        """
+        self._calculator = ranging_calculator
+        self._exporter = exporter
+        self._interval = interval
+        self._scale = scale
+        self._measure_lock = measure_lock or threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._export_func, daemon=True)
+            self._thread.start()
+            LogManager.append_log(f"Live depth export started (every {self._interval:.1f} s, 1/{self._scale} "
+                                  f"resolution) to {self._exporter.out_dir}", "INFO")
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop_event.set()
+            thread.join(timeout=5.0)
+            LogManager.append_log("Live depth export stopped", "INFO")
+
+    def _export_func(self):
+        frame_seq = 0
+        while not self._stop_event.wait(self._interval):
+            with g_state.frame_lock:
+                frame, seq = g_state.raw_frame, g_state.frame_seq
+            # ֡дʱΣƥ
+            if frame is None or seq == frame_seq or self._exporter.busy:
+                continue
+            frame_seq = seq
+            try:
+                with self._measure_lock:
+                    result = self._calculator.compute_disparity_frame(frame, self._scale)
+            except Exception as e:
+                # μʱΣһ
+                LogManager.append_log(f"Error: Live depth export failed: {e!r}", "ERROR")
+                continue
+            self._exporter.submit(result)
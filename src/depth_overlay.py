@@ -0,0 +1,153 @@
+# -*- coding: gbk -*-
+"""
+ʵʱͷֱͼԤģʽ3
+̨̰߳Ŀ֡СͼϼӲIncrementalDisparityֹû棩
+ȲұԤֱʵαɫͼ졢ԶЧӲɫ
+ɼֻ߳һλϣԤ֡ʲƥʱӰ
+
+ͼλУͼУԭʼͼԤ֮΢Ļ죬ֱ۲鿴Чݵķֲ
+"""
+import time
+import threading
+import numpy as np
+import cv2
+from log_manager import LogManager
+from common import PREVIEW_WIDTH, PREVIEW_HEIGHT, g_state
+from incremental_disparity import IncrementalDisparity
+from ranging_worker import FRAME_POLL_INTERVAL
+
+# Ԥģʽţ0: 1:ͷ 2:ͷ
+DEPTH_OVERLAY_MODE = 3
+# ƥʹõСRECTIFY_SCALES֮һ
+DEPTH_OVERLAY_SCALE = 4
+# ͼĿˢ֡
+DEPTH_OVERLAY_FPS = 5.0
+# ͼȨ
+DEPTH_OVERLAY_ALPHA = 0.5
+# αɫӳȷΧףӲȵɫ
+DEPTH_OVERLAY_NEAR = 0.3
+DEPTH_OVERLAY_FAR = 5.0
+
+
+def colorize_depth(depth: np.ndarray, near: float = DEPTH_OVERLAY_NEAR, far: float = DEPTH_OVERLAY_FAR) -> tuple:
+    """
+    ͼףЧΪ0תΪαɫͼ
+
+    Returns:
+        tuple: (BGRαɫͼ, Ч)
+    """
+    valid = depth > 0
+    inv_depth = np.divide(1.0, depth, out=np.zeros(depth.shape, dtype=np.float32), where=valid)
+    level = (inv_depth - 1.0 / far) * (255.0 / (1.0 / near - 1.0 / far))
+    color = cv2.applyColorMap(np.clip(level, 0, 255).astype(np.uint8), cv2.COLORMAP_JET)
+    return color, valid
+
+
+class DepthOverlay:
+    """
+    ͼstartں̨߳иg_state.raw_frameͼ
+    ɼ̵߳blendһεͼӵԤ֡
+    """
+
+    def __init__(self, ranging_calculator, scale: int = DEPTH_OVERLAY_SCALE, target_fps: float = DEPTH_OVERLAY_FPS,
+                 alpha: float = DEPTH_OVERLAY_ALPHA):
+        """
+        Args:
+            ranging_calculator: RangingCalculatorʵ
+            scale: ƥʹõС
+            target_fps: ͼĿˢ֡ʣƥʱʱʵٶˢ£
+            alpha: Ȩ
+        """
+        self._calculator = ranging_calculator
+        self._scale = scale
+        self._interval = 1.0 / target_fps
+        self._alpha = alpha
+        self._incremental = IncrementalDisparity(ranging_calculator, scale)
+        # (αɫͼ, Ч)滻ɼ߳
+        self._overlay = None
+        self._stats = {}
+        self._running = False
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def last_stats(self) -> dict:
+        """һθµͳƣˢ֡ʡЧرƥʱ"""
+        return dict(self._stats)
+
+    def start(self):
+        """̨߳"""
+        if self._running:
+            return
+        self._running = True
+        self._incremental.reset()
+        self._thread = threading.Thread(target=self._update_func, daemon=True)
+        self._thread.start()
+        LogManager.append_log(f"Depth overlay started (1/{self._scale} resolution, {1.0 / self._interval:.0f} fps)", "INFO")
+
+    def stop(self):
+        """ֹͣ²ͼ"""
+        self._running = False
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        self._overlay = None
+        self._stats = {}
+
+    def blend(self, frame_show: np.ndarray):
+        """һεͼԭصӵԤ֡BGRԤֱʣЧ"""
+        overlay = self._overlay
+        if overlay is None:
+            return
+        color, mask = overlay
+        blended = cv2.addWeighted(frame_show, 1.0 - self._alpha, color, self._alpha, 0.0)
+        np.copyto(frame_show, blended, where=mask)
+
+    def _update_func(self):
+        frame_seq = 0
+        last_update = 0.0
+        while self._running:
+            wait = last_update + self._interval - time.time()
+            if wait > 0:
+                time.sleep(min(wait, self._interval))
+                continue
+            with g_state.frame_lock:
+                frame, seq = g_state.raw_frame, g_state.frame_seq
+            if frame is None or seq == frame_seq:
+                time.sleep(FRAME_POLL_INTERVAL)
+                continue
+            previous, last_update, frame_seq = last_update, time.time(), seq
+            try:
+                self.update(frame, last_update - previous)
+            except Exception as e:
+                # θ³ʱһεͼһͼ¼
+                LogManager.append_log(f"Error: Depth overlay update failed: {e!r}", "ERROR")
+                self._incremental.reset()
+
+    def update(self, frame: np.ndarray, period: float = 0.0, full: bool = False):
+        """
+        һ֡ͼ̨̰߳Ŀ֡ʵã
+
+        Args:
+            frame: ƴӵԭʼ֡
+            period: һθµļ룩ͳˢ֡
+            full: 棬ͼ¼
+        """
+        start = time.time()
+        if full:
+            self._incremental.reset()
+        disparity = self._incremental.update(frame)
+        depth = self._calculator.depth_lut(self._scale).to_depth(disparity)
+        color, valid = colorize_depth(depth)
+        size = (PREVIEW_WIDTH, PREVIEW_HEIGHT)
+        color = cv2.resize(color, size, interpolation=cv2.INTER_NEAREST)
+        mask = cv2.resize(valid.view(np.uint8), size, interpolation=cv2.INTER_NEAREST).astype(bool)
+        self._overlay = (color, mask[..., None])
+        self._stats = {
+            "fps": round(1.0 / period, 1) if 0 < period < 60 else 0.0,
+            "valid_ratio": round(float(np.count_nonzero(valid)) / valid.size, 3),
+            "elapsed_ms": round((time.time() - start) * 1000.0, 1),
+        }
@@ -0,0 +1,104 @@
+# -*- coding: gbk -*-
+"""
+ǰ֡
+Сͼϼ㼸ָ꣨عСȡǿȣ
+SGBM֮ǰжϸܷ֡õЧӲʱԭ
+"""
+import cv2
+import numpy as np
+
+# ԭ
+QUALITY_OK = "ok"
+QUALITY_UNDEREXPOSED = "underexposed"
+QUALITY_OVEREXPOSED = "overexposed"
+QUALITY_BLURRED = "blurred"
+QUALITY_LOW_TEXTURE = "low_texture"
+# ɵȴһ֡Եԭ˶ģͨǶݵģ
+DEFERRABLE_REASONS = (QUALITY_BLURRED,)
+
+# ȼʹõСȣأ
+QUALITY_SMALL_WIDTH = 320
+# Сͼ˹ޣڴֵΪģ
+QUALITY_BLUR_MIN = 50.0
+# 뾶ԭʼֱأ
+QUALITY_ROI_RADIUS = 32
+# ڲأ<=5  >=250
+QUALITY_CLIP_MAX = 0.5
+# ˮƽݶƽֵޣڴֵΪ
+QUALITY_TEXTURE_MIN = 4.0
+
+
+class FrameQuality:
+    """֡"""
+    def __init__(self, reason: str, blur: float, clipped_low: float, clipped_high: float, texture: float):
+        self.reason = reason
+        self.blur = blur
+        self.clipped_low = clipped_low
+        self.clipped_high = clipped_high
+        self.texture = texture
+
+    @property
+    def ok(self) -> bool:
+        return self.reason == QUALITY_OK
+
+    @property
+    def deferrable(self) -> bool:
+        return self.reason in DEFERRABLE_REASONS
+
+    def to_dict(self) -> dict:
+        return {
+            "reason": self.reason,
+            "blur": round(self.blur, 1),
+            "clipped_low": round(self.clipped_low, 3),
+            "clipped_high": round(self.clipped_high, 3),
+            "texture": round(self.texture, 2),
+        }
+
+
+def check_frame_quality(left_frame: np.ndarray, raw_point: tuple, raw_rect: tuple = None) -> FrameQuality:
+    """
+    ͼڵ㣨򣩴ܷõЧӲʱԼ1ms
+
+    Args:
+        left_frame: ԭʼͼBGR
+        raw_point: ͼԭʼ (x, y)
+        raw_rect: ѡͼԭʼ (x0, y0, x1, y1)ָʱǵ
+
+    Returns:
+        FrameQualityreasonΪQUALITY_OKʾԼƥ
+    """
+    if raw_rect is None:
+        # 
+        x, y = raw_point
+        r = QUALITY_ROI_RADIUS
+        roi = left_frame[max(0, y - r):y + r + 1, max(0, x - r):x + r + 1]
+    else:
+        h, w = left_frame.shape[:2]
+        x0, x1 = sorted((int(raw_rect[0]), int(raw_rect[2])))
+        y0, y1 = sorted((int(raw_rect[1]), int(raw_rect[3])))
+        x0, y0 = min(max(x0, 0), w - 1), min(max(y0, 0), h - 1)
+        roi = left_frame[y0:min(max(y1, y0 + 1), h), x0:min(max(x1, x0 + 1), w)]
+    roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    clipped_low = float(np.count_nonzero(roi <= 5)) / roi.size
+    clipped_high = float(np.count_nonzero(roi >= 250)) / roi.size
+    # ƥˮƽ
+    grad_x = cv2.Sobel(roi, cv2.CV_16S, 1, 0, ksize=3)
+    texture = float(np.abs(grad_x).mean())
+
+    # ֡ȣ˶ģͨӰ֡
+    height = max(1, left_frame.shape[0] * QUALITY_SMALL_WIDTH // left_frame.shape[1])
+    small = cv2.resize(left_frame, (QUALITY_SMALL_WIDTH, height), interpolation=cv2.INTER_AREA)
+    small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    blur = float(cv2.Laplacian(small, cv2.CV_32F).var())
+
+    if clipped_low > QUALITY_CLIP_MAX:
+        reason = QUALITY_UNDEREXPOSED
+    elif clipped_high > QUALITY_CLIP_MAX:
+        reason = QUALITY_OVEREXPOSED
+    elif blur < QUALITY_BLUR_MIN:
+        reason = QUALITY_BLURRED
+    elif texture < QUALITY_TEXTURE_MIN:
+        reason = QUALITY_LOW_TEXTURE
+    else:
+        reason = QUALITY_OK
+    return FrameQuality(reason, blur, clipped_low, clipped_high, texture)
@@ -0,0 +1,346 @@
+# -*- coding: gbk -*-
+"""
+ڴ˫Ŀ֡λ
+ɼ̰ÿ֡д multiprocessing.shared_memory еĻβλ
+̣ࡢ¼޽񣩰ƹغֱӶȡpickle֡
+
+ڴ沼֣64ֽڶ룩:
+    ȫͷ  int64[8]: magic, version, λ, (ֽ), ֡, дPID, ʱ(ns), 
+    ÿλ int64[8]: ˳, ֡, ʱ(ns), , , ͨ, dtype, ֽ
+             + ֡
+˳seqlock: дǰ1Ϊдټ1Ϊż
+ȡڶǰһΣͬΪżʱ
+д뷽رʱmagic㣬ȡݴˣд뷽PID/ʱı仯ֻѱ´
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from common import STEREO_WIDTH, STEREO_HEIGHT
+
+DEFAULT_RING_NAME = "stereo_frames"
+DEFAULT_RING_SLOTS = 4
+RING_MAGIC = 0x53544652  # "STFR"
+RING_VERSION = 1
+HEADER_SIZE = 64
+# ȡʱдĲλԴ
+READ_RETRIES = 8
+# ȴ֡ʱѯ룩
+POLL_INTERVAL = 0.001
+
+_DTYPES = {1: np.uint8, 2: np.uint16, 3: np.float32}
+_DTYPE_CODES = {np.dtype(v): k for k, v in _DTYPES.items()}
+
+
+def _pid_alive(pid: int) -> bool:
+    """Ƿ"""
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # ̴ڵû
+        return True
+    return True
+
+
+def _align(size: int) -> int:
+    return (size + HEADER_SIZE - 1) // HEADER_SIZE * HEADER_SIZE
+
+
+# ʱʱ滻resource_tracker.register봴ڴ滥
+_TRACKER_LOCK = threading.Lock()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """ѴڵĹڴ棬Ҳresource_trackerڱ˳ʱɾ"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # 3.13֮ǰҲע᣻עעspawnӽвã
+    # ӽд뷽ͬһresource_trackerעд뷽עһȥ
+    from multiprocessing import resource_tracker
+    with _TRACKER_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class _FrameRing:
+    """λĹ֣ͷλͼ"""
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self._shm = shm
+        self._header = np.ndarray((8,), dtype=np.int64, buffer=shm.buf)
+        self._slots = int(self._header[2])
+        self._capacity = int(self._header[3])
+        self._stride = HEADER_SIZE + _align(self._capacity)
+        self._slot_headers = [np.ndarray((8,), dtype=np.int64, buffer=shm.buf, offset=HEADER_SIZE + i * self._stride)
+                              for i in range(self._slots)]
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def latest_seq(self) -> int:
+        """д֡ţ1ʼ0ʾ֡"""
+        return int(self._header[4])
+
+    @property
+    def writer_id(self) -> tuple:
+        """д뷽ʶ (PID, ʱns)д뷽´ı"""
+        return int(self._header[5]), int(self._header[6])
+
+    def _slot_data(self, slot: int, shape: tuple, dtype) -> np.ndarray:
+        offset = HEADER_SIZE + slot * self._stride + HEADER_SIZE
+        return np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+
+    def _release_views(self):
+        self._header = None
+        self._slot_headers = []
+
+
+class FrameRingWriter(_FrameRing):
+    """дˣÿֻһд̣"""
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, slots: int = DEFAULT_RING_SLOTS,
+                 max_frame_bytes: int = STEREO_WIDTH * STEREO_HEIGHT * 3):
+        """
+        Args:
+            name: ڴƣȡƹ
+            slots: λȡ㿽е֡ slots-1 ֮֡ڲᱻ
+            max_frame_bytes: ֽ֡
+        """
+        size = HEADER_SIZE + slots * (HEADER_SIZE + _align(max_frame_bytes))
+        try:
+            with _TRACKER_LOCK:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._remove_stale(name)
+            with _TRACKER_LOCK:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((8,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (RING_MAGIC, RING_VERSION, slots, max_frame_bytes, 0, os.getpid(), time.time_ns(), 0)
+        del header
+        super().__init__(shm)
+        for slot_header in self._slot_headers:
+            slot_header[:] = 0
+        # дرջ⣬رպдֱӺ
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @staticmethod
+    def _remove_stale(name: str):
+        """
+        ɾϴ쳣˳ͬ
+
+        Raises:
+            FileExistsError: дУƱĹڴռ
+        """
+        shm = _attach(name)
+        header = np.ndarray((8,), dtype=np.int64, buffer=shm.buf)
+        magic, pid = int(header[0]), int(header[5])
+        del header
+        if magic == RING_MAGIC and _pid_alive(pid):
+            shm.close()
+            raise FileExistsError(f"Frame ring '{name}' is in use by process {pid}")
+        if magic not in (RING_MAGIC, 0):
+            shm.close()
+            raise FileExistsError(f"Shared memory '{name}' exists and is not a stereo frame ring")
+        shm.close()
+        shm.unlink()
+
+    def write(self, frame: np.ndarray, timestamp: float = None) -> int:
+        """
+        дһ֡һڴ濽
+
+        Returns:
+            ֡ţ֡dtype֧ʱ0
+        """
+        dtype_code = _DTYPE_CODES.get(frame.dtype)
+        if dtype_code is None or frame.nbytes > self._capacity or frame.ndim not in (2, 3):
+            return 0
+        with self._lock:
+            if self._closed:
+                return 0
+            return self._write(frame, dtype_code, timestamp)
+
+    def _write(self, frame: np.ndarray, dtype_code: int, timestamp: float) -> int:
+        seq = self.latest_seq + 1
+        slot_header = self._slot_headers[seq % self._slots]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        slot_header[0] += 1  # д
+        np.copyto(self._slot_data(seq % self._slots, frame.shape, frame.dtype), frame)
+        slot_header[1:] = (seq, int((timestamp if timestamp is not None else time.time()) * 1e9),
+                           frame.shape[0], frame.shape[1], channels, dtype_code, frame.nbytes)
+        slot_header[0] += 1  # żд
+        self._header[4] = seq
+        return seq
+
+    def close(self):
+        """رղɾڴ"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # ԹŵĶȡݴ˵֪ʧЧ
+            self._header[0] = 0
+            self._release_views()
+            self._shm.close()
+            self._shm.unlink()
+
+
+class FrameRingReader(_FrameRing):
+    """ȡˣй"""
+
+    def __init__(self, name: str = DEFAULT_RING_NAME):
+        shm = _attach(name)
+        header = np.ndarray((8,), dtype=np.int64, buffer=shm.buf)
+        magic, version = int(header[0]), int(header[1])
+        del header
+        if magic != RING_MAGIC or version > RING_VERSION:
+            shm.close()
+            raise ValueError(f"Not a stereo frame ring (or unsupported version): {name}")
+        super().__init__(shm)
+
+    def read_latest(self, copy: bool = True):
+        """
+        ȡһ֡
+
+        Args:
+            copy: Falseʱعڴϵͼ㿽ʹӦ is_valid(seq) ȷڼδ
+
+        Returns:
+            tuple: (֡, ʱ(), ֡)֡ԶдеĲλʱNone
+        """
+        return self._read(None, copy)
+
+    def read_seq(self, seq: int, copy: bool = True):
+        """
+        ȡָŵ֡ڻλʱ
+
+        Returns:
+            tuple: (֡, ʱ(), ֡)֡ѱʱNone
+        """
+        return self._read(seq, copy)
+
+    def _read(self, wanted_seq, copy: bool):
+        for _ in range(READ_RETRIES):
+            seq = self.latest_seq if wanted_seq is None else wanted_seq
+            if seq == 0 or seq > self.latest_seq:
+                return None
+            slot = seq % self._slots
+            slot_header = self._slot_headers[slot]
+            lock = int(slot_header[0])
+            if lock % 2 == 1:
+                continue
+            if int(slot_header[1]) != seq:
+                if wanted_seq is not None:
+                    return None
+                continue
+            _, _, timestamp_ns, height, width, channels, dtype_code, _ = (int(v) for v in slot_header)
+            shape = (height, width, channels) if channels > 1 else (height, width)
+            frame = self._slot_data(slot, shape, _DTYPES[dtype_code])
+            if copy:
+                frame = frame.copy()
+            if int(slot_header[0]) == lock:
+                return seq, timestamp_ns / 1e9, frame
+        return None
+
+    @property
+    def writer_closed(self) -> bool:
+        """д뷽ѹرղɾ֮Ҫ¹أ"""
+        return int(self._header[0]) != RING_MAGIC
+
+    def is_valid(self, seq: int) -> bool:
+        """㿽ȡ֡Ƿδ"""
+        slot_header = self._slot_headers[seq % self._slots]
+        return int(slot_header[0]) % 2 == 0 and int(slot_header[1]) == seq
+
+    def wait_for_frame(self, last_seq: int, timeout: float = 1.0) -> bool:
+        """ȴŴlast_seq֡ʱFalse"""
+        deadline = time.time() + timeout
+        while self.latest_seq <= last_seq:
+            if time.time() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def close(self):
+        """Ͽأɾڴ棩㿽ͼʱӳ䱣˳"""
+        self._release_views()
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+
+
+class SharedFrameSource:
+    """
+    cv2.VideoCaptureӿڼݵĹڴ֡Դ
+    ͨ CameraManager.set_frame_source һʹòɼ̷֡
+    """
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, timeout: float = 1.0):
+        self._name = name
+        self._timeout = timeout
+        self._last_seq = 0
+        self._reader = self._open_reader()
+
+    def _open_reader(self):
+        try:
+            return FrameRingReader(self._name)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _reattach(self) -> bool:
+        """д뷽ͬ´¹أǷ񻻳µĻ"""
+        reader = self._open_reader()
+        if reader is None:
+            return False
+        if self._reader is not None and reader.writer_id == self._reader.writer_id:
+            reader.close()
+            return False
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = reader
+        self._last_seq = 0
+        return True
+
+    def isOpened(self) -> bool:
+        return self._reader is not None
+
+    def read(self) -> tuple:
+        if self._reader is None or self._reader.writer_closed:
+            if not self._reattach():
+                time.sleep(min(self._timeout, 0.1))
+                return False, None
+        if not self._reader.wait_for_frame(self._last_seq, self._timeout):
+            # ʱû֡д뷽˳´˻
+            if not self._reattach() or not self._reader.wait_for_frame(self._last_seq, self._timeout):
+                return False, None
+        # ֡ᱻɼ̳̽߳ڳУ�һݣpickle
+        result = self._reader.read_latest(copy=True)
+        if result is None:
+            return False, None
+        self._last_seq = result[0]
+        return True, result[2]
+
+    def set(self, prop_id: int, value) -> bool:
+        return False
+
+    def get(self, prop_id: int) -> float:
+        return 0.0
+
+    def release(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
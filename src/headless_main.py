@@ -0,0 +1,411 @@
+# -*- coding: gbk -*-
+"""
+޽
+PySide6פͷɼ + RangingCalculator
+ӱ׼򱾵Unix׽ֽղÿһJSONJSON
+
+ʾ:
+    {"id": 1, "cmd": "measure", "x": 320, "y": 180}              # Ԥ
+    {"id": 2, "cmd": "measure", "x": 640, "y": 360, "coords": "raw"}  # ԭʼͼ
+    {"id": 5, "cmd": "measure", "x": 320, "y": 180, "scale": 4}   # 1/4ֱϲࣨӳ٣
+    {"id": 6, "cmd": "measure", "x": 320, "y": 180, "quality_check": false}  # ֡
+    {"id": 9, "cmd": "measure", "rect": [280, 150, 360, 210]}   # ࣨλλֱͼҲ֧coords/scale
+    {"id": 10, "cmd": "measure", "points": [[200, 150], [420, 160]]}  # ͬһ֡ϲڵά
+    {"id": 7, "cmd": "track", "x": 320, "y": 180}   # Ŀ겢ࣨstatustrackingֶΣ
+    {"id": 8, "cmd": "track", "stop": true}           # ֹͣ
+    {"id": 11, "cmd": "motion", "enable": true}       # /ر˶Զ࣬¼ʡenableʱֻѯ
+    {"id": 12, "cmd": "export"}                        # һβӲͼ16λPNGƣPLY
+    {"id": 13, "cmd": "export", "stream": true, "interval": 1.0, "scale": 2}  # "stream": falseֹͣ
+    {"id": 3, "cmd": "status"}
+    {"id": 4, "cmd": "logs"}
+    {"cmd": "quit"}
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import socketserver
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+# ׼ڷؽӡϢȫתstderr
+_RESULT_OUT = sys.stdout
+sys.stdout = sys.stderr
+
+from common import STEREO_WIDTH, STEREO_HEIGHT, EXPORT_DIR, g_state, get_calibration_path
+from camera_manager import CameraManager
+from ranging_calculator import RangingCalculator, RECTIFY_SCALES
+from calibration_watcher import CalibrationWatcher
+from target_tracking import TrackingRanger
+from motion_ranging import MotionRanger
+from depth_export import DepthExporter, LiveDepthExport, EXPORT_STREAM_INTERVAL, EXPORT_STREAM_SCALE
+from log_manager import LogManager
+
+DEFAULT_CALIB_FILE = get_calibration_path()
+
+
+class HeadlessRangingService:
+    """޽񣺹ɼ̲߳"""
+
+    def __init__(self, calib_path: str = DEFAULT_CALIB_FILE, synthetic: bool = False, watch_calib: bool = True,
+                 attach_frames: str = None, publish_frames: str = None, auto_motion: bool = False,
+                 motion_log: str = None, export_dir: str = EXPORT_DIR, export_interval: float = None):
+        """
+        Args:
+            calib_path: 궨ļ궨Ŀ¼
+            synthetic: ʹúϳ֡Դͷ
+            watch_calib: 궨ļ仯ʱԶ¼
+            attach_frames: ӸƵĹڴ֡ȡ֡һ̲ɼͷ
+            publish_frames: ɼ֡ƵĹڴ֡
+            auto_motion: ʱ˶Զ
+            motion_log: ˶¼ļ·ÿ¼׷һJSON
+            export_dir: ӲͼƵĵĿ¼
+            export_interval: ָʱ󰴴˼룩
+        """
+        self._camera_manager = CameraManager(render_preview=False)
+        self._ranging_calculator = RangingCalculator()
+        # ͬһʱֻһSGBMCPU
+        self._measure_lock = threading.Lock()
+        self._tracking_ranger = TrackingRanger(self._ranging_calculator)
+        self._motion_ranger = MotionRanger(self._ranging_calculator, measure_lock=self._measure_lock,
+                                           event_log=motion_log)
+        self._auto_motion = auto_motion
+        self._exporter = DepthExporter(export_dir)
+        self._live_export = None
+        self._export_interval = export_interval
+        self._running = False
+
+        if synthetic:
+            from synthetic_stereo import SyntheticStereoSource
+            self._camera_manager.set_frame_source(SyntheticStereoSource)
+        elif attach_frames:
+            from frame_ring import SharedFrameSource
+            self._camera_manager.set_frame_source(lambda: SharedFrameSource(attach_frames))
+        if publish_frames:
+            self._camera_manager.enable_frame_publisher(publish_frames)
+
+        # 궨ں̨أɼ
+        self._calib_path = calib_path
+        self._calib_watcher = CalibrationWatcher(self._ranging_calculator, calib_path) if watch_calib else None
+
+    def start(self):
+        self._ranging_calculator.load_calibration_async(self._calib_path, on_done=self._on_calibration_loaded)
+        if self._calib_watcher is not None:
+            self._calib_watcher.start()
+        self._camera_manager.start_preview(0)
+        self._running = True
+        if self._auto_motion:
+            self._motion_ranger.start()
+        self._exporter.start()
+        if self._export_interval:
+            self._start_live_export(self._export_interval, EXPORT_STREAM_SCALE)
+
+    def stop(self):
+        self._running = False
+        self._tracking_ranger.stop()
+        self._motion_ranger.stop()
+        if self._live_export is not None:
+            self._live_export.stop()
+        self._exporter.stop()
+        if self._calib_watcher is not None:
+            self._calib_watcher.stop()
+        self._camera_manager.stop_preview()
+        self._camera_manager.disable_frame_publisher()
+
+    def _on_calibration_loaded(self, success: bool):
+        if not success:
+            LogManager.append_log("Calibration load failed, using non-calibration mode", "WARN")
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def handle_request(self, request: dict) -> dict:
+        """󣬷ؿJSONлĽг쳣ʱش"""
+        cmd = request.get("cmd", "measure")
+        response = {"id": request.get("id"), "cmd": cmd}
+        try:
+            response.update(self._dispatch(cmd, request))
+        except Exception as e:
+            LogManager.append_log(f"Error: Request '{cmd}' failed: {e!r}", "ERROR")
+            response.update({"ok": False, "error": f"Internal error: {e}"})
+        return response
+
+    def _dispatch(self, cmd: str, request: dict) -> dict:
+        if cmd == "measure":
+            return self._measure(request)
+        elif cmd == "status":
+            with g_state.frame_lock:
+                has_frame = g_state.raw_frame is not None
+            return {
+                "ok": True,
+                "preview_running": g_state.preview_running,
+                "has_frame": has_frame,
+                "calibrated": self._ranging_calculator.is_calibrated,
+                "calibration_loading": self._ranging_calculator.calibration_loading,
+                "stereo_size": [STEREO_WIDTH, STEREO_HEIGHT],
+                "tracking": self._tracking_ranger.state(),
+                "motion": self._motion_ranger.state(limit=1),
+            }
+        elif cmd == "track":
+            return self._track(request)
+        elif cmd == "motion":
+            return self._motion(request)
+        elif cmd == "export":
+            return self._export(request)
+        elif cmd == "logs":
+            return {"ok": True, "logs": LogManager.get_log_lines()}
+        elif cmd == "quit":
+            self._running = False
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown command: {cmd}"}
+
+    def _track(self, request: dict) -> dict:
+        if request.get("stop"):
+            self._tracking_ranger.stop()
+            return {"ok": True, "tracking": False}
+        try:
+            point = (float(request["x"]), float(request["y"]))
+        except (KeyError, TypeError, ValueError):
+            return {"ok": False, "error": "Invalid click point"}
+        if not g_state.preview_running:
+            return {"ok": False, "error": "Camera is not running"}
+        self._tracking_ranger.start(point)
+        return {"ok": True, "tracking": True}
+
+    def _raw_point(self, request: dict, x: float, y: float) -> tuple:
+        """coordsתΪԭʼͼ"""
+        if request.get("coords", "preview") == "raw":
+            return (int(min(max(x, 0), STEREO_WIDTH // 2 - 1)), int(min(max(y, 0), STEREO_HEIGHT - 1)))
+        return self._ranging_calculator.preview_to_raw_point((x, y))
+
+    def _start_live_export(self, interval: float, scale: int):
+        if self._live_export is not None:
+            self._live_export.stop()
+        self._live_export = LiveDepthExport(self._ranging_calculator, self._exporter, interval, scale,
+                                            measure_lock=self._measure_lock)
+        self._live_export.start()
+
+    def _export(self, request: dict) -> dict:
+        stream = request.get("stream")
+        if stream is not None:
+            if not stream:
+                if self._live_export is not None:
+                    self._live_export.stop()
+                    self._live_export = None
+                return {"ok": True, "streaming": False}
+            try:
+                interval = float(request.get("interval", EXPORT_STREAM_INTERVAL))
+            except (TypeError, ValueError):
+                return {"ok": False, "error": "Invalid interval"}
+            scale = request.get("scale", EXPORT_STREAM_SCALE)
+            if scale not in RECTIFY_SCALES or interval <= 0:
+                return {"ok": False, "error": f"Invalid scale or interval (supported scales: {list(RECTIFY_SCALES)})"}
+            self._start_live_export(interval, int(scale))
+            return {"ok": True, "streaming": True, "dir": self._exporter.out_dir}
+
+        # εĬϵһβõӲͼδָ"frame": "current"ʱԵǰ֡
+        frame = self._ranging_calculator.last_disparity
+        if frame is None or request.get("frame") == "current":
+            scale = request.get("scale", 1)
+            if scale not in RECTIFY_SCALES:
+                return {"ok": False, "error": f"Invalid scale: {scale} (supported: {list(RECTIFY_SCALES)})"}
+            with g_state.frame_lock:
+                raw_frame = g_state.raw_frame
+            if raw_frame is None:
+                return {"ok": False, "error": "Empty frame"}
+            with self._measure_lock:
+                frame = self._ranging_calculator.compute_disparity_frame(raw_frame, int(scale))
+        stem = self._exporter.submit(frame)
+        if stem is None:
+            return {"ok": False, "error": "Export writer busy"}
+        return {"ok": True, "stem": stem, "dir": self._exporter.out_dir, "scale": frame.scale}
+
+    def _motion(self, request: dict) -> dict:
+        enable = request.get("enable")
+        if enable is not None:
+            if enable:
+                self._motion_ranger.start()
+            else:
+                self._motion_ranger.stop()
+        try:
+            limit = int(request.get("limit", 10))
+        except (TypeError, ValueError):
+            return {"ok": False, "error": "Invalid limit"}
+        return {"ok": True, **self._motion_ranger.state(limit)}
+
+    def _measure(self, request: dict) -> dict:
+        rect = request.get("rect")
+        points = request.get("points")
+        try:
+            if rect is not None:
+                x0, y0, x1, y1 = (float(v) for v in rect)
+            elif points is not None:
+                points = [(float(x), float(y)) for x, y in points]
+                if len(points) < 2:
+                    raise ValueError
+            else:
+                x = float(request["x"])
+                y = float(request["y"])
+        except (KeyError, TypeError, ValueError):
+            error = "Invalid rect" if rect is not None else "Invalid points" if points is not None else "Invalid click point"
+            return {"ok": False, "error": error}
+        scale = request.get("scale", 1)
+        if scale not in RECTIFY_SCALES:
+            return {"ok": False, "error": f"Invalid scale: {scale} (supported: {list(RECTIFY_SCALES)})"}
+        scale = int(scale)
+        quality_check = bool(request.get("quality_check", True))
+
+        with g_state.frame_lock:
+            if g_state.raw_frame is None:
+                return {"ok": False, "error": "Empty frame"}
+            raw_frame = g_state.raw_frame.copy()
+
+        start = time.time()
+        if rect is not None:
+            raw_rect = self._raw_point(request, x0, y0) + self._raw_point(request, x1, y1)
+            with self._measure_lock:
+                stats = self._ranging_calculator.measure_region(raw_frame, raw_rect, scale=scale,
+                                                                 quality_check=quality_check)
+            return {
+                "ok": stats.ok,
+                "distance": stats.median,
+                "region": stats.to_dict(),
+                "scale": scale,
+                "elapsed_ms": round((time.time() - start) * 1000.0, 1),
+                "timestamp": time.time(),
+            }
+        if points is not None:
+            raw_points = [self._raw_point(request, x, y) for x, y in points]
+            with self._measure_lock:
+                result = self._ranging_calculator.measure_points(raw_frame, raw_points, scale=scale,
+                                                                 quality_check=quality_check)
+            return {
+                "ok": result.ok,
+                "distance": result.total,
+                "points": result.to_dict(),
+                "scale": scale,
+                "elapsed_ms": round((time.time() - start) * 1000.0, 1),
+                "timestamp": time.time(),
+            }
+
+        raw_point = self._raw_point(request, x, y)
+        with self._measure_lock:
+            distance, quality = self._ranging_calculator.measure_frame_with_quality(
+                raw_frame, raw_point, scale=scale, quality_check=quality_check)
+        distance = float(distance)
+        return {
+            "ok": distance > 0,
+            "distance": distance,
+            "quality": quality.to_dict() if quality is not None else None,
+            "raw_point": list(raw_point),
+            "scale": scale,
+            "elapsed_ms": round((time.time() - start) * 1000.0, 1),
+            "timestamp": time.time(),
+        }
+
+
+def _handle_line(service: HeadlessRangingService, line: str) -> str:
+    line = line.strip()
+    if not line:
+        return ""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+    except ValueError as e:
+        return json.dumps({"ok": False, "error": f"Invalid request: {e}"})
+    return json.dumps(service.handle_request(request))
+
+
+def serve_stdin(service: HeadlessRangingService):
+    """ӱ׼жȡ"""
+    for line in sys.stdin:
+        reply = _handle_line(service, line)
+        if reply:
+            _RESULT_OUT.write(reply + "\n")
+            _RESULT_OUT.flush()
+        if not service.running:
+            break
+
+
+def serve_socket(service: HeadlessRangingService, socket_path: str):
+    """ڱUnix׽Ͻ"""
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw_line in self.rfile:
+                reply = _handle_line(service, raw_line.decode("utf-8", errors="replace"))
+                if reply:
+                    self.wfile.write((reply + "\n").encode("utf-8"))
+                if not service.running:
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    break
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, _Handler) as server:
+        server.daemon_threads = True
+        print(f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+def add_motion_arguments(parser: argparse.ArgumentParser):
+    """˶Զصв"""
+    parser.add_argument("--auto-motion", action="store_true",
+                        help="Automatically range moving objects detected by background subtraction")
+    parser.add_argument("--motion-log", metavar="PATH", help="Append each motion ranging event to this JSON Lines file")
+
+
+def add_export_arguments(parser: argparse.ArgumentParser):
+    """ӲͼƵصв"""
+    parser.add_argument("--export-dir", default=EXPORT_DIR, help="Directory for disparity PNG / point cloud PLY exports")
+    parser.add_argument("--export-interval", type=float, metavar="SECONDS",
+                        help="Continuously export the live disparity and point cloud at this interval")
+
+
+def add_frame_ring_arguments(parser: argparse.ArgumentParser):
+    """ڴ֡صв"""
+    from frame_ring import DEFAULT_RING_NAME
+    parser.add_argument("--attach-frames", nargs="?", const=DEFAULT_RING_NAME, metavar="NAME",
+                        help="Read frames from a shared-memory frame ring published by another process")
+    parser.add_argument("--publish-frames", nargs="?", const=DEFAULT_RING_NAME, metavar="NAME",
+                        help="Publish captured frames to a shared-memory frame ring")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless stereo ranging service (no Qt)")
+    parser.add_argument("--socket", help="Serve on this Unix socket path instead of stdin/stdout")
+    parser.add_argument("--calib", default=DEFAULT_CALIB_FILE, help="Calibration NPZ file or bundle directory")
+    parser.add_argument("--synthetic", action="store_true", help="Use the synthetic stereo source instead of a camera")
+    parser.add_argument("--no-watch", action="store_true", help="Do not reload the calibration when the file changes")
+    add_frame_ring_arguments(parser)
+    add_motion_arguments(parser)
+    add_export_arguments(parser)
+    args = parser.parse_args()
+
+    print("Starting QuecPi Stereo Camera Headless Service (Python)...")
+    service = HeadlessRangingService(args.calib, synthetic=args.synthetic, watch_calib=not args.no_watch,
+                                     attach_frames=args.attach_frames, publish_frames=args.publish_frames,
+                                     auto_motion=args.auto_motion, motion_log=args.motion_log,
+                                     export_dir=args.export_dir, export_interval=args.export_interval)
+    service.start()
+    try:
+        if args.socket:
+            serve_socket(service, args.socket)
+        else:
+            serve_stdin(service)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# -*- coding: gbk -*-
+"""
+ֿӲ㣨Ӳģʽ
+ڴ󲿷ֹĳУͼ񻮷Ϊֿ飬
+Сͼһ֡Ĳҳ仯ķֿ飬ֻԱ仯ֿ飨ص߾ࣩSGBM
+ֿûӲÿ̶֡ǿͼˢ£⻺仯ۻ
+"""
+import time
+import numpy as np
+import cv2
+from log_manager import LogManager
+from ranging_calculator import sgbm_num_disparities, create_stereo_sgbm, match_window_cols
+
+# ֿ x У
+TILE_COLS = 8
+TILE_ROWS = 4
+# 仯ʹõСԭʼֱʣС¼ͼߴͬ
+CHANGE_DOWNSCALE = 8
+# Сͼز˻ҶֵΪ仯
+CHANGE_PIXEL_THRESHOLD = 8
+# ֿڱ仯Сͼﵽֵʱƥ÷ֿ
+CHANGE_MIN_PIXELS = 2
+# ֿƥʱܶı߾ࣨԭʼֱأСС
+TILE_MARGIN = 32
+# ÿٴθǿͼˢ
+FULL_REFRESH_INTERVAL = 30
+# 仯ֵֿʱֱͼ㣨ֿ鿪ٻ㣩
+FULL_REFRESH_RATIO = 0.5
+
+
+class IncrementalDisparity:
+    """
+    ӲRangingCalculator.compute_disparity_frameͬʽ16Ӳͼ
+
+    ֿƥʱSGBMĴ۾ۺֻڲüڽУͼв죬߾ڼСֲ
+    """
+
+    def __init__(self, ranging_calculator, scale: int = 1, refresh_interval: int = FULL_REFRESH_INTERVAL):
+        """
+        Args:
+            ranging_calculator: RangingCalculatorʵṩ궨ԤSGBM
+            scale: СRECTIFY_SCALES֮һ
+            refresh_interval: ÿٴθǿͼˢ
+        """
+        self._calculator = ranging_calculator
+        self._scale = scale
+        self._refresh_interval = refresh_interval
+        self._margin = max(8, TILE_MARGIN // scale)
+        self._change_downscale = max(1, CHANGE_DOWNSCALE // scale)
+        self._sgbm = create_stereo_sgbm(scale)
+        self._num_disparities = sgbm_num_disparities(scale)
+        self._disparity = None
+        self._prev_small = None
+        self._calib_ref = None
+        self._updates_since_refresh = 0
+        self._last_stats = {}
+
+    @property
+    def disparity(self) -> np.ndarray:
+        """һε16ӲͼֻNoneʾδ㣩"""
+        return self._disparity
+
+    @property
+    def last_stats(self) -> dict:
+        """һθµͳƣƥķֿֿܷǷͼˢ¡ʱ"""
+        return dict(self._last_stats)
+
+    def reset(self):
+        """棬һθͼ"""
+        self._disparity = None
+        self._prev_small = None
+
+    def update(self, raw_frame: np.ndarray) -> np.ndarray:
+        """
+        µһ֡Ӳͼ
+
+        Args:
+            raw_frame: ƴӵԭʼ֡
+
+        Returns:
+            16Ӳͼint16һθʱᱻԭ޸ģҪʱ뿽
+        """
+        start = time.time()
+        # ҶͼΪƥڼ䲻Ӱ죻궨¼غDepthLUTı䣬ͼˢ
+        left_frame, right_frame, gray_left, gray_right, calib_ref = self._calculator.rectify_pair(raw_frame, self._scale)
+        small = self._downscale_pair(left_frame, right_frame)
+
+        tiles = self._tile_rects(gray_left.shape)
+        full = (self._disparity is None or self._disparity.shape != gray_left.shape or
+                calib_ref is not self._calib_ref or self._updates_since_refresh + 1 >= self._refresh_interval)
+        changed = tiles if full else self._changed_tiles(tiles, small)
+        if not full and len(changed) > FULL_REFRESH_RATIO * len(tiles):
+            full = True
+            changed = tiles
+
+        if full:
+            self._disparity = self._sgbm.compute(gray_left, gray_right)
+            self._updates_since_refresh = 0
+        else:
+            for x0, x1, y0, y1 in self._merge_row_runs(changed):
+                self._match_region(gray_left, gray_right, x0, x1, y0, y1)
+            self._updates_since_refresh += 1
+
+        self._prev_small = small
+        self._calib_ref = calib_ref
+        self._last_stats = {
+            "changed_tiles": len(changed),
+            "total_tiles": len(tiles),
+            "full_refresh": full,
+            "elapsed_ms": round((time.time() - start) * 1000.0, 1),
+        }
+        LogManager.append_log(f"[Debug] Incremental disparity: {len(changed)}/{len(tiles)} tiles"
+                              f"{' (full refresh)' if full else ''} in {self._last_stats['elapsed_ms']} ms", "DEBUG")
+        return self._disparity
+
+    def _downscale_pair(self, left_frame: np.ndarray, right_frame: np.ndarray) -> tuple:
+        """仯õСҶͼȡCLAHE֮ǰУͼCLAHEŴƽ̹"""
+        h, w = left_frame.shape[:2]
+        size = (max(1, w // self._change_downscale), max(1, h // self._change_downscale))
+        return tuple(cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+                     for frame in (left_frame, right_frame))
+
+    def _tile_rects(self, shape: tuple) -> list:
+        """ֿб [(к, x0, x1, y0, y1)]С˳"""
+        h, w = shape
+        xs = np.linspace(0, w, TILE_COLS + 1).astype(int)
+        ys = np.linspace(0, h, TILE_ROWS + 1).astype(int)
+        return [(row, xs[col], xs[col + 1], ys[row], ys[row + 1])
+                for row in range(TILE_ROWS) for col in range(TILE_COLS)]
+
+    def _changed_tiles(self, tiles: list, small: tuple) -> list:
+        """
+        ҳҪƥķֿ
+        ͼֿ [x0, x1) Ӳͼ [x0 - ӲΧ, x1)һ仯Ҫƥ
+        """
+        left_mask = cv2.absdiff(small[0], self._prev_small[0]) > CHANGE_PIXEL_THRESHOLD
+        right_mask = cv2.absdiff(small[1], self._prev_small[1]) > CHANGE_PIXEL_THRESHOLD
+        d = self._change_downscale
+        reach = self._num_disparities // d + 1
+        changed = []
+        for tile in tiles:
+            _, x0, x1, y0, y1 = tile
+            sx0, sx1, sy0, sy1 = x0 // d, -(-x1 // d), y0 // d, -(-y1 // d)
+            if (np.count_nonzero(left_mask[sy0:sy1, sx0:sx1]) >= CHANGE_MIN_PIXELS or
+                    np.count_nonzero(right_mask[sy0:sy1, max(0, sx0 - reach):sx1]) >= CHANGE_MIN_PIXELS):
+                changed.append(tile)
+        return changed
+
+    def _merge_row_runs(self, tiles: list) -> list:
+        """ͬһڵı仯ֿϲΪһ򣬼SGBMô"""
+        regions = []
+        for row, x0, x1, y0, y1 in tiles:
+            if regions and regions[-1][0] == row and regions[-1][2] == x0:
+                regions[-1][2] = x1
+            else:
+                regions.append([row, x0, x1, y0, y1])
+        return [tuple(region[1:]) for region in regions]
+
+    def _match_region(self, gray_left: np.ndarray, gray_right: np.ndarray, x0: int, x1: int, y0: int, y1: int):
+        """
+         [x0, x1) x [y0, y1) ƥ䲢дػ
+        üӲΧSGBMӲΧڵΪЧټӱ߾ࣻ
+        ԵʱҲSGBMҪС
+        """
+        h, w = gray_left.shape
+        m = self._margin
+        cols = match_window_cols(x0, x1, w, self._scale, m)
+        cx0, cx1 = cols.start, cols.stop
+        cy0 = max(0, y0 - m)
+        cy1 = min(h, y1 + m)
+        disparity = self._sgbm.compute(np.ascontiguousarray(gray_left[cy0:cy1, cx0:cx1]),
+                                       np.ascontiguousarray(gray_right[cy0:cy1, cx0:cx1]))
+        self._disparity[y0:y1, x0:x1] = disparity[y0 - cy0:y1 - cy0, x0 - cx0:x1 - cx0]
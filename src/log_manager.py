@@ -18,6 +18,12 @@ class LogManager:
         if len(cls._logs) > cls._max_lines:
             cls._logs.pop(0)
 
+    @classmethod
+    def append_lines(cls, lines: list):
+        cls._logs.extend(lines)
+        if len(cls._logs) > cls._max_lines:
+            del cls._logs[:len(cls._logs) - cls._max_lines]
+
     @classmethod
     def get_logs(cls) -> str:
   
@@ -16,9 +16,21 @@ def main():
     
     
     window = UIManager()
+    # --synthetic: ʹúϳ˫ĿͷӲԣ
+    if "--synthetic" in sys.argv:
+        from synthetic_stereo import SyntheticStereoSource
+        window.use_frame_source(SyntheticStereoSource)
+    # --publish-frames: ɼ֡ڴ棬޽̶ȡ
+    if "--publish-frames" in sys.argv:
+        window.publish_frames()
+    # --ranging-process: Ԥر궨Ķв࣬ڼԤ
+    if "--ranging-process" in sys.argv:
+        window.use_process_ranging()
     window.show()
     
-    return app.exec()
+    ret = app.exec()
+    window.stop_publishing_frames()
+    return ret
 
 
 if __name__ == "__main__":
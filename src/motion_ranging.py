@@ -0,0 +1,204 @@
+# -*- coding: gbk -*-
+"""
+˶Զֵࣨؼأ
+СԤҶͼбMOG2ֳ֡˶ʱ
+ԸӾһࣨRangingCalculator.measure_region
+ʱд־ȫ״̬ѡJSON Lines¼ļ
+ޱ仯ʱƥ
+"""
+import json
+import time
+import threading
+from collections import deque
+import cv2
+from log_manager import LogManager
+from common import PREVIEW_WIDTH, PREVIEW_HEIGHT, g_state
+from frame_quality import QUALITY_OK
+from ranging_worker import FRAME_POLL_INTERVAL
+from target_tracking import preview_gray
+
+# ˶ͼԤֱʵС
+MOTION_DOWNSCALE = 2
+# ģ͵ʷ֡뷽ֵMOG2
+MOTION_HISTORY = 200
+MOTION_VAR_THRESHOLD = 25
+# ģͽǰ֡
+MOTION_WARMUP_FRAMES = 30
+# ˶ޣռͼı
+MOTION_MIN_AREA = 0.002
+# ˶ֵ֡˵֡
+MOTION_MIN_FRAMES = 2
+# Զ֮С룩
+MOTION_COOLDOWN = 1.0
+# ¼
+MOTION_MAX_EVENTS = 50
+
+
+class MotionEvent:
+    """һ˶Ĳ"""
+    def __init__(self, timestamp: float, frame_seq: int, rect: tuple, area_ratio: float, stats):
+        """
+        Args:
+            timestamp: ֡ʱ䣨룬time.time()
+            frame_seq: ֡
+            rect: ˶Ԥ x0, y0, x1, y1
+            area_ratio: ˶ռͼı
+            stats: RegionStats
+        """
+        self.timestamp = timestamp
+        self.frame_seq = frame_seq
+        self.rect = rect
+        self.area_ratio = area_ratio
+        self.stats = stats
+
+    @property
+    def distance(self) -> float:
+        """λףЧӲΪ0"""
+        return self.stats.median if self.stats.ok else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "timestamp": round(self.timestamp, 3),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.timestamp)),
+            "frame_seq": self.frame_seq,
+            "rect": [int(v) for v in self.rect],
+            "area_ratio": round(self.area_ratio, 4),
+            "distance": round(self.distance, 4),
+            "region": self.stats.to_dict(),
+        }
+
+
+class MotionRanger:
+    """
+    ˶̣߳ÿ֡һαģͣ⵽˶ʱಢg_state.distance
+    """
+
+    def __init__(self, ranging_calculator, measure_lock: threading.Lock = None, scale: int = 1,
+                 cooldown: float = MOTION_COOLDOWN, event_log: str = None, on_event=None):
+        """
+        Args:
+            ranging_calculator: RangingCalculatorʵ
+            measure_lock: ѡĲ໥ãͬһʱֻһSGBM
+            scale: СRECTIFY_SCALES֮һ
+            cooldown: Զ֮С룩
+            event_log: ѡ¼ļ·ÿ¼׷һJSON
+            on_event: ѡص on_event(MotionEvent)ڼ߳е
+        """
+        self._calculator = ranging_calculator
+        self._measure_lock = measure_lock or threading.Lock()
+        self._scale = scale
+        self._cooldown = cooldown
+        self._event_log = event_log
+        self._on_event = on_event
+        self._events = deque(maxlen=MOTION_MAX_EVENTS)
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def state(self, limit: int = 10) -> dict:
+        """״̬limit¼ɾɵ£"""
+        with self._lock:
+            events = list(self._events)[-limit:] if limit > 0 else []
+        return {"enabled": self._running, "events": [event.to_dict() for event in events]}
+
+    def start(self):
+        """̣߳½ģͣ"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._motion_func, daemon=True)
+        self._thread.start()
+        LogManager.append_log("Motion-triggered ranging started", "INFO")
+
+    def stop(self):
+        """ֹͣ"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        LogManager.append_log("Motion-triggered ranging stopped", "INFO")
+
+    def _next_frame(self, frame_seq: int) -> tuple:
+        """ȴ֡ (֡, ֡)ֹͣʱ (None, frame_seq)"""
+        while self._running:
+            with g_state.frame_lock:
+                if g_state.frame_seq != frame_seq and g_state.raw_frame is not None:
+                    return g_state.raw_frame, g_state.frame_seq
+            time.sleep(FRAME_POLL_INTERVAL)
+        return None, frame_seq
+
+    def _motion_func(self):
+        subtractor = cv2.createBackgroundSubtractorMOG2(history=MOTION_HISTORY, varThreshold=MOTION_VAR_THRESHOLD,
+                                                        detectShadows=False)
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        size = (PREVIEW_WIDTH // MOTION_DOWNSCALE, PREVIEW_HEIGHT // MOTION_DOWNSCALE)
+        min_area = MOTION_MIN_AREA * size[0] * size[1]
+        frame_seq = 0
+        frames = 0
+        consecutive = 0
+        last_trigger = 0.0
+        while self._running:
+            frame, frame_seq = self._next_frame(frame_seq)
+            if frame is None:
+                break
+            timestamp = time.time()
+            small = cv2.resize(preview_gray(frame), size, interpolation=cv2.INTER_AREA)
+            mask = subtractor.apply(small)
+            frames += 1
+            if frames < MOTION_WARMUP_FRAMES:
+                continue
+
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+            count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+            if count <= 1 or stats[1:, cv2.CC_STAT_AREA].max() < min_area:
+                consecutive = 0
+                continue
+            consecutive += 1
+            if consecutive < MOTION_MIN_FRAMES or timestamp - last_trigger < self._cooldown:
+                continue
+
+            # ˶ǩ0
+            x, y, w, h, area = (int(v) for v in stats[1 + stats[1:, cv2.CC_STAT_AREA].argmax()])
+            d = MOTION_DOWNSCALE
+            rect = (x * d, y * d, min((x + w) * d, PREVIEW_WIDTH - 1), min((y + h) * d, PREVIEW_HEIGHT - 1))
+            last_trigger = timestamp
+            try:
+                self._range(frame, frame_seq, timestamp, rect, area / float(size[0] * size[1]))
+            except Exception as e:
+                # β̣߳ȴʱٴδ
+                LogManager.append_log(f"Error: Motion ranging for region {rect} failed: {e!r}", "ERROR")
+
+    def _range(self, frame, frame_seq: int, timestamp: float, rect: tuple, area_ratio: float):
+        """˶ಢ"""
+        with self._measure_lock:
+            stats = self._calculator.measure_region(frame, self._calculator.preview_to_raw_rect(rect), scale=self._scale)
+        event = MotionEvent(timestamp, frame_seq, rect, area_ratio, stats)
+        with self._lock:
+            self._events.append(event)
+        result = f"{event.distance:.3f} m" if stats.ok else "no valid disparity"
+        LogManager.append_log(f"Motion at {event.to_dict()['time']} region {rect}: {result}",
+                              "INFO" if stats.ok else "WARN")
+
+        g_state.click_point = ((rect[0] + rect[2]) // 2, (rect[1] + rect[3]) // 2)
+        g_state.has_click = True
+        g_state.select_rect = rect
+        with g_state.distance_lock:
+            g_state.distance = event.distance
+            g_state.distance_reason = QUALITY_OK
+            g_state.distance_details = stats.to_dict()
+        if self._event_log:
+            try:
+                with open(self._event_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event.to_dict()) + "\n")
+            except OSError as e:
+                LogManager.append_log(f"Error: Cannot write motion event log {self._event_log}: {e}", "ERROR")
+        if self._on_event is not None:
+            self._on_event(event)
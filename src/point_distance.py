@@ -0,0 +1,46 @@
+# -*- coding: gbk -*-
+"""
+ά
+ͬһ֡ͬһӲϾQͶӰΪά꣬
+˳ŷϾ루ߴ硢϶
+"""
+import numpy as np
+
+# һʱʼµһ
+MAX_MEASURE_POINTS = 4
+
+
+class PointDistances:
+    """"""
+    def __init__(self, raw_points: list, points_3d: list):
+        """
+        Args:
+            raw_points: ͼԭʼ (x, y)
+            points_3d: ά꣨ףЧӲĵΪNone
+        """
+        self.raw_points = [tuple(int(v) for v in p) for p in raw_points]
+        self.points_3d = [None if p is None else np.asarray(p, dtype=np.float64) for p in points_3d]
+        self.segments = []
+        for a, b in zip(self.points_3d[:-1], self.points_3d[1:]):
+            self.segments.append(float(np.linalg.norm(b - a)) if a is not None and b is not None else None)
+        # ƥǰ֡FrameQualityδʱΪNoneе㲻ϸʱΪһϸĽΪһĽ
+        self.quality = None
+
+    @property
+    def ok(self) -> bool:
+        """ȫ߶ζЧ"""
+        return bool(self.segments) and all(s is not None for s in self.segments)
+
+    @property
+    def total(self) -> float:
+        """Ч߶εܳȣף"""
+        return float(sum(s for s in self.segments if s is not None))
+
+    def to_dict(self) -> dict:
+        return {
+            "points": [{"raw": list(raw), "xyz": None if p is None else [round(float(v), 4) for v in p]}
+                       for raw, p in zip(self.raw_points, self.points_3d)],
+            "segments": [None if s is None else round(s, 4) for s in self.segments],
+            "total": round(self.total, 4),
+            "quality": self.quality.to_dict() if self.quality is not None else None,
+        }
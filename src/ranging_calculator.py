@@ -2,14 +2,136 @@
 import os
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
 from log_manager import LogManager
+from calibration_bundle import is_bundle, load_bundle
+from frame_quality import check_frame_quality
+from region_stats import region_stats_from_depth
+from point_distance import PointDistances
+from depth_export import DisparityFrame
 from common import (
     STEREO_WIDTH, STEREO_HEIGHT, PREVIEW_WIDTH, PREVIEW_HEIGHT, g_state
 )
 IS_DEBUG = False
 SAVE_DIR = os.path.join(os.path.dirname(__file__), "tmp_img")
+# ֵ֧ĲС1: ԭʼֱʣ2: 1/24: 1/4
+RECTIFY_SCALES = (1, 2, 4)
+# ࣨmeasure_roi/measure_regionĿܵƥ뾶߾ࣨԭʼֱأ
+ROI_RADIUS = 32
+ROI_MARGIN = 16
+# Ԥߴ绺棩
+PREPROCESS_BUFFER_LIMIT = 16
+
+
+def scale_q_matrix(Q: np.ndarray, scale: int) -> np.ndarray:
+    """ͶӰQ㵽Сscaleͼ㰴Ķ룬Ȳ䣩"""
+    scaled = np.array(Q, dtype=np.float64)
+    scaled[0, 3] = (Q[0, 3] - 0.5) / scale + 0.5
+    scaled[1, 3] = (Q[1, 3] - 0.5) / scale + 0.5
+    scaled[2, 3] = Q[2, 3] / scale
+    scaled[3, 3] = Q[3, 3] / scale
+    return scaled
+
+
+def scale_rectify_map(map_x: np.ndarray, map_y: np.ndarray, scale: int, size: tuple) -> tuple:
+    """ԭʼֱʵĸӳƵСscaleӳΪСͼ"""
+    map_x = (cv2.resize(map_x, size, interpolation=cv2.INTER_LINEAR) + 0.5) / scale - 0.5
+    map_y = (cv2.resize(map_y, size, interpolation=cv2.INTER_LINEAR) + 0.5) / scale - 0.5
+    return map_x.astype(np.float32), map_y.astype(np.float32)
+
+
+class DepthLUT:
+    """
+    ӲȲұSGBM16ԭʼӲint16
+    QԤȼÿӲֵZX/Yϵ 1/Wͼֻһtake
+    سreprojectImageTo3DӲ <= 0.5 أSGBMЧֵӦ0
+    """
+    def __init__(self, Q: np.ndarray, num_disparities: int):
+        Q = np.asarray(Q, dtype=np.float64)
+        self.Q = Q
+        disparity = np.arange(num_disparities * 16 + 1, dtype=np.float64) / 16.0
+        w = Q[3, 2] * disparity + Q[3, 3]
+        valid = (disparity > 0.5) & (w > 0)
+        inv_w = np.zeros_like(disparity)
+        inv_w[valid] = 1.0 / w[valid]
+        self.inv_w = inv_w.astype(np.float32)
+        self.depth = (Q[2, 3] * inv_w).astype(np.float32)
+        # X = (Q00*x + Q03)/W, Y = (Q11*y + Q13)/W
+        self._qx = (float(Q[0, 0]), float(Q[0, 3]))
+        self._qy = (float(Q[1, 1]), float(Q[1, 3]))
+
+    def to_depth(self, raw_disparity: np.ndarray) -> np.ndarray:
+        """ԭʼӲ״ ȣףfloat32ЧΪ0"""
+        return np.take(self.depth, raw_disparity, mode='clip')
+
+    def to_points(self, raw_disparity: np.ndarray, x0: int = 0, y0: int = 0) -> np.ndarray:
+        """
+        ԭʼӲ  ά (h, w, 3)ЧΪ0
+
+        Args:
+            raw_disparity: Ӳͼеľ
+            x0, y0: ϽӲͼе
+        """
+        h, w = raw_disparity.shape
+        inv_w = np.take(self.inv_w, raw_disparity, mode='clip')
+        points = np.empty((h, w, 3), dtype=np.float32)
+        xs = self._qx[0] * np.arange(x0, x0 + w, dtype=np.float32) + self._qx[1]
+        ys = self._qy[0] * np.arange(y0, y0 + h, dtype=np.float32) + self._qy[1]
+        np.multiply(inv_w, xs[None, :], out=points[..., 0])
+        np.multiply(inv_w, ys[:, None], out=points[..., 1])
+        np.take(self.depth, raw_disparity, mode='clip', out=points[..., 2])
+        return points
+
+
+def uncalibrated_q_matrix(fx: float, baseline: float, img_size: tuple) -> np.ndarray:
+    """ޱ궨ʱࡢͼĹQZ = fx*baseline/d"""
+    cx, cy = (img_size[0] - 1) / 2.0, (img_size[1] - 1) / 2.0
+    return np.array([[1.0, 0.0, 0.0, -cx],
+                     [0.0, 1.0, 0.0, -cy],
+                     [0.0, 0.0, 0.0, fx],
+                     [0.0, 0.0, 1.0 / baseline, 0.0]])
+
+
+def sgbm_num_disparities(scale: int = 1) -> int:
+    """СSGBMӲΧ"""
+    return 16 * 12 // scale
+
+
+def sgbm_block_size(scale: int = 1) -> int:
+    """СSGBMƥ䴰ڴС"""
+    return max(3, (11 // scale) | 1)
+
+
+def create_stereo_sgbm(scale: int = 1) -> cv2.StereoSGBM:
+    """SGBMƥӲΧƥ䴰СС"""
+    block_size = sgbm_block_size(scale)
+    return cv2.StereoSGBM_create(
+          minDisparity=0,
+          numDisparities=sgbm_num_disparities(scale),
+          blockSize=block_size,
+          P1=8*3*block_size*block_size,
+          P2=32*3*block_size*block_size,
+          disp12MaxDiff=1,
+          uniquenessRatio=10,
+          speckleWindowSize=100,
+          speckleRange=32,
+          mode=cv2.STEREO_SGBM_MODE_HH
+    )
+
+
+def match_window_cols(x0: int, x1: int, width: int, scale: int = 1, margin: int = 0) -> slice:
+    """
+    ֲƥ䴰ڵзΧ [x0, x1)ӲΧټӱ߾
+    SGBMҪͼȲС ӲΧ + ƥ䴰ڣԵضʱҲ㣨ͼխʱȡȣ
+    """
+    min_width = sgbm_num_disparities(scale) + sgbm_block_size(scale)
+    start = max(0, x0 - sgbm_num_disparities(scale) - margin)
+    stop = min(width, max(x1 + margin, start + min_width))
+    return slice(max(0, min(start, stop - min_width)), stop)
+
+
 class RangingCalculator:
     """˫Ŀ"""
     
@@ -28,6 +150,26 @@ class RangingCalculator:
         self._map2x = None
         self._map2y = None
         self._Q = None
+        # С (map1x, map1y, map2x, map2y, Q)
+        self._levels = {}
+        # СӲȲұδ궨ʱĬϽ߹죩
+        self._depth_luts = self._build_depth_luts(None)
+        
+        # 궨滻໥⣬пʼͬһ궨
+        self._calib_lock = threading.Lock()
+        self._calib_loading = False
+        self._calib_path = None
+        # һͼӲDisparityFrameʹ
+        self._last_disparity = None
+        
+        # ԤҸһCLAHEһ鸴õ
+        # ʱͼ̴߳OpenCVڼͷGILͼ
+        self._clahe = (cv2.createCLAHE(clipLimit=4.0, tileGridSize=(8, 8)),
+                       cv2.createCLAHE(clipLimit=4.0, tileGridSize=(8, 8)))
+        self._preprocess_buffers = {}
+        self._preprocess_executor = None
+        if cv2.getNumberOfCPUs() > 1:
+            self._preprocess_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preprocess")
         
         # Ŀ¼
         if IS_DEBUG:
@@ -35,10 +177,10 @@ class RangingCalculator:
             
     def load_calibration(self, npz_path: str) -> bool:
         """
-        NPZļر궨
+        NPZļ궨Ŀ¼ر궨
         
         Args:
-            npz_path: NPZļ·
+            npz_path: NPZļ· calibration_bundle Ŀ¼ӳڴӳ䷽ʽ룩
             
         Returns:
             Ƿسɹ
@@ -48,36 +190,44 @@ class RangingCalculator:
             return False
         
         try:
-            data = np.load(npz_path)
-
-            # ȡ궨
-            self._mtx_l = data.get('mtx_l')
-            self._dist_l = data.get('dist_l')
-            self._mtx_r = data.get('mtx_r')
-            self._dist_r = data.get('dist_r')
-            self._map1x = data.get('map1x')
-            self._map1y = data.get('map1y')
-            self._map2x = data.get('map2x')
-            self._map2y = data.get('map2y')
-            self._Q = data.get('Q')
-
-            # ȡ߾
-            self._baseline = float(data.get('baseline', 0.0))
+            if is_bundle(npz_path):
+                data, meta = load_bundle(npz_path)
+                LogManager.append_log(f" - Calibration bundle v{meta['version']} ({meta['map_format']} maps, memory-mapped)","INFO")
+            else:
+                # һԶȫ飬滻ڼļд
+                with np.load(npz_path) as npz:
+                    data = {key: npz[key] for key in npz.files}
 
             # ȡͼߴ
             img_size = data.get('img_size')
-            if img_size is not None:
-                self._img_size = tuple(img_size)
-            else:
-                self._img_size = (0, 0)
+            img_size = tuple(img_size) if img_size is not None else (0, 0)
                 
-            # УЧ
-            if (self._mtx_l is None or self._map1x is None or 
-                self._Q is None or self._img_size[0] == 0):
+            # УЧԣʧʱǰ
+            if (data.get('mtx_l') is None or data.get('map1x') is None or 
+                data.get('Q') is None or img_size[0] == 0):
                 LogManager.append_log("Error: Calibration parameters are invalid!","ERROR")
                 return False
             
-            self._is_calibrated = True
+            levels = self._build_levels(data, img_size)
+            depth_luts = self._build_depth_luts(levels)
+            
+            # 滻궨
+            with self._calib_lock:
+                self._mtx_l = data.get('mtx_l')
+                self._dist_l = data.get('dist_l')
+                self._mtx_r = data.get('mtx_r')
+                self._dist_r = data.get('dist_r')
+                self._map1x = data.get('map1x')
+                self._map1y = data.get('map1y')
+                self._map2x = data.get('map2x')
+                self._map2y = data.get('map2y')
+                self._Q = data.get('Q')
+                self._baseline = float(data.get('baseline', 0.0))
+                self._img_size = img_size
+                self._levels = levels
+                self._depth_luts = depth_luts
+                self._calib_path = npz_path
+                self._is_calibrated = True
             LogManager.append_log("Calibration loaded successfully!","INFO")
             LogManager.append_log(f" - Baseline: {self._baseline} meters","INFO")
             LogManager.append_log(f" - Image size: {self._img_size[0]}x{self._img_size[1]}","INFO")
@@ -86,6 +236,86 @@ class RangingCalculator:
         except Exception as e:
             LogManager.append_log(f"Error loading calibration: {e}","ERROR")
             return False
+    
+    def _build_levels(self, data: dict, img_size: tuple) -> dict:
+        """
+        СУӳQ
+        궨ļ map1x_s2 ȼʱֱʹãźڲɣԭʼֱӳƵ
+        """
+        Q = data['Q']
+        levels = {1: (data['map1x'], data['map1y'], data['map2x'], data['map2y'], Q)}
+        float_maps = None
+        for scale in RECTIFY_SCALES[1:]:
+            if f"map1x_s{scale}" in data:
+                levels[scale] = (data[f"map1x_s{scale}"], data[f"map1y_s{scale}"],
+                                 data[f"map2x_s{scale}"], data[f"map2y_s{scale}"],
+                                 data.get(f"Q_s{scale}", scale_q_matrix(Q, scale)))
+                continue
+            if float_maps is None:
+                float_maps = []
+                for map_x, map_y in ((data['map1x'], data['map1y']), (data['map2x'], data['map2y'])):
+                    if map_x.dtype != np.float32:
+                        # ӳ궨תظ
+                        map_x, map_y = cv2.convertMaps(np.asarray(map_x), np.asarray(map_y), cv2.CV_32FC1)
+                    float_maps.append((map_x, map_y))
+            size = (img_size[0] // scale, img_size[1] // scale)
+            levels[scale] = (scale_rectify_map(*float_maps[0], scale, size) +
+                             scale_rectify_map(*float_maps[1], scale, size) +
+                             (scale_q_matrix(Q, scale),))
+        return levels
+    
+    def _build_depth_luts(self, levels) -> dict:
+        """ΪÿСӲȲұlevelsΪNoneʱޱ궨ģʽĲұ"""
+        luts = {}
+        for scale in RECTIFY_SCALES:
+            if levels is not None:
+                Q = levels[scale][4]
+            else:
+                Q = uncalibrated_q_matrix(695.0 / scale, 0.0735, (STEREO_WIDTH // 2 // scale, STEREO_HEIGHT // scale))
+            luts[scale] = DepthLUT(Q, sgbm_num_disparities(scale))
+        return luts
+
+    def load_calibration_async(self, npz_path: str, on_done=None) -> threading.Thread:
+        """
+        ں̨߳мر궨ǰఴޱ궨ģʽ
+        
+        Args:
+            npz_path: NPZļ·궨Ŀ¼
+            on_done: ѡص on_done(success)ں̨߳е
+            
+        Returns:
+            ߳
+        """
+        def load_func():
+            try:
+                success = self.load_calibration(npz_path)
+            finally:
+                self._calib_loading = False
+            if on_done is not None:
+                on_done(success)
+        
+        self._calib_loading = True
+        thread = threading.Thread(target=load_func, daemon=True)
+        thread.start()
+        return thread
+    
+    @property
+    def is_calibrated(self) -> bool:
+        return self._is_calibrated
+    
+    @property
+    def calibration_loading(self) -> bool:
+        return self._calib_loading
+    
+    def depth_lut(self, scale: int = 1) -> DepthLUT:
+        """ǰ궨ָСӲȲұ궨¼غ滻"""
+        return self._depth_luts[scale]
+
+    @property
+    def last_disparity(self):
+        """һmeasure_frameӲͼУͼұDisparityFrameδʱΪNone"""
+        return self._last_disparity
+
             
     def calculate_distance(self):
         if not g_state.preview_running:
@@ -109,54 +339,102 @@ class RangingCalculator:
                 LogManager.append_log("Error: Ranging failed - Empty frame","ERROR")
                 return
             raw_frame = g_state.raw_frame.copy()
-            
-        left_frame = raw_frame[:, :STEREO_WIDTH//2].copy()
-        right_frame = raw_frame[:, STEREO_WIDTH//2:].copy()
-        LogManager.append_log(f"Info: Captured left/right frames ({left_frame.shape[1]}x{left_frame.shape[0]})","INFO")
         
-        # ԭʼ
+        distance = self.measure_frame(raw_frame, self.preview_to_raw_point(click_pt))
+        
+        # ¾
+        with g_state.distance_lock:
+            g_state.distance = distance
+    
+    def preview_to_raw_point(self, click_pt: tuple) -> tuple:
+        """ԤתΪԭʼͼ"""
         scale_x = (STEREO_WIDTH // 2) / PREVIEW_WIDTH
         scale_y = STEREO_HEIGHT / PREVIEW_HEIGHT
         raw_x = int(np.clip(click_pt[0] * scale_x, 0, STEREO_WIDTH // 2 - 1))
         raw_y = int(np.clip(click_pt[1] * scale_y, 0, STEREO_HEIGHT - 1))
-        raw_point = (raw_x, raw_y)
+        return (raw_x, raw_y)
+    
+    def measure_frame(self, raw_frame: np.ndarray, raw_point: tuple, should_cancel=None, scale: int = 1,
+                      quality_check: bool = True) -> float:
+        """
+        һ֡˫Ŀͼִ̣ȫ״̬
+        
+        Args:
+            raw_frame: ƴӵԭʼ֡
+            raw_point: ͼԭʼ (x, y)
+            should_cancel: ѡ޲λصںʱ׶֮飬Trueʱ
+            scale: СRECTIFY_SCALES֮һ1ʱСԭʼͼֱСͼУƥ
+            quality_check: Ƿ֡飬ϸʱƥֱӷ0.0
+            
+        Returns:
+            루ףʧܷ0.0ȡNone
+        """
+        return self.measure_frame_with_quality(raw_frame, raw_point, should_cancel, scale, quality_check)[0]
+    
+    def measure_frame_with_quality(self, raw_frame: np.ndarray, raw_point: tuple, should_cancel=None, scale: int = 1,
+                                   quality_check: bool = True) -> tuple:
+        """
+        ͬmeasure_frameͬʱرβ֡
+        
+        Returns:
+            tuple: (룬ʧΪ0.0ȡΪNone, FrameQualityδʱΪNone)
+        """
+        if scale not in RECTIFY_SCALES:
+            raise ValueError(f"Unsupported ranging scale: {scale} (supported: {RECTIFY_SCALES})")
+        with self._calib_lock:
+            return self._measure_frame(raw_frame, raw_point, should_cancel, scale, quality_check)
+    
+    def _measure_frame(self, raw_frame: np.ndarray, raw_point: tuple, should_cancel=None, scale: int = 1,
+                       quality_check: bool = True) -> tuple:
+        left_frame, right_frame = self._split_frame(raw_frame)
+        
+        # ֡飨Լ1ms޷õЧӲʱSGBM
+        quality = check_frame_quality(left_frame, raw_point) if quality_check else None
+        if quality is not None and not quality.ok:
+            self._log_quality_skip(quality)
+            return 0.0, quality
+        distance = self._measure_checked_frame(left_frame, right_frame, raw_point, should_cancel, scale)
+        return distance, quality
+    
+    @staticmethod
+    def _log_quality_skip(q):
+        """¼֡ϸƥ"""
+        LogManager.append_log(f"Error: Ranging skipped - {q.reason} (blur={q.blur:.0f}, texture={q.texture:.1f}, "
+                              f"clipped={q.clipped_low:.0%}/{q.clipped_high:.0%})","ERROR")
+    
+    def _measure_checked_frame(self, left_frame: np.ndarray, right_frame: np.ndarray, raw_point: tuple,
+                               should_cancel=None, scale: int = 1) -> float:
+        """ͨ֡Уƥ䲢࣬ؾ루ףʧܷ0.0ȡNone"""
+        if scale > 1:
+            left_frame, right_frame = self._downscale_frames(left_frame, right_frame, scale)
+            raw_point = (min(raw_point[0] // scale, left_frame.shape[1] - 1),
+                         min(raw_point[1] // scale, left_frame.shape[0] - 1))
+        LogManager.append_log(f"Info: Captured left/right frames ({left_frame.shape[1]}x{left_frame.shape[0]})","INFO")
         
         if IS_DEBUG:
             self._save_image_with_click_point(left_frame, raw_point, "raw_left")
             self._save_image_with_click_point(right_frame, raw_point, "raw_right")
         
-        # У
-        if self._is_calibrated:
-            left_frame = cv2.remap(left_frame, self._map1x, self._map1y, cv2.INTER_LINEAR)
-            right_frame = cv2.remap(right_frame, self._map2x, self._map2y, cv2.INTER_LINEAR)
-            LogManager.append_log("Info: Frames undistorted with calibration params","INFO")
-            if IS_DEBUG:
-                self._save_image_with_click_point(left_frame, raw_point, "calib_left")
-                self._save_image_with_click_point(right_frame, raw_point, "calib_right")
-        else:
-            LogManager.append_log("Warning: No calibration loaded - Using raw frames!","WARN")
-        
-        gray_left = cv2.cvtColor(left_frame, cv2.COLOR_BGR2GRAY)
-        gray_right = cv2.cvtColor(right_frame, cv2.COLOR_BGR2GRAY)
+        left_frame, right_frame = self._rectify_frames(left_frame, right_frame, scale)
+        if IS_DEBUG and self._is_calibrated:
+            self._save_image_with_click_point(left_frame, raw_point, "calib_left")
+            self._save_image_with_click_point(right_frame, raw_point, "calib_right")
         
-        # CLAHEǿԱȶ
-        clahe = cv2.createCLAHE(clipLimit=4.0, tileGridSize=(8, 8))
-        gray_left = clahe.apply(gray_left)
-        gray_right = clahe.apply(gray_right)
+        gray_left, gray_right = self._preprocess_frames(left_frame, right_frame)
         
-        gray_left = cv2.GaussianBlur(gray_left, (3, 3), 0)
-        gray_right = cv2.GaussianBlur(gray_right, (3, 3), 0)
-        gray_left = cv2.medianBlur(gray_left, 3)
-        gray_right = cv2.medianBlur(gray_right, 3)
+        # SGBMǰǷȡ
+        if should_cancel is not None and should_cancel():
+            LogManager.append_log("Info: Ranging cancelled before matching","INFO")
+            return None
         
         # Ҷ֡debugģʽ
         if IS_DEBUG:
             cv2.imwrite(self._get_timestamp_filename("gray_left", ".jpg"), gray_left)
             cv2.imwrite(self._get_timestamp_filename("gray_right", ".jpg"), gray_right)
         
-        sgbm = self._init_stereo_sgbm()
-        disparity_map = sgbm.compute(gray_left, gray_right)
-        disparity_map = disparity_map.astype(np.float32) / 16.0
+        disparity_map = self._compute_raw_disparity(gray_left, gray_right, scale)
+        # ӲͼУͼÿζ飬ü
+        self._last_disparity = DisparityFrame(disparity_map, left_frame, scale, self._depth_luts[scale])
         
         # Ӳͼdebugģʽ
         if IS_DEBUG:
@@ -164,37 +442,319 @@ class RangingCalculator:
             cv2.circle(disparity_vis, raw_point, 5, 255, -1)
             cv2.imwrite(self._get_timestamp_filename("disparity_map", ".jpg"), disparity_vis)
         
-        disparity = 0.0
-        valid_count = 0
-        kernel = 5  # 5x5
-        
-        for dy in range(-kernel//2, kernel//2 + 1):
-            for dx in range(-kernel//2, kernel//2 + 1):
-                x = raw_point[0] + dx
-                y = raw_point[1] + dy
-                if 0 <= x < gray_left.shape[1] and 0 <= y < gray_left.shape[0]:
-                    d = disparity_map[y, x]
-                    if d > 0.5:  # Ӳ
-                        disparity += d
-                        valid_count += 1
-        
-        if valid_count == 0:
+        disparity = self._average_disparity(disparity_map, raw_point)
+        if disparity <= 0:
             LogManager.append_log("Error: Ranging failed - No valid disparity points","ERROR")
-            with g_state.distance_lock:
-                g_state.distance = 0.0
-            return
+            return 0.0
         
-        disparity /= valid_count
         LogManager.append_log(f"Info: Average disparity: {disparity}","INFO")
         
         # ӡ㴦Ӳֵ
-        d = disparity_map[raw_point[1], raw_point[0]]
+        d = disparity_map[raw_point[1], raw_point[0]] / 16.0
         LogManager.append_log(f"[Debug] Disparity at click point: {d}","DEBUG")
         
+        return self._disparity_to_distance(disparity_map, raw_point, disparity, scale)
+    
+    def compute_disparity_frame(self, raw_frame: np.ndarray, scale: int = 1) -> DisparityFrame:
+        """
+        һ֡ͼӲࣩڵӲͼ
+        
+        Args:
+            raw_frame: ƴӵԭʼ֡
+            scale: СRECTIFY_SCALES֮һ
+        """
+        left_frame, _, gray_left, gray_right, lut = self.rectify_pair(raw_frame, scale)
+        return DisparityFrame(self._compute_raw_disparity(gray_left, gray_right, scale), left_frame, scale, lut)
+    
+    def rectify_pair(self, raw_frame: np.ndarray, scale: int = 1) -> tuple:
+        """
+        ֡СУԤһ֡ƥ䣩ⲿSGBMӲ
+        
+        Args:
+            raw_frame: ƴӵԭʼ֡
+            scale: СRECTIFY_SCALES֮һ
+            
+        Returns:
+            tuple: (Уͼ, Уͼ, Ҷͼ, һҶͼ, ӦDepthLUT)
+                   ҶͼΪ֮õӰ죻궨¼غDepthLUTΪµĶ
+        """
+        if scale not in RECTIFY_SCALES:
+            raise ValueError(f"Unsupported ranging scale: {scale} (supported: {RECTIFY_SCALES})")
+        with self._calib_lock:
+            left_frame, right_frame = self._split_frame(raw_frame)
+            if scale > 1:
+                left_frame, right_frame = self._downscale_frames(left_frame, right_frame, scale)
+            left_frame, right_frame = self._rectify_frames(left_frame, right_frame, scale)
+            gray_left, gray_right = self._preprocess_frames(left_frame, right_frame)
+            return left_frame, right_frame, gray_left.copy(), gray_right.copy(), self._depth_luts[scale]
+    
+    def measure_roi(self, raw_frame: np.ndarray, raw_point: tuple, radius: int = ROI_RADIUS) -> float:
+        """
+        ֻĿ㸽Уƥ䣨ٲãд־
+        ӲΧټӱ߾ࣻУֱʹӳĶӦ
+        ȡĿ5x5ЧӲλõ
+        
+        Args:
+            raw_frame: ƴӵԭʼ֡
+            raw_point: ͼԭʼ (x, y)
+            radius: ƥ뾶أ
+            
+        Returns:
+            루ףЧӲ0.0
+        """
+        half_width = STEREO_WIDTH // 2
+        num_disparities = sgbm_num_disparities(1)
+        width = min(half_width, 2 * (radius + ROI_MARGIN) + 1 + num_disparities)
+        height = min(raw_frame.shape[0], 2 * (radius + ROI_MARGIN) + 1)
+        # ߴ̶ԵʱƽƶǲСԤԸ
+        x, y = raw_point
+        x0 = int(np.clip(x + radius + ROI_MARGIN + 1 - width, 0, half_width - width))
+        y0 = int(np.clip(y - radius - ROI_MARGIN, 0, raw_frame.shape[0] - height))
+        rows, cols = slice(y0, y0 + height), slice(x0, x0 + width)
+        
+        with self._calib_lock:
+            disparity_map = self._match_window(raw_frame[:, :half_width], raw_frame[:, half_width:], rows, cols)
+            px, py = x - x0, y - y0
+            window = disparity_map[max(0, py - 2):py + 3, max(0, px - 2):px + 3]
+            valid = window[window > 8]
+            if valid.size == 0:
+                return 0.0
+            depth = float(self._depth_luts[1].depth[int(np.median(valid))])
+        return depth if 0.01 < depth < 100.0 else 0.0
+    
+    def measure_region(self, raw_frame: np.ndarray, raw_rect: tuple, should_cancel=None, scale: int = 1,
+                       quality_check: bool = True):
+        """
+        ͳƣλСֵλЧرֱͼ
+        ֻУƥ串ǸĴڣɲұһλ
+        
+        Args:
+            raw_frame: ƴӵԭʼ֡
+            raw_rect: ͼԭʼ (x0, y0, x1, y1)
+            should_cancel: ѡ޲λصTrueʱ
+            scale: СRECTIFY_SCALES֮һ
+            quality_check: Ƿ֡飬ϸʱƥ䡢Чصͳ
+            
+        Returns:
+            RegionStatsqualityΪ֡ȡNone
+        """
+        if scale not in RECTIFY_SCALES:
+            raise ValueError(f"Unsupported ranging scale: {scale} (supported: {RECTIFY_SCALES})")
+        half_width = STEREO_WIDTH // 2
+        left_frame, right_frame = raw_frame[:, :half_width], raw_frame[:, half_width:]
+        quality = check_frame_quality(left_frame, None, raw_rect) if quality_check else None
+        if quality is not None and not quality.ok:
+            self._log_quality_skip(quality)
+            stats = region_stats_from_depth(np.zeros(0, dtype=np.float32), raw_rect)
+            stats.quality = quality
+            return stats
+        with self._calib_lock:
+            if scale > 1:
+                left_frame, right_frame = self._downscale_frames(left_frame, right_frame, scale)
+            h, w = left_frame.shape[:2]
+            x0, x1 = sorted((int(raw_rect[0]) // scale, int(raw_rect[2]) // scale))
+            y0, y1 = sorted((int(raw_rect[1]) // scale, int(raw_rect[3]) // scale))
+            x0, y0 = min(max(x0, 0), w - 1), min(max(y0, 0), h - 1)
+            x1, y1 = min(max(x1, x0 + 1), w), min(max(y1, y0 + 1), h)
+            
+            # ƥ䴰ӲΧټӱ߾
+            margin = max(8, ROI_MARGIN // scale)
+            rows = slice(max(0, y0 - margin), min(h, y1 + margin))
+            cols = match_window_cols(x0, x1, w, scale, margin)
+            if should_cancel is not None and should_cancel():
+                return None
+            disparity_map = self._match_window(left_frame, right_frame, rows, cols, scale)
+            region = disparity_map[y0 - rows.start:y1 - rows.start, x0 - cols.start:x1 - cols.start]
+            depth = self._depth_luts[scale].to_depth(region)
+        
+        stats = region_stats_from_depth(depth, raw_rect)
+        stats.quality = quality
+        LogManager.append_log(f"Region ({x1 - x0}x{y1 - y0} @1/{scale}): median {stats.median:.3f} m, "
+                              f"min {stats.min_depth:.3f} m, valid {stats.valid_ratio:.0%}",
+                              "INFO" if stats.ok else "ERROR")
+        return stats
+    
+    def measure_points(self, raw_frame: np.ndarray, raw_points: list, should_cancel=None, scale: int = 1,
+                       quality_check: bool = True):
+        """
+        ͬһ֡ͬһӲϲάڵľ
+        ֻУƥ串ȫĴڣȡ5x5ЧӲλQͶӰ
+        
+        Args:
+            raw_frame: ƴӵԭʼ֡
+            raw_points: ͼԭʼб [(x, y), ...]
+            should_cancel: ѡ޲λصTrueʱ
+            scale: СRECTIFY_SCALES֮һ
+            quality_check: Ƿÿ֡飬һ㲻ϸʱƥ䡢Ч
+            
+        Returns:
+            PointDistancesqualityΪ֡ȡNone
+        """
+        if scale not in RECTIFY_SCALES:
+            raise ValueError(f"Unsupported ranging scale: {scale} (supported: {RECTIFY_SCALES})")
+        half_width = STEREO_WIDTH // 2
+        left_frame, right_frame = raw_frame[:, :half_width], raw_frame[:, half_width:]
+        quality = None
+        if quality_check:
+            for x, y in raw_points:
+                quality = check_frame_quality(left_frame, (int(x), int(y)))
+                if not quality.ok:
+                    self._log_quality_skip(quality)
+                    result = PointDistances(raw_points, [None] * len(raw_points))
+                    result.quality = quality
+                    return result
+        with self._calib_lock:
+            if scale > 1:
+                left_frame, right_frame = self._downscale_frames(left_frame, right_frame, scale)
+            h, w = left_frame.shape[:2]
+            points = [(min(max(int(x) // scale, 0), w - 1), min(max(int(y) // scale, 0), h - 1)) for x, y in raw_points]
+            xs, ys = [p[0] for p in points], [p[1] for p in points]
+            
+            # ƥ䴰ڸȫ㣬ӲΧټӱ߾
+            margin = max(8, ROI_MARGIN // scale)
+            rows = slice(max(0, min(ys) - margin), min(h, max(ys) + margin + 1))
+            cols = match_window_cols(min(xs), max(xs) + 1, w, scale, margin)
+            if should_cancel is not None and should_cancel():
+                return None
+            disparity_map = self._match_window(left_frame, right_frame, rows, cols, scale)
+            lut = self._depth_luts[scale]
+            
+            points_3d = []
+            for x, y in points:
+                px, py = x - cols.start, y - rows.start
+                window = disparity_map[max(0, py - 2):py + 3, max(0, px - 2):px + 3]
+                valid = window[window > 8]  # Ӳ0.5أ
+                point = None
+                if valid.size > 0:
+                    raw = np.array([[int(np.median(valid))]], dtype=np.int16)
+                    point = lut.to_points(raw, x, y)[0, 0]
+                    if not 0.01 < point[2] < 100.0:
+                        point = None
+                points_3d.append(point)
+        
+        result = PointDistances(raw_points, points_3d)
+        result.quality = quality
+        for i, point in enumerate(result.points_3d):
+            if point is None:
+                LogManager.append_log(f"Error: Point {i + 1} has no valid disparity", "ERROR")
+        segments = ", ".join("invalid" if s is None else f"{s:.3f} m" for s in result.segments)
+        LogManager.append_log(f"Point distances ({len(points)} points @1/{scale}): {segments}",
+                              "INFO" if result.ok else "ERROR")
+        return result
+    
+    def preview_to_raw_rect(self, rect: tuple) -> tuple:
+        """Ԥ (x0, y0, x1, y1) תΪԭʼͼ"""
+        return self.preview_to_raw_point(rect[:2]) + self.preview_to_raw_point(rect[2:])
+    
+    def _match_window(self, left_frame: np.ndarray, right_frame: np.ndarray, rows: slice, cols: slice,
+                      scale: int = 1) -> np.ndarray:
+        """
+        ֻУȡӳĶӦ򣩡Ԥƥͼͬһ
+        
+        Returns:
+            ڵ16Ӳͼƥʧܣ細ڹСʱ¼󲢷ȫЧӲͼ
+        """
+        if self._is_calibrated:
+            map1x, map1y, map2x, map2y, _ = self._levels[scale]
+            left_roi = cv2.remap(left_frame, np.ascontiguousarray(map1x[rows, cols]),
+                                 np.ascontiguousarray(map1y[rows, cols]), cv2.INTER_LINEAR)
+            right_roi = cv2.remap(right_frame, np.ascontiguousarray(map2x[rows, cols]),
+                                  np.ascontiguousarray(map2y[rows, cols]), cv2.INTER_LINEAR)
+        else:
+            left_roi = left_frame[rows, cols]
+            right_roi = right_frame[rows, cols]
+        gray_left, gray_right = self._preprocess_frames(left_roi, right_roi)
+        try:
+            return self._compute_raw_disparity(gray_left, gray_right, scale)
+        except cv2.error as e:
+            LogManager.append_log(f"Error: Window matching failed ({gray_left.shape[1]}x{gray_left.shape[0]}): "
+                                  f"{e.err}", "ERROR")
+            return np.full(gray_left.shape, -16, dtype=np.int16)
+    
+    def _split_frame(self, raw_frame: np.ndarray) -> tuple:
+        """֡"""
+        left_frame = raw_frame[:, :STEREO_WIDTH//2].copy()
+        right_frame = raw_frame[:, STEREO_WIDTH//2:].copy()
+        return left_frame, right_frame
+    
+    def _downscale_frames(self, left_frame: np.ndarray, right_frame: np.ndarray, scale: int) -> tuple:
+        """ԭʼ֡Сscale"""
+        size = (left_frame.shape[1] // scale, left_frame.shape[0] // scale)
+        return (cv2.resize(left_frame, size, interpolation=cv2.INTER_AREA),
+                cv2.resize(right_frame, size, interpolation=cv2.INTER_AREA))
+    
+    def _rectify_frames(self, left_frame: np.ndarray, right_frame: np.ndarray, scale: int = 1) -> tuple:
+        """Уδ궨ʱԭأscale1ʱΪСԭʼ֡"""
+        if self._is_calibrated:
+            map1x, map1y, map2x, map2y, _ = self._levels[scale]
+            left_frame = cv2.remap(left_frame, map1x, map1y, cv2.INTER_LINEAR)
+            right_frame = cv2.remap(right_frame, map2x, map2y, cv2.INTER_LINEAR)
+            LogManager.append_log("Info: Frames undistorted with calibration params","INFO")
+        elif self._calib_loading:
+            LogManager.append_log("Warning: Calibration still loading - Using raw frames!","WARN")
+        else:
+            LogManager.append_log("Warning: No calibration loaded - Using raw frames!","WARN")
+        return left_frame, right_frame
+    
+    def _preprocess_frames(self, left_frame: np.ndarray, right_frame: np.ndarray) -> tuple:
+        """
+        ҶȻ + CLAHE + ˲ͼд
+        
+        صĻҶͼΪûһεǰЧ
+        """
+        if self._preprocess_executor is None:
+            return self._preprocess_one(left_frame, 0), self._preprocess_one(right_frame, 1)
+        future = self._preprocess_executor.submit(self._preprocess_one, right_frame, 1)
+        gray_left = self._preprocess_one(left_frame, 0)
+        return gray_left, future.result()
+    
+    def _preprocess_one(self, frame: np.ndarray, side: int) -> np.ndarray:
+        """ԤΪÿ֡ڴ"""
+        key = (side, frame.shape[0], frame.shape[1])
+        buffers = self._preprocess_buffers.get(key)
+        if buffers is None:
+            # Ĵڳߴͬʱؽ
+            if len(self._preprocess_buffers) >= PREPROCESS_BUFFER_LIMIT:
+                self._preprocess_buffers.clear()
+            buffers = (np.empty(frame.shape[:2], dtype=np.uint8), np.empty(frame.shape[:2], dtype=np.uint8))
+            self._preprocess_buffers[key] = buffers
+        gray, tmp = buffers
+        
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        # CLAHEǿԱȶ
+        self._clahe[side].apply(gray, tmp)
+        cv2.GaussianBlur(tmp, (3, 3), 0, dst=gray)
+        cv2.medianBlur(gray, 3, dst=tmp)
+        return tmp
+    
+    def _compute_raw_disparity(self, gray_left: np.ndarray, gray_right: np.ndarray, scale: int = 1) -> np.ndarray:
+        """SGBMӲ㣬16ԭʼӲͼint16ͼͬһ߶ȣֱDepthLUT"""
+        sgbm = self._init_stereo_sgbm(scale)
+        return sgbm.compute(gray_left, gray_right)
+    
+    def _compute_disparity(self, gray_left: np.ndarray, gray_right: np.ndarray, scale: int = 1) -> np.ndarray:
+        """SGBMӲ㣬ظӲͼأͼͬһ߶ȣ"""
+        return self._compute_raw_disparity(gray_left, gray_right, scale).astype(np.float32) / 16.0
+    
+    def _average_disparity(self, disparity_map: np.ndarray, raw_point: tuple) -> float:
+        """ڵƽЧӲأdisparity_mapΪ16ԭʼӲЧ㷵0.0"""
+        kernel = 5  # 5x5ƫ -kernel//2 .. kernel//2
+        x, y = raw_point
+        window = disparity_map[max(0, y + (-kernel // 2)):y + kernel // 2 + 1,
+                               max(0, x + (-kernel // 2)):x + kernel // 2 + 1]
+        valid = window[window > 8]  # Ӳ0.5أ
+        if valid.size == 0:
+            return 0.0
+        return float(valid.sum(dtype=np.int64)) / valid.size / 16.0
+    
+    def _disparity_to_distance(self, disparity_map: np.ndarray, raw_point: tuple, disparity: float,
+                               scale: int = 1) -> float:
+        """ӲתΪ루ףdisparity_mapΪ16ԭʼӲȲõ"""
         distance = 0.0
         if self._is_calibrated and disparity > 0.5:
-            xyz = cv2.reprojectImageTo3D(disparity_map, self._Q, False)
-            point_3d = xyz[raw_point[1], raw_point[0]]
+            Q = self._levels[scale][4]
+            x, y = raw_point
+            point_3d = self._depth_luts[scale].to_points(disparity_map[y:y + 1, x:x + 1], x, y)[0, 0]
             LogManager.append_log(f"[Debug] 3D point: ({point_3d[0]}, {point_3d[1]}, {point_3d[2]})","DEBUG")
             
             z_3d = point_3d[2]
@@ -203,37 +763,22 @@ class RangingCalculator:
                 LogManager.append_log(f"Success: Distance = {distance} meters (from 3D)","INFO")
             else:
                 # Zʱùʽ
-                f = self._Q[2, 3]
+                f = Q[2, 3]
                 distance = (f * self._baseline) / disparity
                 LogManager.append_log(f"Success: Distance = {distance} meters (from formula)","INFO")
         elif disparity > 0.5:
             # ޱ궨ģʽ
-            fx = 695.0 if self._mtx_l is None else self._mtx_l[0, 0]
+            fx = (695.0 if self._mtx_l is None else self._mtx_l[0, 0]) / scale
             baseline = 0.0735 if self._baseline <= 0 else self._baseline
             distance = (fx * baseline) / disparity
             LogManager.append_log(f"Success: Distance = {distance} meters (uncalibrated)","INFO")
         else:
             LogManager.append_log(f"Error: Invalid disparity ({disparity})","ERROR")
-        
-        # ¾
-        with g_state.distance_lock:
-            g_state.distance = distance
+        return distance
             
-    def _init_stereo_sgbm(self) -> cv2.StereoSGBM:
-        """ʼSGBMƥ"""
-        stereo = cv2.StereoSGBM_create(
-              minDisparity=0,
-              numDisparities=16*12,
-              blockSize=11,
-              P1=8*3*11*11,
-              P2=32*3*11*11,
-              disp12MaxDiff=1,
-              uniquenessRatio=10,
-              speckleWindowSize=100,
-              speckleRange=32,
-              mode=cv2.STEREO_SGBM_MODE_HH 
-        )
-        return stereo
+    def _init_stereo_sgbm(self, scale: int = 1) -> cv2.StereoSGBM:
+        """ʼSGBMƥӲΧƥ䴰СС"""
+        return create_stereo_sgbm(scale)
     
     def _create_dir_if_not_exist(self, dir_path: str):
         if not IS_DEBUG:
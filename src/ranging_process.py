@@ -0,0 +1,229 @@
+# -*- coding: gbk -*-
+"""
+̸Ĳ๤
+RangingCalculatorڶӽУʱԤر궨еPython벻
+Qt¼ѭͲɼ߳GILڼԤ֡ʱȶ
+
+֡IPC䣺ɼ˰֡ڴ֡frame_ring
+ֻЯ (ID, , ֡, , )ӽ̰֡Ŵӹڴȡ
+ӽ̵־Pipe
+"""
+import time
+import multiprocessing
+from log_manager import LogManager
+from common import export_camera_detection
+from frame_ring import FrameRingReader, DEFAULT_RING_NAME
+from frame_quality import QUALITY_OK
+from ranging_worker import RangingWorker, FRAME_WAIT_TIMEOUT, RANGING_ERROR, measure_target
+
+# ȴӽOpenCVر궨ĳʱ룩
+PROCESS_START_TIMEOUT = 30.0
+# ȴʱӽǷļ룩
+RESULT_POLL_INTERVAL = 0.5
+
+
+def _drain_logs() -> list:
+    lines = LogManager.get_log_lines()
+    LogManager.clear_logs()
+    return lines
+
+
+def _ranging_process_main(conn, calib_path: str, ring_name: str, shared_ids, coalesce: bool, watch_calib: bool):
+    """
+    ӽ
+
+    shared_ids: int64 [ID, ȡ]ύȡʱ£
+    ӽSGBMֿ֮ȡ󵽴ʱǰ
+    """
+    from ranging_calculator import RangingCalculator
+    from calibration_watcher import CalibrationWatcher
+
+    calculator = RangingCalculator()
+    calibrated = calculator.load_calibration(calib_path) if calib_path else False
+    watcher = None
+    if calib_path and watch_calib:
+        watcher = CalibrationWatcher(calculator, calib_path)
+        watcher.start()
+    conn.send(("ready", calibrated, _drain_logs()))
+
+    reader = None
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message[0] != "measure":
+                break
+            _, request_id, click_point, frame_seq, region, points = message
+
+            def should_cancel():
+                return request_id < shared_ids[1] or (coalesce and request_id < shared_ids[0])
+
+            if reader is None:
+                try:
+                    reader = FrameRingReader(ring_name)
+                except (FileNotFoundError, ValueError) as e:
+                    LogManager.append_log(f"Error: Ranging process cannot attach frame ring '{ring_name}': {e}", "ERROR")
+            # ֡ѱʱ֡ʱԶλĸڣ�һ
+            result = None
+            if reader is not None:
+                result = reader.read_seq(frame_seq, copy=True) or reader.read_latest(copy=True)
+            if result is None:
+                LogManager.append_log("Error: Ranging failed - Empty frame", "ERROR")
+                conn.send(("result", request_id, frame_seq, 0.0, QUALITY_OK, None, _drain_logs()))
+                continue
+
+            seq, _, frame = result
+            try:
+                distance, reason, details = measure_target(calculator, frame, click_point, region, should_cancel,
+                                                           points)
+            except Exception as e:
+                # ʱЧӽ̼
+                LogManager.append_log(f"Error: Ranging request #{request_id} failed: {e!r}", "ERROR")
+                distance, reason, details = 0.0, RANGING_ERROR, None
+            if should_cancel():
+                distance = None
+            conn.send(("result", request_id, seq, distance, reason, details, _drain_logs()))
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if reader is not None:
+            reader.close()
+        conn.close()
+
+
+class RangingProcessWorker(RangingWorker):
+    """
+    ڶӽִвĹ
+
+    СϲȡRangingWorkerͬеĹֻ߳תͷ
+    Ҫɼͨ CameraManager.enable_frame_publisher ֡ͬĹڴ֡
+    """
+
+    def __init__(self, calib_path: str, frame_ring_name: str = DEFAULT_RING_NAME, watch_calib: bool = True,
+                 max_pending: int = 4, coalesce: bool = True, on_result=None, max_defer: int = 3):
+        """
+        Args:
+            calib_path: 궨ļ궨Ŀ¼ӽ̼
+            frame_ring_name: ڴ֡
+            watch_calib: ӽǷӱ궨ļԶ¼
+            ͬRangingWorker
+        """
+        super().__init__(None, max_pending=max_pending, coalesce=coalesce, on_result=on_result, max_defer=max_defer)
+        self._calib_path = calib_path
+        self._ring_name = frame_ring_name
+        self._watch_calib = watch_calib
+        # spawnӽ̲̳и̵߳Qt״̬
+        self._context = multiprocessing.get_context("spawn")
+        self._shared_ids = self._context.Array("q", 2, lock=False)
+        self._process = None
+        self._conn = None
+        self._ready = False
+        self._reader = None
+
+    def start(self):
+        """ӽת̣߳ȴӽ̾"""
+        if self._process is None:
+            self._start_process()
+        super().start()
+
+    def _start_process(self):
+        export_camera_detection()
+        self._conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_ranging_process_main, name="ranging-process", daemon=True,
+            args=(child_conn, self._calib_path, self._ring_name, self._shared_ids, self._coalesce,
+                  self._watch_calib))
+        self._process.start()
+        child_conn.close()
+        self._ready = False
+        LogManager.append_log(f"Ranging process started (pid {self._process.pid})", "INFO")
+
+    def _restart_process(self):
+        """ӽ˳һβʱȴ"""
+        process = self._process
+        LogManager.append_log(f"Error: Ranging process exited (code {process.exitcode}), restarting", "ERROR")
+        process.join(timeout=1.0)
+        self._conn.close()
+        self._start_process()
+
+    def stop(self):
+        """ֹͣת̲߳ӽ"""
+        self.cancel_all()
+        super().stop()
+        process, self._process = self._process, None
+        if process is not None:
+            try:
+                self._conn.send(("quit",))
+            except (OSError, ValueError):
+                pass
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=1.0)
+            self._conn.close()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def submit(self, click_point: tuple, region: tuple = None, points: tuple = None) -> int:
+        request_id = super().submit(click_point, region, points)
+        self._shared_ids[0] = request_id
+        return request_id
+
+    def cancel_all(self):
+        super().cancel_all()
+        self._shared_ids[1] = self._cancel_before
+
+    def _grab_frame(self) -> tuple:
+        """ (֡, ֡)ֻ֡Žӽ"""
+        if self._reader is None:
+            try:
+                self._reader = FrameRingReader(self._ring_name)
+            except (FileNotFoundError, ValueError):
+                return None, 0
+        seq = self._reader.latest_seq
+        return (seq, seq) if seq > 0 else (None, 0)
+
+    def _wait_new_frame(self, frame_seq: int) -> bool:
+        return self._reader is not None and self._reader.wait_for_frame(frame_seq, FRAME_WAIT_TIMEOUT)
+
+    def _measure(self, frame_seq, click_point: tuple, request_id: int, region: tuple = None,
+                 points: tuple = None) -> tuple:
+        try:
+            if not self._ready:
+                # ״βʱȴӽɱ궨
+                self._receive("ready", timeout=PROCESS_START_TIMEOUT)
+            self._conn.send(("measure", request_id, click_point, frame_seq, region, points))
+            _, _, _, distance, reason, details, _ = self._receive("result", request_id)
+        except (EOFError, OSError):
+            process = self._process
+            if process is not None and not process.is_alive() and self._running:
+                self._restart_process()
+            else:
+                LogManager.append_log("Error: Ranging process is not running", "ERROR")
+            return 0.0, RANGING_ERROR, None
+        return distance, reason, details
+
+    def _receive(self, kind: str, request_id: int = None, timeout: float = None) -> tuple:
+        """
+        ӽϢֱõָͣIDϢӽ̵־뱾
+
+        Raises:
+            EOFError: ӽ˳ȴʱ
+        """
+        process = self._process
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            if process is None or not self._conn.poll(RESULT_POLL_INTERVAL):
+                if process is None or not process.is_alive() or (deadline is not None and time.time() >= deadline):
+                    raise EOFError
+                continue
+            message = self._conn.recv()
+            LogManager.append_lines(message[-1])
+            if message[0] == "ready":
+                self._ready = True
+                LogManager.append_log(f"Ranging process ready (pid {process.pid}, calibrated: {message[1]})", "INFO")
+            if message[0] == kind and (request_id is None or message[1] == request_id):
+                return message
@@ -0,0 +1,249 @@
+# -*- coding: gbk -*-
+"""
+asyncioıزHTTP
+¼ѭͻˣSGBMJPEGȺʱŵִ̳߳
+
+ӿ:
+    GET  /status                         ״̬
+    POST /measure                        ࣬ {"x": .., "y": .., "coords": "preview"|"raw", "scale": 1|2|4}
+    GET  /stream?x=..&y=..&interval=1.0&scale=1  Server-Sent Events͸ٵľ
+    GET  /preview.jpg?width=320          ͷֱͼԤJPEG
+    GET  /motion?limit=10                ˶Զ״̬¼
+    POST /export                         Ӳͼƣͬ޽export
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from headless_main import (
+    HeadlessRangingService, DEFAULT_CALIB_FILE, add_frame_ring_arguments, add_motion_arguments, add_export_arguments
+)
+from common import STEREO_WIDTH, g_state
+from log_manager import LogManager
+import cv2
+
+# ͷ/С
+MAX_HEADER_LINES = 100
+MAX_BODY_SIZE = 64 * 1024
+# ʽ͵С룩
+MIN_STREAM_INTERVAL = 0.2
+
+_STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class RangingServer:
+    """asyncio"""
+
+    def __init__(self, service: HeadlessRangingService, encode_workers: int = 2):
+        self._service = service
+        # SGBMռCPU̴ִ߳УJPEGᣬɲ
+        self._ranging_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ranging")
+        self._encode_executor = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="encode")
+        # ʽĹ㣺(x, y, coords, scale) -> (ʼʱ֡, Future)
+        self._stream_jobs = {}
+
+    def close(self):
+        self._ranging_executor.shutdown(wait=False)
+        self._encode_executor.shutdown(wait=False)
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self._handle_client, host, port)
+        LogManager.append_log(f"Ranging server listening on http://{host}:{port}", "INFO")
+        print(f"Ranging server listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, path, query, body = request
+            if path == "/status" and method == "GET":
+                # ״̬ѯᣬ
+                await self._send_json(writer, 200, self._service.handle_request({"cmd": "status"}))
+            elif path in ("/measure", "/export"):
+                if method != "POST":
+                    await self._send_json(writer, 405, {"ok": False, "error": "Use POST"})
+                    return
+                try:
+                    params = json.loads(body or b"{}")
+                    if not isinstance(params, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    await self._send_json(writer, 400, {"ok": False, "error": f"Invalid request: {e}"})
+                    return
+                # ҪӲʱͬռSGBMһ߳
+                params["cmd"] = path[1:]
+                await self._send_json(writer, 200, await self._run_ranging(params))
+            elif path == "/stream" and method == "GET":
+                await self._stream_distance(writer, query)
+            elif path == "/preview.jpg" and method == "GET":
+                await self._send_preview(writer, query)
+            elif path == "/motion" and method == "GET":
+                await self._send_json(writer, 200, self._service.handle_request(
+                    {"cmd": "motion", "limit": query.get("limit", 10)}))
+            else:
+                await self._send_json(writer, 404, {"ok": False, "error": f"Unknown path: {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            await self._send_json(writer, 413, {"ok": False, "error": str(e)})
+        except Exception as e:
+            # е쳣500ǲӦֱӶϿ
+            LogManager.append_log(f"Error: HTTP request failed: {e!r}", "ERROR")
+            try:
+                await self._send_json(writer, 500, {"ok": False, "error": f"Internal error: {e}"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """HTTP󣬷 (method, path, query, body)"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) < 2:
+            return None
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0) or 0)
+        if length > MAX_BODY_SIZE:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length > 0 else b""
+        url = urlsplit(parts[1])
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return parts[0].upper(), url.path, query, body
+
+    async def _run_ranging(self, request: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._ranging_executor, self._service.handle_request, request)
+
+    async def _stream_distance(self, writer: asyncio.StreamWriter, query: dict):
+        """͸ٵĲֱͻ˶Ͽ"""
+        try:
+            x, y = float(query["x"]), float(query["y"])
+        except (KeyError, ValueError):
+            await self._send_json(writer, 400, {"ok": False, "error": "x and y are required"})
+            return
+        try:
+            scale = int(query.get("scale", 1))
+        except ValueError:
+            await self._send_json(writer, 400, {"ok": False, "error": f"Invalid scale: {query['scale']}"})
+            return
+        try:
+            interval = max(float(query.get("interval", 1.0)), MIN_STREAM_INTERVAL)
+        except ValueError:
+            await self._send_json(writer, 400, {"ok": False, "error": f"Invalid interval: {query['interval']}"})
+            return
+        request = {"cmd": "measure", "x": x, "y": y, "coords": query.get("coords", "preview"), "scale": scale}
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        seq = 0
+        while g_state.preview_running:
+            start = time.time()
+            result = await self._shared_measure(request)
+            writer.write(f"data: {json.dumps(dict(result, id=seq))}\n\n".encode("utf-8"))
+            await writer.drain()
+            seq += 1
+            await asyncio.sleep(max(0.0, interval - (time.time() - start)))
+
+    async def _shared_measure(self, request: dict) -> dict:
+        """
+        ʽĹ㣺ͬһ㡢ͬһСڽеļ㣬ڵǰ֡ɵļ㣬
+        ж߹ãÿֻһŶӣͻ˲ռ߳
+        """
+        with g_state.frame_lock:
+            frame_seq = g_state.frame_seq
+        key = (request["x"], request["y"], request["coords"], request["scale"])
+        job = self._stream_jobs.get(key)
+        if job is None or (job[1].done() and job[0] != frame_seq):
+            # Ҳǵǰ֡
+            for other in [k for k, (seq, future) in self._stream_jobs.items() if future.done() and seq != frame_seq]:
+                del self._stream_jobs[other]
+            job = (frame_seq, asyncio.ensure_future(self._run_ranging(dict(request))))
+            self._stream_jobs[key] = job
+        # shieldĳ߶Ͽʱȡ߹õļ
+        return await asyncio.shield(job[1])
+
+    async def _send_preview(self, writer: asyncio.StreamWriter, query: dict):
+        try:
+            width = int(query.get("width", 320))
+            quality = int(query.get("quality", 70))
+        except ValueError:
+            await self._send_json(writer, 400, {"ok": False, "error": "Invalid width/quality"})
+            return
+        width = min(max(width, 16), STEREO_WIDTH // 2)
+        with g_state.frame_lock:
+            raw_frame = g_state.raw_frame
+        if raw_frame is None:
+            await self._send_json(writer, 503, {"ok": False, "error": "Empty frame"})
+            return
+        loop = asyncio.get_running_loop()
+        jpeg = await loop.run_in_executor(self._encode_executor, _encode_preview, raw_frame, width, quality)
+        await self._send(writer, 200, "image/jpeg", jpeg)
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        await self._send(writer, status, "application/json", json.dumps(payload).encode("utf-8"))
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes):
+        header = (f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}\r\n"
+                  f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                  f"Connection: close\r\n\r\n")
+        writer.write(header.encode("latin-1") + body)
+        await writer.drain()
+
+
+def _encode_preview(raw_frame, width: int, quality: int) -> bytes:
+    """ͼΪJPEGִ̳߳У"""
+    left = raw_frame[:, :STEREO_WIDTH//2]
+    height = max(1, int(left.shape[0] * width / left.shape[1]))
+    small = cv2.resize(left, (width, height), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else b""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio HTTP ranging server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--calib", default=DEFAULT_CALIB_FILE, help="Calibration NPZ file or bundle directory")
+    parser.add_argument("--synthetic", action="store_true", help="Use the synthetic stereo source instead of a camera")
+    parser.add_argument("--no-watch", action="store_true", help="Do not reload the calibration when the file changes")
+    add_frame_ring_arguments(parser)
+    add_motion_arguments(parser)
+    add_export_arguments(parser)
+    args = parser.parse_args()
+
+    service = HeadlessRangingService(args.calib, synthetic=args.synthetic, watch_calib=not args.no_watch,
+                                     attach_frames=args.attach_frames, publish_frames=args.publish_frames,
+                                     auto_motion=args.auto_motion, motion_log=args.motion_log,
+                                     export_dir=args.export_dir, export_interval=args.export_interval)
+    service.start()
+    server = RangingServer(service)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+# -*- coding: gbk -*-
+import time
+import threading
+from collections import deque
+from log_manager import LogManager
+from common import g_state
+from frame_quality import QUALITY_OK, DEFERRABLE_REASONS
+
+# ȴ֡ʱѯ볬ʱ룩
+FRAME_POLL_INTERVAL = 0.01
+FRAME_WAIT_TIMEOUT = 0.5
+# ̳쳣ʱԭ루֡ԭһʾڽϣ
+RANGING_ERROR = "error"
+
+
+def measure_target(calculator, frame, click_point: tuple, region: tuple, should_cancel, points: tuple = None) -> tuple:
+    """
+    RangingCalculatorһ㡢һ֮ľ루Ԥ꣩
+
+    Returns:
+        tuple: (룬ȡʱΪNone, ֡ԭ, ϸRegionStats/PointDistancesNone)
+        ʱΪλʱΪ߶ܳ
+    """
+    if region is not None:
+        stats = calculator.measure_region(frame, calculator.preview_to_raw_rect(region), should_cancel=should_cancel)
+        if stats is None:
+            return None, QUALITY_OK, None
+        return stats.median, _quality_reason(stats.quality), stats
+    if points is not None:
+        result = calculator.measure_points(frame, [calculator.preview_to_raw_point(p) for p in points],
+                                           should_cancel=should_cancel)
+        if result is None:
+            return None, QUALITY_OK, None
+        return result.total, _quality_reason(result.quality), result
+    distance, quality = calculator.measure_frame_with_quality(frame, calculator.preview_to_raw_point(click_point),
+                                                              should_cancel=should_cancel)
+    return distance, _quality_reason(quality), None
+
+
+def _quality_reason(quality) -> str:
+    return quality.reason if quality is not None else QUALITY_OK
+
+
+class RangingResult:
+    """
+    ¼ӦID֡
+    ʱdistanceΪλdetailsΪRegionStatsʱdistanceΪܳȡdetailsΪPointDistances
+    """
+    def __init__(self, request_id: int, frame_seq: int, click_point: tuple, distance: float, elapsed: float,
+                 reason: str = QUALITY_OK, details=None):
+        self.request_id = request_id
+        self.frame_seq = frame_seq
+        self.click_point = click_point
+        self.distance = distance
+        self.elapsed = elapsed
+        self.reason = reason
+        self.details = details
+
+
+class RangingWorker:
+    """
+    ̲߳๤
+
+    внУͬһ̴ִ߳УSGBMͬʱCPU
+    coalesceΪTrueʱ滻δʼľ󣬽󵽴Ľٷ
+    """
+
+    def __init__(self, ranging_calculator, max_pending: int = 4, coalesce: bool = True, on_result=None,
+                 max_defer: int = 3):
+        """
+        Args:
+            ranging_calculator: RangingCalculatorʵ
+            max_pending: ȴޣʱɵ
+            coalesce: ǷֻµĴ
+            on_result: ص on_result(RangingResult)ڹ߳е
+            max_defer: ֡жΪɵȴ˶ģʱú֡ԵĴ
+        """
+        self._calculator = ranging_calculator
+        self._max_defer = max_defer
+        self._coalesce = coalesce
+        self._on_result = on_result
+        self._pending = deque(maxlen=max_pending)
+        self._cond = threading.Condition()
+        self._next_id = 0
+        self._latest_id = 0
+        self._cancel_before = 0
+        self._cancelled = set()
+        self._running = False
+        self._thread = None
+        # ǰõ֡ţʱ
+        self._job_frame_seq = 0
+
+    def start(self):
+        """߳"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._worker_func, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ֹ̣ͣ߳δ"""
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def submit(self, click_point: tuple, region: tuple = None, points: tuple = None) -> int:
+        """
+        ύһβ
+
+        Args:
+            click_point: Ԥ (x, y)
+            region: ѡԤ (x0, y0, x1, y1)ָʱͳ
+            points: ѡԤбָʱͬһӲϲڵά
+
+        Returns:
+            ID
+        """
+        with self._cond:
+            self._next_id += 1
+            request_id = self._next_id
+            self._latest_id = request_id
+            if self._coalesce and self._pending:
+                LogManager.append_log(f"Ranging request(s) {[job[0] for job in self._pending]} superseded by #{request_id}", "DEBUG")
+                self._pending.clear()
+            self._pending.append((request_id, click_point, region, points))
+            self._cond.notify()
+        return request_id
+
+    def cancel(self, request_id: int):
+        """ȡָδʼֱӶ"""
+        with self._cond:
+            remaining = deque((job for job in self._pending if job[0] != request_id), maxlen=self._pending.maxlen)
+            if len(remaining) == len(self._pending):
+                self._cancelled.add(request_id)
+            self._pending = remaining
+
+    def cancel_all(self):
+        """ȡȫе"""
+        with self._cond:
+            self._pending.clear()
+            self._cancel_before = self._next_id + 1
+
+    def is_stale(self, request_id: int) -> bool:
+        """Ƿѱȡ򱻸µȡ"""
+        with self._cond:
+            if request_id in self._cancelled or request_id < self._cancel_before:
+                return True
+            return self._coalesce and request_id < self._latest_id
+
+    def _worker_func(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                request_id, click_point, region, points = self._pending.popleft()
+
+            if self.is_stale(request_id):
+                continue
+            try:
+                result = self._run_job(request_id, click_point, region, points)
+            except Exception as e:
+                # ܽΨһĲ̣߳ԭĽ
+                LogManager.append_log(f"Error: Ranging request #{request_id} failed: {e!r}", "ERROR")
+                result = RangingResult(request_id, self._job_frame_seq, click_point, 0.0, 0.0, RANGING_ERROR)
+
+            with self._cond:
+                self._cancelled.discard(request_id)
+            if result is None or self.is_stale(request_id):
+                LogManager.append_log(f"Ranging request #{request_id} discarded (stale)", "DEBUG")
+                continue
+
+            # 
+            with g_state.distance_lock:
+                g_state.distance = result.distance
+                g_state.distance_request_id = result.request_id
+                g_state.distance_frame_seq = result.frame_seq
+                g_state.distance_reason = result.reason
+                g_state.distance_details = result.details.to_dict() if result.details is not None else None
+            if self._on_result is not None:
+                self._on_result(result)
+
+    def _run_job(self, request_id: int, click_point: tuple, region: tuple = None, points: tuple = None):
+        if not g_state.preview_running:
+            LogManager.append_log("Error: Ranging failed - Camera is not running", "ERROR")
+            return RangingResult(request_id, 0, click_point, 0.0, 0.0)
+        start = time.time()
+        frame_seq = 0
+        self._job_frame_seq = 0
+        for attempt in range(self._max_defer + 1):
+            if attempt > 0:
+                # ʱģ˶ģȴһ֡
+                LogManager.append_log(f"Ranging request #{request_id} deferred ({reason}), waiting for next frame", "INFO")
+                if not self._wait_new_frame(frame_seq) or self.is_stale(request_id):
+                    break
+            frame, frame_seq = self._grab_frame()
+            self._job_frame_seq = frame_seq
+            if frame is None:
+                LogManager.append_log("Error: Ranging failed - Empty frame", "ERROR")
+                return RangingResult(request_id, frame_seq, click_point, 0.0, 0.0)
+
+            distance, reason, details = self._measure(frame, click_point, request_id, region, points)
+            if distance is None:
+                return None
+            if reason not in DEFERRABLE_REASONS:
+                break
+
+        elapsed = time.time() - start
+        LogManager.append_log(f"Ranging request #{request_id} done on frame {frame_seq} in {elapsed*1000:.0f} ms", "INFO")
+        return RangingResult(request_id, frame_seq, click_point, float(distance), elapsed, reason, details)
+
+    def _grab_frame(self) -> tuple:
+        """ȡǰ֡ (֡, ֡)֡ʱ֡ΪNone"""
+        # ɼ߳ÿ֡滻raw_frameԭ޸ģüɣ追
+        with g_state.frame_lock:
+            return g_state.raw_frame, g_state.frame_seq
+
+    def _measure(self, frame, click_point: tuple, request_id: int, region: tuple = None, points: tuple = None) -> tuple:
+        """
+        һִ֡в
+
+        Returns:
+            tuple: (룬ȡʱΪNone, ֡ԭ, ϸNone)ͬmeasure_target
+        """
+        return measure_target(self._calculator, frame, click_point, region, lambda: self.is_stale(request_id), points)
+
+    def _wait_new_frame(self, frame_seq: int) -> bool:
+        """ȴɼ̲߳֡ʱFalse"""
+        deadline = time.time() + FRAME_WAIT_TIMEOUT
+        while time.time() < deadline:
+            if not g_state.preview_running:
+                return False
+            with g_state.frame_lock:
+                if g_state.frame_seq != frame_seq:
+                    return True
+            time.sleep(FRAME_POLL_INTERVAL)
+        return False
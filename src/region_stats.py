@@ -0,0 +1,67 @@
+# -*- coding: gbk -*-
+"""
+Ƚͳ
+ԾڵֵһԼλСֵλЧرֱͼ
+ȵƽʺϲ̡ȽϴĿľ
+"""
+import numpy as np
+
+# ȷλٷֱȣ
+REGION_PERCENTILES = (5, 25, 50, 75, 95)
+# ֱͼķ
+REGION_HIST_BINS = 8
+# ЧȷΧף
+REGION_MIN_DEPTH = 0.01
+REGION_MAX_DEPTH = 100.0
+
+
+class RegionStats:
+    """ͳƽ"""
+    def __init__(self, rect: tuple, valid_ratio: float, min_depth: float, percentiles: dict,
+                 hist_counts: list, hist_edges: list):
+        self.rect = rect
+        self.valid_ratio = valid_ratio
+        self.min_depth = min_depth
+        self.percentiles = percentiles
+        self.hist_counts = hist_counts
+        self.hist_edges = hist_edges
+        # ƥǰ֡FrameQualityδʱΪNone
+        self.quality = None
+
+    @property
+    def ok(self) -> bool:
+        return self.valid_ratio > 0
+
+    @property
+    def median(self) -> float:
+        return self.percentiles.get(50, 0.0)
+
+    def to_dict(self) -> dict:
+        return {
+            "rect": [int(v) for v in self.rect],
+            "valid_ratio": round(self.valid_ratio, 3),
+            "median": round(self.median, 4),
+            "min": round(self.min_depth, 4),
+            "percentiles": {str(p): round(v, 4) for p, v in self.percentiles.items()},
+            "histogram": {"counts": self.hist_counts, "edges": [round(e, 4) for e in self.hist_edges]},
+            "quality": self.quality.to_dict() if self.quality is not None else None,
+        }
+
+
+def region_stats_from_depth(depth: np.ndarray, rect: tuple) -> RegionStats:
+    """
+    ͼףЧΪ0ͳ
+
+    Args:
+        depth: ڵֵ״
+        rect:  (x0, y0, x1, y1)ԭ¼ڽ
+    """
+    valid = (depth > REGION_MIN_DEPTH) & (depth < REGION_MAX_DEPTH)
+    values = depth[valid]
+    if values.size == 0:
+        return RegionStats(rect, 0.0, 0.0, {p: 0.0 for p in REGION_PERCENTILES}, [], [])
+    percentiles = np.percentile(values, REGION_PERCENTILES)
+    counts, edges = np.histogram(values, bins=REGION_HIST_BINS)
+    return RegionStats(rect, float(values.size) / depth.size, float(values.min()),
+                       {p: float(v) for p, v in zip(REGION_PERCENTILES, percentiles)},
+                       counts.tolist(), edges.tolist())
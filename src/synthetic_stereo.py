@@ -0,0 +1,270 @@
+# -*- coding: gbk -*-
+"""
+ϳ˫Ŀ
+ݱ궨QߡࣩȾ֪ȵƽ뷽飬
+ƴ֡ӦֵӲͼ/ͼӲĲ뾫֤
+"""
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+from common import STEREO_WIDTH, STEREO_HEIGHT
+from ranging_calculator import uncalibrated_q_matrix
+
+# ޱ궨ļʱĬϲRangingCalculatorޱ궨ģʽһ£
+DEFAULT_FOCAL = 695.0
+DEFAULT_BASELINE = 0.0735
+
+
+class SyntheticStereoScene:
+    """ϳ˫ĿУϵµƽ뷽飩"""
+
+    def __init__(self, focal: float = DEFAULT_FOCAL, baseline: float = DEFAULT_BASELINE,
+                 image_size: tuple = None, Q: np.ndarray = None, seed: int = 0):
+        if image_size is None:
+            image_size = (STEREO_WIDTH // 2, STEREO_HEIGHT)
+        self._img_size = (int(image_size[0]), int(image_size[1]))
+        self._focal = float(focal)
+        self._baseline = float(baseline)
+        if Q is None:
+            Q = uncalibrated_q_matrix(self._focal, self._baseline, self._img_size)
+        self._Q = np.asarray(Q, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+        self._objects = []
+
+        # У -> ԭʼӳ䣨ӱ궨ļʱڣ
+        self._raw_maps = None
+
+    @classmethod
+    def from_calibration(cls, npz_path: str, seed: int = 0) -> "SyntheticStereoScene":
+        """
+        ӱ궨ļȾΪδУԭʼ֡
+
+        Args:
+            npz_path: generate_calib_params.py ɵNPZļ
+        """
+        data = np.load(npz_path)
+        Q = data['Q']
+        baseline = float(data.get('baseline', 0.0)) or 1.0 / Q[3, 2]
+        scene = cls(focal=Q[2, 3], baseline=baseline, image_size=tuple(data['img_size']), Q=Q, seed=seed)
+        if all(k in data for k in ('mtx_l', 'dist_l', 'R1', 'P1', 'mtx_r', 'dist_r', 'R2', 'P2')):
+            scene._raw_maps = (
+                scene._build_raw_map(data['mtx_l'], data['dist_l'], data['R1'], data['P1']),
+                scene._build_raw_map(data['mtx_r'], data['dist_r'], data['R2'], data['P2']),
+            )
+        return scene
+
+    @classmethod
+    def default_scene(cls, seed: int = 0, **kwargs) -> "SyntheticStereoScene":
+        """ƽͬȷĬϳ"""
+        scene = cls(seed=seed, **kwargs)
+        w, h = scene._img_size
+        scene.add_plane(4.0)
+        scene.add_box(int(w * 0.20), int(h * 0.15), int(w * 0.25), int(h * 0.40), 2.5)
+        scene.add_box(int(w * 0.50), int(h * 0.30), int(w * 0.20), int(h * 0.35), 1.8)
+        scene.add_box(int(w * 0.35), int(h * 0.55), int(w * 0.30), int(h * 0.35), 1.0)
+        return scene
+
+    @property
+    def focal(self) -> float:
+        return self._focal
+
+    @property
+    def baseline(self) -> float:
+        return self._baseline
+
+    @property
+    def image_size(self) -> tuple:
+        return self._img_size
+
+    @property
+    def objects(self) -> list:
+        return list(self._objects)
+
+    def add_plane(self, depth: float):
+        """Ӹȫƽ"""
+        w, h = self._img_size
+        self.add_box(0, 0, w, h, depth)
+
+    def add_box(self, x: int, y: int, w: int, h: int, depth: float):
+        """ͼУϵµԷ飨x, y, w, h أ"""
+        self._objects.append({
+            "rect": (int(x), int(y), int(w), int(h)),
+            "depth": float(depth),
+            "texture": self._make_texture(),
+        })
+
+    def depth_to_disparity(self, depth: float) -> float:
+        """QתΪӲZ = f / (Q32 * d + Q33)"""
+        return (self._Q[2, 3] / depth - self._Q[3, 3]) / self._Q[3, 2]
+
+    def render(self, noise_sigma: float = 0.0) -> tuple:
+        """
+        Ⱦһ֡
+
+        Args:
+            noise_sigma: ӵĸ˹׼Ҷȼ
+
+        Returns:
+            tuple: (ƴ֡, ֵӲͼ, ֵͼ)ֵͼУϵ£ЧΪ0
+        """
+        w, h = self._img_size
+        left = np.zeros((h, w, 3), dtype=np.uint8)
+        right = np.zeros((h, w, 3), dtype=np.uint8)
+        disparity = np.zeros((h, w), dtype=np.float32)
+        depth = np.zeros((h, w), dtype=np.float32)
+        xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+
+        # ԶƣȻڵԶ
+        for obj in sorted(self._objects, key=lambda o: -o["depth"]):
+            x, y, bw, bh = obj["rect"]
+            d = self.depth_to_disparity(obj["depth"])
+            mask = np.zeros((h, w), dtype=np.uint8)
+            mask[max(y, 0):y + bh, max(x, 0):x + bw] = 255
+
+            left[mask > 0] = obj["texture"][mask > 0]
+            disparity[mask > 0] = d
+            depth[mask > 0] = obj["depth"]
+
+            # ͼе x_r Ӧͼ x_r + d
+            map_x = xs + np.float32(d)
+            right_tex = cv2.remap(obj["texture"], map_x, ys, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+            right_mask = cv2.remap(mask, map_x, ys, cv2.INTER_NEAREST, borderValue=0)
+            right[right_mask > 0] = right_tex[right_mask > 0]
+
+        if self._raw_maps is not None:
+            left = cv2.remap(left, self._raw_maps[0][0], self._raw_maps[0][1], cv2.INTER_LINEAR)
+            right = cv2.remap(right, self._raw_maps[1][0], self._raw_maps[1][1], cv2.INTER_LINEAR)
+
+        frame = np.hstack((left, right))
+        if noise_sigma > 0:
+            noise = self._rng.normal(0.0, noise_sigma, frame.shape)
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        return frame, disparity, depth
+
+    def write_calibration(self, npz_path: str):
+        """д뱾һµı궨ļУӳ䣬ڷǱ궨ļĳ"""
+        w, h = self._img_size
+        mtx = np.array([[self._focal, 0, -self._Q[0, 3]],
+                        [0, self._focal, -self._Q[1, 3]],
+                        [0, 0, 1]], dtype=np.float64)
+        map_x, map_y = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+        np.savez(
+            npz_path,
+            mtx_l=mtx, dist_l=np.zeros(5), mtx_r=mtx, dist_r=np.zeros(5),
+            map1x=map_x, map1y=map_y, map2x=map_x, map2y=map_y,
+            Q=self._Q, img_size=self._img_size, baseline=self._baseline
+        )
+
+    def _make_texture(self) -> np.ndarray:
+        """ɶ߶֤ƥ㹻"""
+        w, h = self._img_size
+        coarse = self._rng.integers(0, 256, (h // 16 + 1, w // 16 + 1, 3), dtype=np.uint8)
+        coarse = cv2.resize(coarse, (w, h), interpolation=cv2.INTER_CUBIC)
+        fine = self._rng.integers(0, 256, (h // 2 + 1, w // 2 + 1, 3), dtype=np.uint8)
+        fine = cv2.resize(fine, (w, h), interpolation=cv2.INTER_LINEAR)
+        return cv2.addWeighted(coarse, 0.5, fine, 0.5, 0)
+
+    def _build_raw_map(self, mtx, dist, R, P) -> tuple:
+        """ÿԭʼУͼеλãڰУͼԭΪԭʼ֡"""
+        w, h = self._img_size
+        xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+        pts = np.stack((xs, ys), axis=-1).reshape(-1, 1, 2)
+        rect = cv2.undistortPoints(pts, mtx, dist, R=R, P=P).reshape(h, w, 2)
+        return rect[..., 0].copy(), rect[..., 1].copy()
+
+
+class SyntheticStereoSource:
+    """
+    cv2.VideoCaptureӿڼݵĺϳ֡Դ
+    滻CameraManagerԤ߳еͷ
+    """
+
+    def __init__(self, scene: SyntheticStereoScene = None, fps: float = 15.0, noise_sigma: float = 2.0):
+        self._scene = scene if scene is not None else SyntheticStereoScene.default_scene()
+        self._fps = fps
+        self._noise_sigma = noise_sigma
+        self._frame, self._disparity, self._depth = self._scene.render()
+        self._rng = np.random.default_rng(1)
+        self._opened = True
+        self._last_read = 0.0
+        self.frame_count = 0
+
+    @property
+    def scene(self) -> SyntheticStereoScene:
+        return self._scene
+
+    def ground_truth(self) -> tuple:
+        """ (ֵӲͼ, ֵͼ)"""
+        return self._disparity, self._depth
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def read(self) -> tuple:
+        if not self._opened:
+            return False, None
+        # ֡ʽģͷ
+        if self._fps > 0:
+            wait = self._last_read + 1.0 / self._fps - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_read = time.time()
+        frame = self._frame
+        if self._noise_sigma > 0:
+            noise = self._rng.normal(0.0, self._noise_sigma, frame.shape)
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        else:
+            frame = frame.copy()
+        self.frame_count += 1
+        return True, frame
+
+    def set(self, prop_id: int, value) -> bool:
+        return False
+
+    def get(self, prop_id: int) -> float:
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._frame.shape[1])
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._frame.shape[0])
+        if prop_id == cv2.CAP_PROP_FPS:
+            return float(self._fps)
+        return 0.0
+
+    def release(self):
+        self._opened = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render synthetic stereo frames with ground-truth disparity/depth")
+    parser.add_argument("--calib", help="Calibration NPZ to render from (default: built-in parameters)")
+    parser.add_argument("--output", default="synthetic_frames", help="Output directory")
+    parser.add_argument("--frames", type=int, default=1, help="Number of frames to render")
+    parser.add_argument("--noise", type=float, default=2.0, help="Gaussian sensor noise sigma")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.calib:
+        scene = SyntheticStereoScene.from_calibration(args.calib, seed=args.seed)
+        w, h = scene.image_size
+        scene.add_plane(4.0)
+        scene.add_box(int(w * 0.35), int(h * 0.40), int(w * 0.30), int(h * 0.40), 1.0)
+    else:
+        scene = SyntheticStereoScene.default_scene(seed=args.seed)
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+    for i in range(args.frames):
+        frame, disparity, depth = scene.render(noise_sigma=args.noise)
+        cv2.imwrite(os.path.join(args.output, f"frame_{i:03d}.png"), frame)
+        np.save(os.path.join(args.output, f"disparity_{i:03d}.npy"), disparity)
+        np.save(os.path.join(args.output, f"depth_{i:03d}.npy"), depth)
+    if not args.calib:
+        scene.write_calibration(os.path.join(args.output, "synthetic_calib.npz"))
+    print(f"Rendered {args.frames} frame(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# -*- coding: gbk -*-
+"""
+Ŀ
+Ԥֱʵͼģƥ䣨ڵĹһأѡ
+ÿ֡ڸλһࣨRangingCalculator.measure_roiͼSGBM
+ָƽ󷢲ȫ״̬ƶĿľԤ֡ʳˢ
+"""
+import time
+import threading
+import cv2
+from log_manager import LogManager
+from common import STEREO_WIDTH, PREVIEW_WIDTH, PREVIEW_HEIGHT, g_state
+from frame_quality import QUALITY_OK
+from ranging_worker import FRAME_POLL_INTERVAL
+
+# ʧܵԭ루֡ԭһʾڽϣ
+TRACK_LOST = "target_lost"
+# ģ뾶뾶Ԥأ
+TRACK_PATCH_RADIUS = 12
+TRACK_SEARCH_RADIUS = 24
+# һص÷ޣڴֵΪĿ궪ʧ
+TRACK_MIN_SCORE = 0.5
+# ÷ָڴֵʱõǰλˢģ壬Ŀ۵Ļ仯
+TRACK_UPDATE_SCORE = 0.9
+# ÿ֡һ
+TRACK_RANGE_INTERVAL = 3
+# ָƽϵ²ֵȨأ
+TRACK_SMOOTHING = 0.3
+# ²ֵƽֵ˱ʱֱӲֵĿǰ䣩
+TRACK_RESET_RATIO = 0.5
+
+
+def preview_gray(raw_frame):
+    """ԭʼ֡ͼСԤֱʵĻҶͼ"""
+    small = cv2.resize(raw_frame[:, :STEREO_WIDTH // 2], (PREVIEW_WIDTH, PREVIEW_HEIGHT), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+class PatchTracker:
+    """ģƥĵĿ"""
+
+    def __init__(self, gray, point: tuple, patch_radius: int = TRACK_PATCH_RADIUS,
+                 search_radius: int = TRACK_SEARCH_RADIUS):
+        """
+        Args:
+            gray: ԤֱʻҶͼ
+            point: ĿģԤ꣩
+        """
+        self._patch_radius = patch_radius
+        self._search_radius = search_radius
+        self.point = self._clamp(point, gray.shape)
+        self.score = 1.0
+        self._template = self._patch(gray, self.point)
+
+    def _clamp(self, point: tuple, shape: tuple) -> tuple:
+        r = self._patch_radius
+        return (min(max(int(point[0]), r), shape[1] - r - 1), min(max(int(point[1]), r), shape[0] - r - 1))
+
+    def _patch(self, gray, point: tuple):
+        r = self._patch_radius
+        return gray[point[1] - r:point[1] + r + 1, point[0] - r:point[0] + r + 1].copy()
+
+    def update(self, gray):
+        """
+        µһ֡вĿ
+
+        Returns:
+            µĿģԤ꣩÷ֵTRACK_MIN_SCOREʱNoneλñֲ
+        """
+        r, s = self._patch_radius, self._search_radius
+        x, y = self.point
+        x0, y0 = max(0, x - r - s), max(0, y - r - s)
+        window = gray[y0:y + r + s + 1, x0:x + r + s + 1]
+        scores = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, self.score, _, loc = cv2.minMaxLoc(scores)
+        if self.score < TRACK_MIN_SCORE:
+            return None
+        self.point = self._clamp((x0 + loc[0] + r, y0 + loc[1] + r), gray.shape)
+        if self.score >= TRACK_UPDATE_SCORE:
+            self._template = self._patch(gray, self.point)
+        return self.point
+
+
+class TrackingRanger:
+    """
+    ٲ̣߳ÿ֡һθλãg_state.click_point֮ƶ
+    ÿTRACK_RANGE_INTERVAL֡һಢƽдg_state.distance
+    """
+
+    def __init__(self, ranging_calculator, range_interval: int = TRACK_RANGE_INTERVAL,
+                 smoothing: float = TRACK_SMOOTHING, on_update=None):
+        """
+        Args:
+            ranging_calculator: RangingCalculatorʵ
+            range_interval: ÿ֡һ
+            smoothing: ָƽϵ
+            on_update: ѡص on_update(Ԥ, ƽ, ԭ)ڸ߳е
+        """
+        self._calculator = ranging_calculator
+        self._range_interval = max(1, range_interval)
+        self._smoothing = smoothing
+        self._on_update = on_update
+        self._lock = threading.Lock()
+        self._pending_point = None
+        self._running = False
+        self._thread = None
+        self._point = None
+        self._distance = 0.0
+        self._reason = QUALITY_OK
+
+    @property
+    def tracking(self) -> bool:
+        return self._running
+
+    def state(self) -> dict:
+        """ǰ״̬Ԥꡢƽ롢ԭ룩"""
+        with self._lock:
+            return {"tracking": self._running, "point": self._point, "distance": self._distance, "reason": self._reason}
+
+    def start(self, click_point: tuple):
+        """Ԥclick_pointʼ٣ڸʱΪĿ꣩"""
+        with self._lock:
+            self._pending_point = (int(click_point[0]), int(click_point[1]))
+            if self._running:
+                return
+            self._running = True
+        g_state.tracking = True
+        self._thread = threading.Thread(target=self._track_func, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ֹͣ"""
+        with self._lock:
+            self._running = False
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        g_state.tracking = False
+
+    def _next_frame(self, frame_seq: int) -> tuple:
+        """ȴ֡ (֡, ֡)ֹͣرʱ (None, frame_seq)"""
+        while self._running and g_state.preview_running:
+            with g_state.frame_lock:
+                if g_state.frame_seq != frame_seq and g_state.raw_frame is not None:
+                    return g_state.raw_frame, g_state.frame_seq
+            time.sleep(FRAME_POLL_INTERVAL)
+        return None, frame_seq
+
+    def _track_func(self):
+        tracker = None
+        frame_seq = 0
+        frames_since_range = 0
+        while self._running:
+            frame, frame_seq = self._next_frame(frame_seq)
+            if frame is None:
+                break
+            gray = preview_gray(frame)
+
+            with self._lock:
+                new_point, self._pending_point = self._pending_point, None
+            if new_point is not None:
+                tracker = PatchTracker(gray, new_point)
+                frames_since_range = self._range_interval
+                self._publish(tracker.point, 0.0, QUALITY_OK, reset=True)
+                LogManager.append_log(f"Tracking target at ({tracker.point[0]}, {tracker.point[1]})", "INFO")
+                point = tracker.point
+            else:
+                point = tracker.update(gray)
+                if point is None:
+                    if self._reason != TRACK_LOST:
+                        LogManager.append_log(f"Tracking lost (score {tracker.score:.2f})", "WARN")
+                    self._publish(tracker.point, 0.0, TRACK_LOST, reset=True)
+                    continue
+                frames_since_range += 1
+
+            if frames_since_range >= self._range_interval:
+                frames_since_range = 0
+                distance = self._calculator.measure_roi(frame, self._calculator.preview_to_raw_point(point))
+                self._publish(point, distance, QUALITY_OK)
+            else:
+                self._publish(point, None, QUALITY_OK)
+        with self._lock:
+            self._running = False
+        g_state.tracking = False
+
+    def _publish(self, point: tuple, distance, reason: str, reset: bool = False):
+        """
+        ¸λƽ
+
+        Args:
+            distance: ²ֵNoneʾ֡δ࣬0ʾЧӲһƽֵ
+            reset: ƽ״̬
+        """
+        with self._lock:
+            self._point = point
+            self._reason = reason
+            if reset:
+                self._distance = 0.0
+            elif distance:
+                previous = self._distance
+                if previous <= 0 or abs(distance - previous) > TRACK_RESET_RATIO * previous:
+                    self._distance = distance
+                else:
+                    self._distance = previous + self._smoothing * (distance - previous)
+            smoothed = self._distance
+
+        g_state.click_point = point
+        g_state.has_click = True
+        with g_state.distance_lock:
+            g_state.distance = smoothed
+            g_state.distance_reason = reason
+            g_state.distance_details = None
+        if self._on_update is not None:
+            self._on_update(point, smoothed, reason)
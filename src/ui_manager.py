@@ -1,6 +1,5 @@
 # -*- coding: gbk -*-
 import os
-import threading
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QLineEdit, QCheckBox, QMessageBox, QGroupBox,
@@ -8,12 +7,22 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QTimer, QSize
 from PySide6.QtGui import QFont, QPixmap, QImage, QMouseEvent, QTextCursor
-from common import PREVIEW_WIDTH, PREVIEW_HEIGHT, g_state, CAPTURE_L_PATH, CAPTURE_R_PATH
+from common import PREVIEW_WIDTH, PREVIEW_HEIGHT, g_state, CAPTURE_L_PATH, CAPTURE_R_PATH, get_calibration_path
 from camera_manager import CameraManager, mat_to_qimage
 from ranging_calculator import RangingCalculator
+from ranging_worker import RangingWorker
+from target_tracking import TrackingRanger
+from point_distance import MAX_MEASURE_POINTS
+from depth_overlay import DepthOverlay, DEPTH_OVERLAY_MODE
+from motion_ranging import MotionRanger
+from depth_export import DepthExporter, LiveDepthExport
+from calibration_watcher import CalibrationWatcher
 from log_manager import LogManager
 import cv2
 
+# ϶˾루ԤأΪѡ򣬷򰴵
+REGION_DRAG_MIN = 5
+
 
 class ScalableLabel(QLabel):
     """ӦŵԤǩ֧˫лȫ"""
@@ -215,9 +224,25 @@ class UIManager(QWidget):
         self.setup_styles()
         self._camera_manager = CameraManager()
         self._ranging_calculator = RangingCalculator()
+        # ̲߳๤ֻһ
+        self._ranging_worker = RangingWorker(self._ranging_calculator)
+        self._ranging_worker.start()
+        # ٲࣺѡ"Track target"Ŀᱻٲ
+        self._tracking_ranger = TrackingRanger(self._ranging_calculator)
+        # ͼԤģʽ3ʱں̨Եͷֱʼ㲢ӵԤ
+        self._depth_overlay = DepthOverlay(self._ranging_calculator)
+        self._camera_manager.set_depth_overlay(self._depth_overlay)
+        # ˶Զࣺѡг˶ʱԶ
+        self._motion_ranger = MotionRanger(self._ranging_calculator)
+        # ӲͼƵ̨д룬ֵ֧һβ򰴹̶
+        self._depth_exporter = DepthExporter()
+        self._depth_exporter.start()
+        self._live_export = LiveDepthExport(self._ranging_calculator, self._depth_exporter)
         
         # ״̬¼ǷȫԤ
         self._is_fullscreen_preview = False
+        # ԤλãԤֵ꣩϶ѡ
+        self._drag_start = None
         
         # 
         self.setWindowTitle("Camera Distance Measurement")
@@ -231,15 +256,15 @@ class UIManager(QWidget):
         # ʼ־
         LogManager.append_log("Starting Camera Distance Mesurement Application", "INFO")
 
-        # ر궨
-        npz_path = os.path.join(os.path.dirname(__file__), "..", "tools", "stereo_calib_params.npz")
-        if self._ranging_calculator.load_calibration(npz_path):
-            calib_log = f"Calibration loaded successfully! - Baseline: {self._ranging_calculator._baseline:.6f}m - Image size: {self._ranging_calculator._img_size[0]}x{self._ranging_calculator._img_size[1]}"
-            LogManager.append_log(calib_log, "INFO")
-            self.update_tips("Calibration parameters loaded successfully [Success]")
-        else:
-            LogManager.append_log("Calibration load failed, using non-calibration mode", "WARN")
-            self.update_tips("Warning: Calibration parameters load failed [Warning]")
+        # ̨ر궨棻궨ļ仯ʱԶ¼
+        # ֱ̨̲߳Ӳؼʾ־ʱȡʾ
+        self._calib_tip = None
+        calib_path = get_calibration_path()
+        self.update_tips("Loading calibration parameters...")
+        self._ranging_calculator.load_calibration_async(calib_path, on_done=self._on_calibration_loaded)
+        self._calib_watcher = CalibrationWatcher(self._ranging_calculator, calib_path,
+                                                 on_reload=self._on_calibration_loaded)
+        self._calib_watcher.start()
 
         # ʱ
         self._preview_timer = QTimer(self)
@@ -253,6 +278,7 @@ class UIManager(QWidget):
         # ־ˢ¶ʱ100msһΣ
         self._log_timer = QTimer(self)
         self._log_timer.timeout.connect(self._refresh_log)
+        self._log_timer.timeout.connect(self._show_calibration_tip)
         self._log_timer.start(100)
 
         LogManager.append_log("UI initialized successfully", "INFO")
@@ -294,13 +320,25 @@ class UIManager(QWidget):
         self.btn_right = QPushButton("Right Camera Preview")
         self.btn_capture = QPushButton("Take Left/Right Picture")
         self.btn_ranging = QPushButton("Start Ranging Mode")
-        for btn in [self.btn_left, self.btn_right, self.btn_capture, self.btn_ranging]:
+        self.btn_depth = QPushButton("Depth Heatmap Preview")
+        self.btn_export = QPushButton("Export Depth + Point Cloud")
+        for btn in [self.btn_left, self.btn_right, self.btn_capture, self.btn_ranging, self.btn_depth, self.btn_export]:
             btn.setProperty("func_btn", True)
 
         btn_grid.addWidget(self.btn_left, 0, 0)
         btn_grid.addWidget(self.btn_right, 0, 1)
         btn_grid.addWidget(self.btn_capture, 1, 0)
         btn_grid.addWidget(self.btn_ranging, 1, 1)
+        btn_grid.addWidget(self.btn_depth, 2, 0)
+        btn_grid.addWidget(self.btn_export, 2, 1)
+        self.chk_track = QCheckBox("Track target after click (continuous ranging)")
+        btn_grid.addWidget(self.chk_track, 3, 0, 1, 2)
+        self.chk_points = QCheckBox(f"Measure between clicked points (up to {MAX_MEASURE_POINTS})")
+        btn_grid.addWidget(self.chk_points, 4, 0, 1, 2)
+        self.chk_motion = QCheckBox("Auto-range moving objects (motion-triggered)")
+        btn_grid.addWidget(self.chk_motion, 5, 0, 1, 2)
+        self.chk_live_export = QCheckBox("Continuously export depth + point cloud")
+        btn_grid.addWidget(self.chk_live_export, 6, 0, 1, 2)
         left_v.addWidget(btn_w, stretch=2)
 
         self.bottom_h_layout.addWidget(left_w)
@@ -415,10 +453,19 @@ class UIManager(QWidget):
         self.btn_left.clicked.connect(lambda: self._start_cam(1, "Left camera preview activated"))
         self.btn_right.clicked.connect(lambda: self._start_cam(2, "Right camera preview activated"))
         self.btn_ranging.clicked.connect(lambda: self._start_cam(0, "Ranging mode activated"))
+        self.btn_depth.clicked.connect(lambda: self._start_cam(DEPTH_OVERLAY_MODE, "Depth heatmap preview activated"))
         self.btn_capture.clicked.connect(self._capture_stereo)
+        self.chk_track.toggled.connect(self._on_track_toggled)
+        self.chk_points.toggled.connect(self._on_points_toggled)
+        self.chk_motion.toggled.connect(self._on_motion_toggled)
+        self.btn_export.clicked.connect(self._export_depth)
+        self.chk_live_export.toggled.connect(self._on_live_export_toggled)
 
     def _start_cam(self, mode, tip):
+        self._depth_overlay.stop()
         self._camera_manager.start_preview(mode)
+        if mode == DEPTH_OVERLAY_MODE:
+            self._depth_overlay.start()
         LogManager.append_log(f"Preview started for mode: {mode}", "INFO")
         self.update_tips(f"Status: {tip} [Active]")
 
@@ -504,8 +551,51 @@ class UIManager(QWidget):
         LogManager.append_log("Camera parameters reset", "INFO")
         self.update_tips("Status: Parameters reset [Success]")
 
+    def _on_track_toggled(self, checked):
+        """ȡѡʱֹͣ٣໥"""
+        if checked:
+            self.chk_points.setChecked(False)
+        else:
+            self._tracking_ranger.stop()
+
+    def _on_motion_toggled(self, checked):
+        """/ر˶Զ"""
+        if checked:
+            self._motion_ranger.start()
+        else:
+            self._motion_ranger.stop()
+
+    def _export_depth(self):
+        """һβӲͼ"""
+        frame = self._ranging_calculator.last_disparity
+        if frame is None:
+            self.update_tips("Export: No measurement yet | Click the preview in ranging mode first")
+            return
+        stem = self._depth_exporter.submit(frame)
+        if stem is None:
+            self.update_tips("Export: Writer busy, try again")
+        else:
+            self.update_tips(f"Export: Writing {stem} to {self._depth_exporter.out_dir} [Export]")
+
+    def _on_live_export_toggled(self, checked):
+        """/ر"""
+        if checked:
+            self._live_export.start()
+        else:
+            self._live_export.stop()
+
+    def _on_points_toggled(self, checked):
+        """лģʽʱѵĵ"""
+        if checked:
+            self.chk_track.setChecked(False)
+        g_state.measure_points = []
+
     def _stop_camera(self):
         """ֹͣԤ"""
+        self._ranging_worker.cancel_all()
+        self._tracking_ranger.stop()
+        self._depth_overlay.stop()
+        self.chk_motion.setChecked(False)
         self._camera_manager.stop_preview_and_reset_display(self.preview_label)
         LogManager.append_log("Camera stopped, resources released", "INFO")
         self.update_tips("Status: Camera stopped [Stopped] | Click buttons to restart")
@@ -528,18 +618,68 @@ class UIManager(QWidget):
     def update_tips(self, text):
         self.tips_label.setText(text)
 
+    def _on_calibration_loaded(self, success):
+        """궨ɣں̨߳еã"""
+        if success:
+            calib_log = f"Calibration loaded successfully! - Baseline: {self._ranging_calculator._baseline:.6f}m - Image size: {self._ranging_calculator._img_size[0]}x{self._ranging_calculator._img_size[1]}"
+            LogManager.append_log(calib_log, "INFO")
+            self._calib_tip = "Calibration parameters loaded successfully [Success]"
+        elif self._ranging_calculator.is_calibrated:
+            self._calib_tip = "Warning: Calibration reload failed, keeping previous parameters [Warning]"
+        else:
+            LogManager.append_log("Calibration load failed, using non-calibration mode", "WARN")
+            self._calib_tip = "Warning: Calibration parameters load failed [Warning]"
+
+    def _show_calibration_tip(self):
+        tip, self._calib_tip = self._calib_tip, None
+        if tip is not None:
+            self.update_tips(tip)
+
     def _update_distance_tips(self):
-        """²"""
+        """²ͼģʽʾͼ״̬"""
+        if g_state.current_cam == DEPTH_OVERLAY_MODE:
+            stats = self._depth_overlay.last_stats
+            if stats:
+                self.tips_label.setText(
+                    f"Status: Depth heatmap preview | red = near, blue = far, uncoloured = no valid disparity<br>"
+                    f"Heatmap {stats['fps']:.1f} fps, valid {stats['valid_ratio']:.0%}, matching {stats['elapsed_ms']:.0f} ms")
+            return
         if g_state.current_cam != 0:
             return
         with g_state.distance_lock:
             d = g_state.distance
-        if d > 0:
-            tip = f"Status: Ranging mode active | Click preview to calculate distance<br>"
+            reason = g_state.distance_reason
+            details = g_state.distance_details
+        if g_state.tracking:
+            status = "Status: Tracking target | Click preview to track another target<br>"
+        elif self._motion_ranger.running:
+            status = "Status: Motion-triggered ranging | Moving objects are measured automatically<br>"
+        elif self.chk_points.isChecked():
+            status = f"Status: Point distance mode | {len(g_state.measure_points)} point(s) selected, click the next point<br>"
+        else:
+            status = "Status: Ranging mode active | Click preview to calculate distance, drag to measure a region<br>"
+        region = details if details is not None and "rect" in details else None
+        segments = details["segments"] if details is not None and "segments" in details else None
+        if segments is not None:
+            tip = status
+            text = ", ".join("invalid" if s is None else f"{s:.3f} m" for s in segments)
+            tip += f"<span style='color:#f38ba8; font-size:16px; font-weight:bold;'>Point distances: {text}</span>"
+            if len(segments) > 1:
+                tip += f" | total {d:.3f} m"
+        elif self.chk_points.isChecked() and len(g_state.measure_points) < 2:
+            tip = status
+        elif d > 0 and region is not None:
+            p = region["percentiles"]
+            tip = status
+            tip += (f"<span style='color:#f38ba8; font-size:16px; font-weight:bold;'>Region median: {d:.2f} meters</span>"
+                    f" | min {region['min']:.2f} m | 5-95%: {p['5']:.2f}-{p['95']:.2f} m | valid {region['valid_ratio']:.0%}")
+        elif d > 0:
+            tip = status
             tip += f"<span style='color:#f38ba8; font-size:16px; font-weight:bold;'>Measured distance: {d:.2f} meters</span>"
         else:
-            tip = f"Status: Ranging mode active | Click preview to calculate distance<br>"
-            tip += f"<span style='color:#f38ba8; font-size:16px; font-weight:bold;'>Measured distance: Invalid</span>"
+            tip = status
+            invalid = "Invalid" if reason == "ok" else f"Invalid ({reason.replace('_', ' ')})"
+            tip += f"<span style='color:#f38ba8; font-size:16px; font-weight:bold;'>Measured distance: {invalid}</span>"
         self.tips_label.setText(tip)
 
     def _refresh_log(self):
@@ -598,29 +738,120 @@ class UIManager(QWidget):
                 new_value = int(old_value * new_max / max(old_max, 1))
                 scroll.setValue(new_value)
 
-    def mousePressEvent(self, e: QMouseEvent):
-        """Ԥ"""
-        if g_state.current_cam != 0 or g_state.preview_label is None:
-            super().mousePressEvent(e)
-            return
+    def use_frame_source(self, factory):
+        """ʹԶ֡Դͷϳ˫Ŀڿͷ֮ǰ"""
+        self._camera_manager.set_frame_source(factory)
+
+    def publish_frames(self, name: str = None):
+        """ɼ֡ڴ֡޽̶ȡ"""
+        self._camera_manager.enable_frame_publisher(name)
+
+    def stop_publishing_frames(self):
+        """ֹͣɾڴ棨Ӧ˳ʱã"""
+        self._camera_manager.disable_frame_publisher()
+
+    def use_process_ranging(self):
+        """Ϊڶвࣺɼ֡ڴ̣֡಻ռý̵GIL"""
+        from ranging_process import RangingProcessWorker
+        if self._camera_manager.frame_publisher_name is None:
+            self._camera_manager.enable_frame_publisher()
+        self._ranging_worker.stop()
+        self._ranging_worker = RangingProcessWorker(get_calibration_path(), self._camera_manager.frame_publisher_name)
+        self._ranging_worker.start()
+
+    def closeEvent(self, event):
+        """رմʱֹͣ๤궨ļ"""
+        self._calib_watcher.stop()
+        self._tracking_ranger.stop()
+        self._depth_overlay.stop()
+        self._motion_ranger.stop()
+        self._live_export.stop()
+        self._depth_exporter.stop()
+        self._ranging_worker.stop()
+        super().closeEvent(event)
+
+    def _preview_point(self, clamp: bool = False):
+        """
+        ǰλöӦԤͼ
 
-        # Ԥڵ
+        Args:
+            clamp: ΪTrueʱͼλƵͼԵ򷵻None
+        """
         pos = self.preview_label.mapFromGlobal(self.cursor().pos())
-        if not (0 <= pos.x() <= self.preview_label.width() and 0 <= pos.y() <= self.preview_label.height()):
-            super().mousePressEvent(e)
-            return
+        if not clamp and not (0 <= pos.x() <= self.preview_label.width() and 0 <= pos.y() <= self.preview_label.height()):
+            return None
 
         # תΪͼԭʼ
         scale, ox, oy = self.preview_label.get_scale_offset()
         img_x = (pos.x() - ox) / scale
         img_y = (pos.y() - oy) / scale
-        if not (0 <= img_x <= PREVIEW_WIDTH and 0 <= img_y <= PREVIEW_HEIGHT):
-            super().mousePressEvent(e)
+        if clamp:
+            img_x = min(max(img_x, 0), PREVIEW_WIDTH - 1)
+            img_y = min(max(img_y, 0), PREVIEW_HEIGHT - 1)
+        elif not (0 <= img_x <= PREVIEW_WIDTH and 0 <= img_y <= PREVIEW_HEIGHT):
+            return None
+        return (int(img_x), int(img_y))
+
+    def mousePressEvent(self, e: QMouseEvent):
+        """Ԥ꣺ʼ϶ѡ"""
+        self._drag_start = None
+        if g_state.current_cam == 0 and g_state.preview_label is not None:
+            self._drag_start = self._preview_point()
+            if self._drag_start is not None:
+                g_state.select_rect = None
+        super().mousePressEvent(e)
+
+    def mouseMoveEvent(self, e: QMouseEvent):
+        """϶ʱѡԤ̻߳ƣ"""
+        start = self._drag_start
+        if start is not None:
+            point = self._preview_point(clamp=True)
+            if max(abs(point[0] - start[0]), abs(point[1] - start[1])) >= REGION_DRAG_MIN:
+                g_state.select_rect = (min(start[0], point[0]), min(start[1], point[1]),
+                                       max(start[0], point[0]), max(start[1], point[1]))
+            else:
+                g_state.select_rect = None
+        super().mouseMoveEvent(e)
+
+    def mouseReleaseEvent(self, e: QMouseEvent):
+        """ɿ괥ࣺϳѡʱ򣬷ڰλõ"""
+        start, self._drag_start = self._drag_start, None
+        if start is None or g_state.current_cam != 0:
+            super().mouseReleaseEvent(e)
             return
 
-        # 
-        g_state.click_point = (int(img_x), int(img_y))
+        region = g_state.select_rect
+        if region is not None:
+            # ࣬ѡʾһε
+            self._tracking_ranger.stop()
+            g_state.measure_points = []
+            g_state.click_point = ((region[0] + region[2]) // 2, (region[1] + region[3]) // 2)
+            g_state.has_click = True
+            request_id = self._ranging_worker.submit(g_state.click_point, region)
+            LogManager.append_log(f"Ranging region #{request_id}: {region}", "DEBUG")
+            super().mouseReleaseEvent(e)
+            return
+
+        # 
+        g_state.click_point = start
         g_state.has_click = True
-        LogManager.append_log(f"Ranging click at: ({int(img_x)}, {int(img_y)})", "DEBUG")
-        threading.Thread(target=self._ranging_calculator.calculate_distance, daemon=True).start()
-        super().mousePressEvent(e)
\ No newline at end of file
+        if self.chk_points.isChecked():
+            # ࣺʱʼµһ飬㼰ʱͬһ֡ϲȫ
+            if len(g_state.measure_points) >= MAX_MEASURE_POINTS:
+                g_state.measure_points = []
+            g_state.measure_points = g_state.measure_points + [start]
+            if len(g_state.measure_points) == 1:
+                self._ranging_worker.cancel_all()
+                with g_state.distance_lock:
+                    g_state.distance = 0.0
+                    g_state.distance_details = None
+            else:
+                request_id = self._ranging_worker.submit(start, points=tuple(g_state.measure_points))
+                LogManager.append_log(f"Ranging points #{request_id}: {g_state.measure_points}", "DEBUG")
+        elif self.chk_track.isChecked():
+            self._ranging_worker.cancel_all()
+            self._tracking_ranger.start(g_state.click_point)
+        else:
+            request_id = self._ranging_worker.submit(g_state.click_point)
+            LogManager.append_log(f"Ranging click #{request_id} at: ({start[0]}, {start[1]})", "DEBUG")
+        super().mouseReleaseEvent(e)
\ No newline at end of file
@@ -8,6 +8,8 @@ import numpy as np
 import os
 import glob
 import time
+import argparse
+import threading
 import subprocess
 import re
 
@@ -26,6 +28,20 @@ CALIB_IMG_DIR = os.path.join(TOOLS_DIR, "calibration_images")
 # 궨ļ
 CALIB_RESULT_FILE = os.path.join(TOOLS_DIR, "stereo_calib_params.npz")
 
+# ====================== Auto Capture Configuration ======================
+# ̨ʱͼСĿȣأ
+AUTO_DETECT_WIDTH = 640
+# ̸ȶ⵽Ĵ
+AUTO_STABLE_COUNT = 3
+# μ֮ǵƽλޣͼأΪƶ
+AUTO_STABLE_MOTION = 2.0
+# ѱͼԵСλ˲죨λ/ߴ/бһӵŷϾ룩
+AUTO_MIN_POSE_DIFF = 0.1
+# Զ̼֮룩
+AUTO_SAVE_INTERVAL = 1.0
+# ԶɼĿͼ
+AUTO_TARGET_PAIRS = 20
+
 
 def detect_stereo_camera():
     """
@@ -85,14 +101,167 @@ def detect_stereo_camera():
         return None, 0, 0
 
 
+def board_pose_descriptor(corners: np.ndarray, img_width: int, img_height: int) -> np.ndarray:
+    """
+    ̸ǵһλӣںͼ֮λ˲
+    
+    Returns:
+        np.ndarray: [x, y, ߴ, ˮƽб, ֱб, ת]Լ0~1
+    """
+    pts = corners.reshape(CHESSBOARD_SIZE[1], CHESSBOARD_SIZE[0], 2)
+    tl, tr, bl, br = pts[0, 0], pts[0, -1], pts[-1, 0], pts[-1, -1]
+    quad = np.array([tl, tr, br, bl], dtype=np.float32)
+    center = quad.mean(axis=0)
+    area = cv2.contourArea(quad)
+    top, bottom = np.linalg.norm(tr - tl), np.linalg.norm(br - bl)
+    left, right = np.linalg.norm(bl - tl), np.linalg.norm(br - tr)
+    angle = np.arctan2(tr[1] - tl[1], tr[0] - tl[0])
+    return np.array([
+        center[0] / img_width,
+        center[1] / img_height,
+        np.sqrt(area / (img_width * img_height)),
+        (top - bottom) / max(top + bottom, 1e-6),
+        (left - right) / max(left + right, 1e-6),
+        angle / np.pi,
+    ])
+
+
+class BoardDetector:
+    """
+    ̸̨߳
+    ֻύһֱ֡֡ӸǣСͼϽУԤѭ
+    """
+    
+    def __init__(self, detect_width: int = AUTO_DETECT_WIDTH):
+        self._detect_width = detect_width
+        self._cond = threading.Condition()
+        self._pending = None
+        self._result = None
+        self._running = False
+        self._thread = None
+    
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._detect_func, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+    
+    def submit(self, frame_id: int, frame_left: np.ndarray, frame_right: np.ndarray):
+        """ύһ֡ȴ⣩"""
+        with self._cond:
+            self._pending = (frame_id, frame_left, frame_right)
+            self._cond.notify()
+    
+    def latest_result(self):
+        """һμ (frame_id, ͼ, ͼ, ǵ, ҽǵ)ǵΪԭʼֱ꣬δ⵽ΪNone"""
+        with self._cond:
+            return self._result
+    
+    def _detect(self, img: np.ndarray):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        scale = min(1.0, self._detect_width / gray.shape[1])
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK
+        found, corners = cv2.findChessboardCorners(gray, CHESSBOARD_SIZE, None, flags)
+        if not found:
+            return None
+        # Ķӳԭʼֱʣgenerate_calib_params.find_corners_pyramidһ£
+        return ((corners + 0.5) / scale - 0.5).astype(np.float32)
+    
+    def _detect_func(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame_id, frame_left, frame_right = self._pending
+                self._pending = None
+            corners_l = self._detect(frame_left)
+            corners_r = self._detect(frame_right) if corners_l is not None else None
+            with self._cond:
+                self._result = (frame_id, frame_left, frame_right, corners_l, corners_r)
+
+
+class AutoCaptureState:
+    """Զɼж̸ͼȶ⵽ѱͼԵλ˲㹻"""
+    
+    def __init__(self, detect_width: int = AUTO_DETECT_WIDTH):
+        self._motion_scale = detect_width
+        self._last_id = -1
+        self._last_corners = None
+        self._stable = 0
+        self._saved_poses = []
+        self._last_save = 0.0
+        self.status = "Searching board"
+    
+    def update(self, result, img_width: int, img_height: int) -> bool:
+        """
+        һμ
+        
+        Returns:
+            ǷӦýӦͼ
+        """
+        if result is None or result[0] == self._last_id:
+            return False
+        frame_id, _, _, corners_l, corners_r = result
+        self._last_id = frame_id
+        if corners_l is None or corners_r is None:
+            self._stable = 0
+            self._last_corners = None
+            self.status = "Searching board"
+            return False
+        
+        # ǵλƻ㵽ͼ߶ȺֵȽ
+        if self._last_corners is not None:
+            motion = np.linalg.norm(corners_l - self._last_corners, axis=-1).mean()
+            motion *= min(1.0, self._motion_scale / img_width)
+            self._stable = self._stable + 1 if motion < AUTO_STABLE_MOTION else 1
+        else:
+            self._stable = 1
+        self._last_corners = corners_l
+        if self._stable < AUTO_STABLE_COUNT:
+            self.status = f"Hold still ({self._stable}/{AUTO_STABLE_COUNT})"
+            return False
+        
+        pose = board_pose_descriptor(corners_l, img_width, img_height)
+        if self._saved_poses:
+            diff = min(np.linalg.norm(pose - saved) for saved in self._saved_poses)
+            if diff < AUTO_MIN_POSE_DIFF:
+                self.status = "Move board to a new pose"
+                return False
+        if time.time() - self._last_save < AUTO_SAVE_INTERVAL:
+            return False
+        self._saved_poses.append(pose)
+        self._last_save = time.time()
+        self._stable = 0
+        self.status = f"Saved pose #{len(self._saved_poses)}"
+        return True
+
+
 def create_dir(dir_path):
     if not os.path.exists(dir_path):
         os.makedirs(dir_path)
         print(f"Create directory: {dir_path}")
 
 
-def capture_calibration_images():
-    """ɼ˫Ŀͷı궨ͼ"""
+def capture_calibration_images(auto: bool = False, target_pairs: int = AUTO_TARGET_PAIRS,
+                               detect_width: int = AUTO_DETECT_WIDTH):
+    """
+    ɼ˫Ŀͷı궨ͼ
+    
+    Args:
+        auto: Զɼģʽ̨⵽ȶλ㹻̸ͬʱԶ
+        target_pairs: Զɼģʽ´ﵽ˳
+        detect_width: Զɼģʽº̨ʹõͼ
+    """
     
     # ˫Ŀͷ
     cam_dev, cam_width, cam_height = detect_stereo_camera()
@@ -144,9 +313,28 @@ def capture_calibration_images():
     img_count = 0
     print("\n===== Start Calibration Image Capture =====")
     print("1. Place phone chessboard in front of camera (adjust angle/distance)")
-    print("2. Press 's' to save image pair (at least 15 pairs required)")
+    if auto:
+        print(f"2. Auto capture: hold the board still at a new pose, pairs are saved automatically (target {target_pairs})")
+        print("   's' still saves the current pair manually")
+    else:
+        print("2. Press 's' to save image pair (at least 15 pairs required)")
     print("3. Press 'q' to exit capture")
 
+    detector = None
+    auto_state = None
+    if auto:
+        detector = BoardDetector(detect_width)
+        detector.start()
+        auto_state = AutoCaptureState(detect_width)
+    frame_id = 0
+
+    def save_pair(img_left, img_right):
+        left_img_path = os.path.join(left_dir, f"left_{img_count:03d}.jpg")
+        right_img_path = os.path.join(right_dir, f"right_{img_count:03d}.jpg")
+        cv2.imwrite(left_img_path, img_left)
+        cv2.imwrite(right_img_path, img_right)
+        print(f"Saved {img_count+1}th pair: {left_img_path} | {right_img_path}")
+
     # ʾ
     display_scale = 0.5 
     display_width = int(cam_width * display_scale)
@@ -174,13 +362,39 @@ def capture_calibration_images():
             print("Warning: Split frame is empty, skip")
             continue
 
+        # Զɼύǰ̨֡⣬ȡһμжǷ񱣴
+        result = None
+        if auto:
+            frame_id += 1
+            detector.submit(frame_id, frame_left, frame_right)
+            result = detector.latest_result()
+            if auto_state.update(result, left_width, cam_height):
+                # 汻һ֡ǵǰ֡ͼǵ㲻Ӧ
+                save_pair(result[1], result[2])
+                img_count += 1
+                if img_count >= target_pairs:
+                    print(f"Auto capture reached {target_pairs} pairs")
+                    break
+
         # ʾͼ
         frame_left_display = cv2.resize(frame_left, (left_display_width, display_height))
         frame_right_display = cv2.resize(frame_right, (left_display_width, display_height))
 
+        # һμ⵽Ľǵ
+        if result is not None and result[3] is not None:
+            cv2.drawChessboardCorners(frame_left_display, CHESSBOARD_SIZE,
+                                      (result[3] * display_scale).astype(np.float32), result[4] is not None)
+        if result is not None and result[4] is not None:
+            cv2.drawChessboardCorners(frame_right_display, CHESSBOARD_SIZE,
+                                      (result[4] * display_scale).astype(np.float32), True)
+
         # ʾ
-        cv2.putText(frame_left_display, f"Captured: {img_count} | 's' save | 'q' exit", 
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        if auto:
+            cv2.putText(frame_left_display, f"Auto: {img_count}/{target_pairs} | {auto_state.status} | 'q' exit",
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        else:
+            cv2.putText(frame_left_display, f"Captured: {img_count} | 's' save | 'q' exit", 
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         cv2.putText(frame_right_display, "Right Camera (Phone Chessboard)", 
                     (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         
@@ -191,25 +405,32 @@ def capture_calibration_images():
         key = cv2.waitKey(1) & 0xFF
         if key == ord('s'):
             # ͼ
-            left_img_path = os.path.join(left_dir, f"left_{img_count:03d}.jpg")
-            right_img_path = os.path.join(right_dir, f"right_{img_count:03d}.jpg")
-            cv2.imwrite(left_img_path, frame_left)
-            cv2.imwrite(right_img_path, frame_right)
-            print(f"Saved {img_count+1}th pair: {left_img_path} | {right_img_path}")
+            save_pair(frame_left, frame_right)
             img_count += 1
         elif key == ord('q'):
             break
 
-        # ֡
-        elapsed_time = time.time() - start_time
-        sleep_time = max(0, 1/cam_fps - elapsed_time)
-        time.sleep(sleep_time)
+        # ֶģʽ֡٣Զģʽcap.read()ͷ֡촦ѹ֡
+        if not auto:
+            elapsed_time = time.time() - start_time
+            sleep_time = max(0, 1/cam_fps - elapsed_time)
+            time.sleep(sleep_time)
 
     # ͷԴ
+    if detector is not None:
+        detector.stop()
     cap.release()
     cv2.destroyAllWindows()
     print(f"\nCapture finished! Total {img_count} pairs saved to {CALIB_IMG_DIR}")
 
 if __name__ == "__main__":
-    capture_calibration_images()
+    parser = argparse.ArgumentParser(description="Capture stereo calibration image pairs")
+    parser.add_argument("--auto", action="store_true",
+                        help="Save pairs automatically when the board is stable in both views at a new pose")
+    parser.add_argument("--target", type=int, default=AUTO_TARGET_PAIRS,
+                        help="Number of pairs to collect in auto mode before exiting")
+    parser.add_argument("--detect-width", type=int, default=AUTO_DETECT_WIDTH,
+                        help="Width that frames are downscaled to for background board detection")
+    args = parser.parse_args()
+    capture_calibration_images(auto=args.auto, target_pairs=args.target, detect_width=args.detect_width)
 
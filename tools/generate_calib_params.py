@@ -6,12 +6,21 @@
 import cv2
 import numpy as np
 import os
+import sys
 import glob
+import time
+import hashlib
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 # ȡǰűĿ¼
 TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
 # ĿĿ¼
 PROJECT_ROOT = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+from ranging_calculator import RECTIFY_SCALES, scale_q_matrix
 
 # ====================== Calibration Parameter Configuration ======================
 # ̸ڽǵ9С6Уƥʵ̸
@@ -22,6 +31,27 @@ SQUARE_SIZE = 0.009
 CALIB_IMG_DIR = os.path.join(TOOLS_DIR, "calibration_images")
 # 궨ļ
 CALIB_RESULT_FILE = os.path.join(TOOLS_DIR, "stereo_calib_params.npz")
+# ǵǿ
+CORNER_FLAGS = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK
+# Ż׼
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+# Сͼ̸ʱȣ0ʾֱȫֱ
+DETECT_MAX_WIDTH = 640
+# ǵ㻺ļڱ궨ͼĿ¼£
+CORNER_CACHE_NAME = "corner_cache.npz"
+# Զ޳ͼͼRMSͶӰֵأ0ʾ޳
+REJECT_THRESHOLD = 0.0
+# Զ޳
+MAX_REJECT_ITERS = 10
+# ÿε޳ͼ
+REJECT_FRACTION = 0.1
+# ƽ½СڸñʱΪ
+REJECT_MIN_GAIN = 0.01
+# 궨Чͼ
+MIN_VALID_PAIRS = 10
+# Уӳ/QСֵ֧RECTIFY_SCALESгԭʼֱĸ
+# ӳٲֱСͼУƥ
+EXTRA_RECTIFY_SCALES = tuple(s for s in RECTIFY_SCALES if s > 1)
 
 
 # ====================== Camera Detection Function ======================
@@ -45,8 +75,266 @@ def get_image_size_from_calib_images():
     height, width = img.shape[:2]
     return (width, height)
 
-def calibrate_stereo_camera():
-    """ִ˫Ŀ궨ɱ궨ļ"""
+# ====================== Corner Detection Functions ======================
+def _init_detect_worker():
+    """ӽ̳ʼÿֻõ߳OpenCV̹߳ȶ"""
+    cv2.setNumThreads(1)
+
+
+def find_corners_pyramid(gray: np.ndarray, max_width: int = DETECT_MAX_WIDTH):
+    """
+    Сͼ̸ٻصȫֱŻ
+    Сͼδҵʱ˻ȫֱ
+    
+    Returns:
+        tuple: (Ƿҵ, ȫֱؽǵNone)
+    """
+    ret, corners = False, None
+    scale = gray.shape[1] / max_width if max_width > 0 else 1.0
+    if scale > 1.0:
+        small = cv2.resize(gray, (max_width, int(round(gray.shape[0] / scale))), interpolation=cv2.INTER_AREA)
+        ret, corners = cv2.findChessboardCorners(small, CHESSBOARD_SIZE, None, CORNER_FLAGS)
+        if ret:
+            # Ķӳԭͼ
+            sx = gray.shape[1] / small.shape[1]
+            sy = gray.shape[0] / small.shape[0]
+            corners = ((corners + 0.5) * np.array([sx, sy], dtype=np.float32) - 0.5).astype(np.float32)
+    if not ret:
+        ret, corners = cv2.findChessboardCorners(gray, CHESSBOARD_SIZE, None, CORNER_FLAGS)
+        if not ret:
+            return False, None
+    corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), SUBPIX_CRITERIA)
+    return True, corners
+
+
+def detect_chessboard_corners(img_path: str, max_width: int = DETECT_MAX_WIDTH):
+    """
+    ȡͼ񲢼̸ǵ㣨ӽִУ
+    
+    Returns:
+        tuple: (״̬, ؽǵNone)״̬Ϊ "ok" / "read_failed" / "not_found"
+    """
+    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return "read_failed", None
+    ret, corners = find_corners_pyramid(img, max_width)
+    if not ret:
+        return "not_found", None
+    return "ok", corners
+
+
+def _corner_cache_key(img_path: str, max_width: int) -> str:
+    """ͼݹϣ + ̸ߴ + """
+    with open(img_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return f"{digest}:{CHESSBOARD_SIZE[0]}x{CHESSBOARD_SIZE[1]}:{CORNER_FLAGS}:{max_width}"
+
+
+def load_corner_cache(cache_path: str) -> dict:
+    """ȡǵ㻺棬 {: (״̬, ǵNone)}"""
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        data = np.load(cache_path)
+        cache = {}
+        for key, found, corners in zip(data['keys'], data['found'], data['corners']):
+            cache[str(key)] = ("ok", corners) if found else ("not_found", None)
+        return cache
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable corner cache {cache_path}: {e}")
+        return {}
+
+
+def save_corner_cache(cache_path: str, cache: dict):
+    """ǵ㻺棨δ⵽ĿNaNǵռλ"""
+    n_corners = CHESSBOARD_SIZE[0] * CHESSBOARD_SIZE[1]
+    keys = sorted(cache)
+    corners = np.full((len(keys), n_corners, 1, 2), np.nan, dtype=np.float32)
+    found = np.zeros(len(keys), dtype=bool)
+    for i, key in enumerate(keys):
+        status, pts = cache[key]
+        if status == "ok":
+            corners[i] = pts.reshape(n_corners, 1, 2)
+            found[i] = True
+    np.savez_compressed(cache_path, keys=np.array(keys), found=found, corners=corners)
+
+
+def detect_all_corners(img_paths: list, workers: int = None, max_width: int = DETECT_MAX_WIDTH,
+                       cache_path: str = None) -> list:
+    """
+    мͼĽǵ㣬ͼΪ䵽̳
+    
+    Args:
+        img_paths: ͼ·б
+        workers: NoneΪCPU1Ϊڵǰ̴ִ
+        max_width: Сȣ0Ϊȫֱ
+        cache_path: ǵ㻺ļNoneΪʹû棻ֻݱ仯ͼ
+    """
+    cache = load_corner_cache(cache_path) if cache_path else {}
+    keys = [_corner_cache_key(path, max_width) if os.path.exists(path) else None for path in img_paths]
+    todo = [i for i, key in enumerate(keys) if key not in cache]
+    if cache_path:
+        print(f"Corner cache: {len(img_paths) - len(todo)} hit(s), {len(todo)} image(s) to detect")
+
+    detect = partial(detect_chessboard_corners, max_width=max_width)
+    todo_paths = [img_paths[i] for i in todo]
+    if workers == 1 or len(todo_paths) <= 1:
+        detected = [detect(path) for path in todo_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_detect_worker) as executor:
+            detected = list(executor.map(detect, todo_paths, chunksize=2))
+
+    results = [cache.get(key) for key in keys]
+    for i, result in zip(todo, detected):
+        results[i] = result
+        if keys[i] is not None and result[0] != "read_failed":
+            cache[keys[i]] = result
+
+    if cache_path:
+        # ֻǰͼĿɾͼռÿռ
+        current = set(keys)
+        save_corner_cache(cache_path, {k: v for k, v in cache.items() if k in current})
+    return results
+
+
+def show_detected_corners(valid_pairs: list):
+    """ɺͳһʾǵ"""
+    for left_path, right_path, corners_left, corners_right in valid_pairs:
+        img_left = cv2.imread(left_path)
+        img_right = cv2.imread(right_path)
+        if img_left is None or img_right is None:
+            continue
+        cv2.drawChessboardCorners(img_left, CHESSBOARD_SIZE, corners_left, True)
+        cv2.drawChessboardCorners(img_right, CHESSBOARD_SIZE, corners_right, True)
+        
+        # ͼ640x480ʾ
+        cv2.imshow("Left Corners (Phone Chessboard)", cv2.resize(img_left, (640, 480)))
+        cv2.imshow("Right Corners (Phone Chessboard)", cv2.resize(img_right, (640, 480)))
+        cv2.waitKey(200)
+    cv2.destroyAllWindows()
+
+
+# ====================== Reprojection Error Functions ======================
+def _rodrigues_batch(rvecs: np.ndarray) -> np.ndarray:
+    """ת (N, 3) תΪת (N, 3, 3)"""
+    theta = np.linalg.norm(rvecs, axis=1)
+    safe = np.where(theta > 1e-12, theta, 1.0)
+    k = rvecs / safe[:, None]
+    K = np.zeros((len(rvecs), 3, 3))
+    K[:, 0, 1], K[:, 0, 2] = -k[:, 2], k[:, 1]
+    K[:, 1, 0], K[:, 1, 2] = k[:, 2], -k[:, 0]
+    K[:, 2, 0], K[:, 2, 1] = -k[:, 1], k[:, 0]
+    sin = np.sin(theta)[:, None, None]
+    cos = np.cos(theta)[:, None, None]
+    R = np.eye(3)[None] + sin * K + (1.0 - cos) * (K @ K)
+    R[theta <= 1e-12] = np.eye(3)
+    return R
+
+
+def per_view_residuals(objpoints: list, imgpoints: list, rvecs, tvecs, mtx, dist) -> np.ndarray:
+    """
+    һԼͼͶӰвʵ֣cv2.projectPointsĻģһ£
+    
+    Returns:
+        np.ndarray: (ͼ, ǵ, 2) Ĳв
+    """
+    obj = np.asarray(objpoints, dtype=np.float64).reshape(len(objpoints), -1, 3)
+    img = np.asarray(imgpoints, dtype=np.float64).reshape(len(imgpoints), -1, 2)
+    dist = np.asarray(dist, dtype=np.float64).ravel()
+    if dist.size > 8:
+        # ⾵/бģ˻ͼͶӰ
+        proj = np.stack([cv2.projectPoints(o, r, t, mtx, dist)[0].reshape(-1, 2)
+                         for o, r, t in zip(objpoints, rvecs, tvecs)])
+        return proj - img
+    k = np.zeros(8)
+    k[:dist.size] = dist
+    k1, k2, p1, p2, k3, k4, k5, k6 = k
+
+    R = _rodrigues_batch(np.asarray(rvecs, dtype=np.float64).reshape(-1, 3))
+    t = np.asarray(tvecs, dtype=np.float64).reshape(-1, 1, 3)
+    cam = np.einsum('nij,nkj->nki', R, obj) + t
+    x = cam[..., 0] / cam[..., 2]
+    y = cam[..., 1] / cam[..., 2]
+    r2 = x * x + y * y
+    radial = (1 + k1 * r2 + k2 * r2 ** 2 + k3 * r2 ** 3) / (1 + k4 * r2 + k5 * r2 ** 2 + k6 * r2 ** 3)
+    xd = x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x)
+    yd = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y
+    u = mtx[0, 0] * xd + mtx[0, 1] * yd + mtx[0, 2]
+    v = mtx[1, 1] * yd + mtx[1, 2]
+    return np.stack((u, v), axis=-1) - img
+
+
+def calibrate_mono(objpoints: list, imgpoints: list, img_size: tuple) -> tuple:
+    """
+    Ŀ궨
+    
+    Returns:
+        tuple: (mtx, dist, ƽͶӰ, ͼRMS())
+    """
+    ret, mtx, dist, rvecs, tvecs = cv2.calibrateCamera(objpoints, imgpoints, img_size, None, None)
+    residuals = per_view_residuals(objpoints, imgpoints, rvecs, tvecs, mtx, dist)
+    sq_sum = (residuals ** 2).sum(axis=(1, 2))
+    n_points = residuals.shape[1]
+    view_rms = np.sqrt(sq_sum / n_points)
+    # ֮ǰ汾һµƽͼ L2/ǵ ľֵ
+    error = float(np.mean(np.sqrt(sq_sum) / n_points))
+    return mtx, dist, error, view_rms
+
+
+def scale_camera_matrix(mtx: np.ndarray, scale: int) -> np.ndarray:
+    """
+    ڲξ3x3ͶӰ3x4㵽Сscaleͼ
+    㰴Ķ: c' = (c + 0.5) / scale - 0.5
+    """
+    scaled = np.array(mtx, dtype=np.float64)
+    scaled[:2] /= scale
+    scaled[0, 2] += 0.5 / scale - 0.5
+    scaled[1, 2] += 0.5 / scale - 0.5
+    return scaled
+
+
+def build_scaled_rectification(mtx_l, dist_l, R1, P1, mtx_r, dist_r, R2, P2, Q, img_size: tuple,
+                               scales: tuple = EXTRA_RECTIFY_SCALES) -> dict:
+    """
+    ɸСµУӳQͼߴ
+    ӳֱźڲɣΪСԭʼͼΪСУͼ
+
+    Returns:
+        dict: map1x_s2/map1y_s2/map2x_s2/map2y_s2/Q_s2/img_size_s2 ...  rectify_scales
+    """
+    params = {"rectify_scales": np.array((1,) + tuple(scales))}
+    for scale in scales:
+        size = (img_size[0] // scale, img_size[1] // scale)
+        params[f"map1x_s{scale}"], params[f"map1y_s{scale}"] = cv2.initUndistortRectifyMap(
+            scale_camera_matrix(mtx_l, scale), dist_l, R1, scale_camera_matrix(P1, scale), size, cv2.CV_32FC1)
+        params[f"map2x_s{scale}"], params[f"map2y_s{scale}"] = cv2.initUndistortRectifyMap(
+            scale_camera_matrix(mtx_r, scale), dist_r, R2, scale_camera_matrix(P2, scale), size, cv2.CV_32FC1)
+        params[f"Q_s{scale}"] = scale_q_matrix(Q, scale)
+        params[f"img_size_s{scale}"] = np.array(size)
+    return params
+
+
+def print_view_errors(pair_names: list, view_errors_l: np.ndarray, view_errors_r: np.ndarray):
+    """ӡÿͼRMSͶӰ"""
+    print("\nPer-view RMS reprojection errors (pixels):")
+    for name, err_l, err_r in zip(pair_names, view_errors_l, view_errors_r):
+        print(f"  {name:<24} left {err_l:7.4f}  right {err_r:7.4f}")
+
+
+def calibrate_stereo_camera(workers: int = None, show: bool = False, detect_width: int = DETECT_MAX_WIDTH,
+                            use_cache: bool = True, reject_threshold: float = REJECT_THRESHOLD,
+                            max_reject_iters: int = MAX_REJECT_ITERS):
+    """
+    ִ˫Ŀ궨ɱ궨ļ
+    
+    Args:
+        workers: ǵNoneΪCPU
+        show: Ƿڼɺʾǵ
+        detect_width: С̸ȣ0Ϊȫֱ
+        use_cache: Ƿʹýǵ㻺棬ֻ仯ͼ
+        reject_threshold: ͼRMSֵأ0ʱ޳ͼ±궨
+        max_reject_iters: Զ޳
+    """
     
     # ӱ궨ͼȡߴ
     img_size = get_image_size_from_calib_images()
@@ -83,65 +371,41 @@ def calibrate_stereo_camera():
 
     print(f"\nFound {len(left_img_paths)} image pairs for calibration.")
 
-    # ʼ
-    valid_count = 0
-    # ǵǿ
-    corner_flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK
-    # Ż׼
-    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    # мͼĽǵ
+    detect_start = time.time()
+    cache_path = os.path.join(CALIB_IMG_DIR, CORNER_CACHE_NAME) if use_cache else None
+    results = detect_all_corners(left_img_paths + right_img_paths, workers, detect_width, cache_path)
+    results_left = results[:len(left_img_paths)]
+    results_right = results[len(left_img_paths):]
+    print(f"Corner detection finished in {time.time() - detect_start:.1f}s")
 
-    # ͼ
+    # ܼ
+    valid_count = 0
+    valid_pairs = []
     for idx, (left_path, right_path) in enumerate(zip(left_img_paths, right_img_paths)):
-        # ȡͼ
-        img_left = cv2.imread(left_path)
-        img_right = cv2.imread(right_path)
-        if img_left is None or img_right is None:
+        status_left, corners_left = results_left[idx]
+        status_right, corners_right = results_right[idx]
+        if status_left == "read_failed" or status_right == "read_failed":
             print(f"Warning: Skip {idx}th pair - image read failed")
             continue
-        
-        # תΪҶͼ
-        gray_left = cv2.cvtColor(img_left, cv2.COLOR_BGR2GRAY)
-        gray_right = cv2.cvtColor(img_right, cv2.COLOR_BGR2GRAY)
-
-        # ̸ǵ
-        ret_left, corners_left = cv2.findChessboardCorners(gray_left, CHESSBOARD_SIZE, None, corner_flags)
-        ret_right, corners_right = cv2.findChessboardCorners(gray_right, CHESSBOARD_SIZE, None, corner_flags)
-
-
-        if ret_left and ret_right:
-            # ؼǵŻ
-            corners_left = cv2.cornerSubPix(gray_left, corners_left, (11, 11), (-1, -1), criteria)
-            corners_right = cv2.cornerSubPix(gray_right, corners_right, (11, 11), (-1, -1), criteria)
 
+        if status_left == "ok" and status_right == "ok":
             # ӵ궨ݼ
             objpoints.append(objp)
             imgpoints_left.append(corners_left)
             imgpoints_right.append(corners_right)
             valid_count += 1
-
-            # 1. ԭʼߴͼϻƽǵ
-            img_left_temp = img_left.copy()
-            img_right_temp = img_right.copy()
-            cv2.drawChessboardCorners(img_left_temp, CHESSBOARD_SIZE, corners_left, ret_left)
-            cv2.drawChessboardCorners(img_right_temp, CHESSBOARD_SIZE, corners_right, ret_right)
-            
-            # 2. ͼ640x480ʾ
-            img_left_draw = cv2.resize(img_left_temp, (640, 480))
-            img_right_draw = cv2.resize(img_right_temp, (640, 480))
-            
-            # 3. ʾƽ
-            cv2.imshow("Left Corners (Phone Chessboard)", img_left_draw)
-            cv2.imshow("Right Corners (Phone Chessboard)", img_right_draw)
-            cv2.waitKey(200)
+            valid_pairs.append((left_path, right_path, corners_left, corners_right))
         else:
-            print(f"Warning: Skip {idx}th pair - chessboard not detected in {'left' if not ret_left else 'right'} image")
+            print(f"Warning: Skip {idx}th pair - chessboard not detected in {'left' if status_left != 'ok' else 'right'} image")
 
-    # رʾ
-    cv2.destroyAllWindows()
+    # ʾǵѡɺͳһʾ
+    if show:
+        show_detected_corners(valid_pairs)
     print(f"\nValid image pairs for calibration: {valid_count} (need 10)")
     
     # УЧͼ
-    if valid_count < 10:
+    if valid_count < MIN_VALID_PAIRS:
         print("Error: Insufficient valid pairs! Capture more clear images of phone chessboard.")
         print("Tips:")
         print("  - Ensure the chessboard is fully visible in both left and right images")
@@ -149,29 +413,49 @@ def calibrate_stereo_camera():
         print("  - Cover different angles and distances")
         return
 
-    # Ŀ궨ͷ
-    print("\nCalibrating left camera...")
-    ret_l, mtx_l, dist_l, rvecs_l, tvecs_l = cv2.calibrateCamera(
-        objpoints, imgpoints_left, img_size, None, None
-    )
-    # ͷͶӰ
-    error_l = 0
-    for i in range(len(objpoints)):
-        img_pts_l, _ = cv2.projectPoints(objpoints[i], rvecs_l[i], tvecs_l[i], mtx_l, dist_l)
-        error_l += cv2.norm(imgpoints_left[i], img_pts_l, cv2.NORM_L2) / len(img_pts_l)
-    error_l /= len(objpoints)
-
-    # Ŀ궨ͷ
-    print("Calibrating right camera...")
-    ret_r, mtx_r, dist_r, rvecs_r, tvecs_r = cv2.calibrateCamera(
-        objpoints, imgpoints_right, img_size, None, None
-    )
-    # ͷͶӰ
-    error_r = 0
-    for i in range(len(objpoints)):
-        img_pts_r, _ = cv2.projectPoints(objpoints[i], rvecs_r[i], tvecs_r[i], mtx_r, dist_r)
-        error_r += cv2.norm(imgpoints_right[i], img_pts_r, cv2.NORM_L2) / len(img_pts_r)
-    error_r /= len(objpoints)
+    pair_names = [os.path.basename(left_path) for left_path, _, _, _ in valid_pairs]
+    rejected = []
+    prev_mean = None
+    for iteration in range(max(max_reject_iters, 0) + 1):
+        # Ŀ궨/ͷ
+        print("\nCalibrating left camera...")
+        mtx_l, dist_l, error_l, view_errors_l = calibrate_mono(objpoints, imgpoints_left, img_size)
+        print("Calibrating right camera...")
+        mtx_r, dist_r, error_r, view_errors_r = calibrate_mono(objpoints, imgpoints_right, img_size)
+
+        if reject_threshold <= 0:
+            break
+        # нϲΪͼԵ
+        pair_errors = np.maximum(view_errors_l, view_errors_r)
+        bad = np.flatnonzero(pair_errors > reject_threshold)
+        if bad.size == 0:
+            print(f"All views below {reject_threshold:.3f} px after {iteration} rejection iteration(s)")
+            break
+        mean_error = float(pair_errors.mean())
+        if prev_mean is not None and prev_mean - mean_error < prev_mean * REJECT_MIN_GAIN:
+            print(f"Mean view error converged at {mean_error:.4f} px")
+            break
+        prev_mean = mean_error
+        removable = len(objpoints) - MIN_VALID_PAIRS
+        if removable <= 0 or iteration == max_reject_iters:
+            print(f"Warning: {bad.size} view(s) above {reject_threshold:.3f} px remain "
+                  f"({'minimum pair count reached' if removable <= 0 else 'iteration limit reached'})")
+            break
+        # ÿֻ޳һͼ±궨
+        n_drop = min(bad.size, removable, max(1, int(len(objpoints) * REJECT_FRACTION)))
+        drop = set(bad[np.argsort(pair_errors[bad])[::-1][:n_drop]].tolist())
+        for i in sorted(drop):
+            print(f"Rejecting {pair_names[i]}: left {view_errors_l[i]:.4f} px, right {view_errors_r[i]:.4f} px")
+            rejected.append(pair_names[i])
+        keep = [i for i in range(len(objpoints)) if i not in drop]
+        objpoints = [objpoints[i] for i in keep]
+        imgpoints_left = [imgpoints_left[i] for i in keep]
+        imgpoints_right = [imgpoints_right[i] for i in keep]
+        pair_names = [pair_names[i] for i in keep]
+
+    print_view_errors(pair_names, view_errors_l, view_errors_r)
+    if rejected:
+        print(f"Rejected {len(rejected)} view(s): {', '.join(rejected)}")
 
     # ˫Ŀ궨
     print("Performing stereo calibration...")
@@ -193,30 +477,39 @@ def calibrate_stereo_camera():
     # Уӳ
     map1x, map1y = cv2.initUndistortRectifyMap(mtx_l, dist_l, R1, P1, img_size, cv2.CV_32FC1)
     map2x, map2y = cv2.initUndistortRectifyMap(mtx_r, dist_r, R2, P2, img_size, cv2.CV_32FC1)
+    scaled_params = build_scaled_rectification(mtx_l, dist_l, R1, P1, mtx_r, dist_r, R2, P2, Q, img_size)
 
-    # б궨
-    np.savez(
-        CALIB_RESULT_FILE,
-        mtx_l=mtx_l, dist_l=dist_l,
-        mtx_r=mtx_r, dist_r=dist_r,
-        R=R, T=T, E=E, F=F,
-        R1=R1, R2=R2, P1=P1, P2=P2, Q=Q,
-        map1x=map1x, map1y=map1y,
-        map2x=map2x, map2y=map2y,
-        img_size=img_size,
-        baseline=abs(T[0][0]),
-        square_size=SQUARE_SIZE,
-        chessboard_size=CHESSBOARD_SIZE,
-        reproj_error_l=error_l,
-        reproj_error_r=error_r,
-        reproj_error_stereo=ret_stereo
-    )
+    # б궨дʱļԭ滻еĲ򲻻дһļ
+    tmp_file = CALIB_RESULT_FILE + ".tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(
+            f,
+            mtx_l=mtx_l, dist_l=dist_l,
+            mtx_r=mtx_r, dist_r=dist_r,
+            R=R, T=T, E=E, F=F,
+            R1=R1, R2=R2, P1=P1, P2=P2, Q=Q,
+            map1x=map1x, map1y=map1y,
+            map2x=map2x, map2y=map2y,
+            img_size=img_size,
+            baseline=abs(T[0][0]),
+            square_size=SQUARE_SIZE,
+            chessboard_size=CHESSBOARD_SIZE,
+            reproj_error_l=error_l,
+            reproj_error_r=error_r,
+            view_errors_l=view_errors_l,
+            view_errors_r=view_errors_r,
+            view_names=np.array(pair_names),
+            reproj_error_stereo=ret_stereo,
+            **scaled_params
+        )
+    os.replace(tmp_file, CALIB_RESULT_FILE)
 
     # 궨
     print("\n" + "=" * 50)
     print("Calibration Results")
     print("=" * 50)
     print(f"Image size: {img_size[0]}x{img_size[1]}")
+    print(f"Rectification scales: 1, {', '.join(f'1/{s}' for s in EXTRA_RECTIFY_SCALES)}")
     print(f"Chessboard size (inner corners): {CHESSBOARD_SIZE}")
     print(f"Square size: {SQUARE_SIZE*1000} mm")
     print(f"\nReprojection Errors:")
@@ -232,5 +525,21 @@ def calibrate_stereo_camera():
     print("=" * 50)
 
 if __name__ == "__main__":
-    calibrate_stereo_camera()
+    parser = argparse.ArgumentParser(description="Generate stereo calibration parameters from captured image pairs")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used for corner detection (default: CPU count, 1 = serial)")
+    parser.add_argument("--show", action="store_true", help="Show detected corners after detection finishes")
+    parser.add_argument("--detect-width", type=int, default=DETECT_MAX_WIDTH,
+                        help="Search the board on images downscaled to this width, then refine at full "
+                             "resolution (0 = full-resolution search only)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the corner cache and detect every image again")
+    parser.add_argument("--reject-threshold", type=float, default=REJECT_THRESHOLD,
+                        help="Iteratively drop views whose RMS reprojection error (px) exceeds this value "
+                             "and recalibrate (0 = keep all views)")
+    parser.add_argument("--max-reject-iters", type=int, default=MAX_REJECT_ITERS,
+                        help="Maximum number of rejection iterations")
+    args = parser.parse_args()
+    calibrate_stereo_camera(workers=args.workers, show=args.show, detect_width=args.detect_width,
+                            use_cache=not args.no_cache, reject_threshold=args.reject_threshold,
+                            max_reject_iters=args.max_reject_iters)
 